@@ -0,0 +1,43 @@
+"""Command line interface without Streamlit.
+
+```
+poetry run amorphous-metals convert INPUT_DIR OUTPUT_DIR
+poetry run amorphous-metals cluster INPUT [INPUT ...] -o OUTPUT_DIR
+poetry run amorphous-metals dataset {build,summary} ...
+```
+"""
+
+import argparse
+import importlib
+import sys
+
+COMMANDS: dict[str, str] = {
+    "convert": "amorphous_metals.convert",
+    "cluster": "amorphous_metals.cluster.cli",
+    "dataset": "amorphous_metals.dataset",
+}
+"""Subcommands with modules of their `main()` entry points (imported on use)."""
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run subcommand.
+
+    Arguments:
+        argv -- command line arguments (defaults to `sys.argv`).
+
+    Returns:
+        Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog="amorphous-metals", description="Amorphous metals data tools."
+    )
+    parser.add_argument("command", choices=COMMANDS, help="subcommand")
+    parser.add_argument(
+        "arguments", nargs=argparse.REMAINDER, help="arguments of the subcommand"
+    )
+    args = parser.parse_args(argv)
+    return importlib.import_module(COMMANDS[args.command]).main(args.arguments)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
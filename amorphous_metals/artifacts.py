@@ -0,0 +1,230 @@
+"""Shared on-disk cache of NumPy artifacts (e.g., linkage matrices and labels).
+
+Each entry is a `.npy` file named by its key, a hash of the source data fingerprint
+(see `fingerprint()`) and the parameters of the computation, so equal inputs give
+equal keys in every process. The cache directory can be shared by several processes
+(e.g., replicas of the Streamlit container mounting the same volume):
+
+- entries are written to a temporary file and renamed, so readers never see partially
+  written entries,
+- reading an entry updates its modification time, which orders entries for the least
+  recently used (LRU) eviction,
+- the total size of entries is bounded in bytes, and the least recently used entries
+  are evicted after each write.
+
+Entries are memory-mapped copy-on-write when loaded, so cache hits don't copy the data
+and modifying the loaded arrays never changes the cache.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+ENTRY_SUFFIX = ".npy"
+"""Suffix of cache entry files."""
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+"""Default maximum total size of cache entries."""
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Get fingerprint of data frame content.
+
+    Hashing the raw column buffers is much faster than hashing the data frame row by
+    row (or pickling it). Columns of parsed reports are contiguous, so they are hashed
+    without copying (directly from the memory-mapped file for columnar sidecars).
+
+    Arguments:
+        df -- data frame (float and categorical columns).
+
+    Returns:
+        Hex digest of column names and values.
+    """
+    digest = hashlib.sha256()  # hardware accelerated on most CPUs
+    digest.update(json.dumps([str(column) for column in df.columns]).encode("utf8"))
+    for _, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            digest.update(json.dumps(list(map(str, column.cat.categories))).encode())
+            values = column.cat.codes.to_numpy()
+        else:
+            values = column.to_numpy()
+        digest.update(str(values.dtype).encode())
+        digest.update(np.ascontiguousarray(values).data)
+    return digest.hexdigest()
+
+
+def artifact_key(*parts: Any) -> str:
+    """Get cache key of an artifact.
+
+    Arguments:
+        parts -- source fingerprints and parameters of the computation (JSON
+            serializable values or values with a stable `repr()`).
+
+    Returns:
+        Hex digest of the parts.
+    """
+    encoded = json.dumps(parts, default=repr, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode("utf8"), digest_size=20).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Cache counters of the current process."""
+
+    hits: int = 0
+    """Number of entries found in the cache."""
+    misses: int = 0
+    """Number of entries missing in the cache."""
+    evictions: int = 0
+    """Number of entries evicted to keep the size limit."""
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class ArtifactCache:
+    """Byte-bounded LRU cache of NumPy arrays in a directory."""
+
+    def __init__(self, directory: Path | str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Create cache (the directory is created on the first write).
+
+        Arguments:
+            directory -- cache directory (possibly shared with other processes).
+            max_bytes -- maximum total size of entries.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def entry_path(self, key: str) -> Path:
+        """Get path of the entry file of the key."""
+        return self.directory / (key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> npt.NDArray[Any] | None:
+        """Load entry (memory-mapped copy-on-write).
+
+        Arguments:
+            key -- entry key (see `artifact_key()`).
+
+        Returns:
+            Cached array or None if the entry is missing.
+        """
+        path = self.entry_path(key)
+        try:
+            array = np.load(path, mmap_mode="c", allow_pickle=False)
+        except (OSError, ValueError):
+            # Missing, evicted by another process in the meantime or corrupted.
+            with self._lock:
+                self.stats.misses += 1
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)  # mark the entry as recently used
+        with self._lock:
+            self.stats.hits += 1
+        return array
+
+    def put(self, key: str, value: npt.ArrayLike):
+        """Store entry and evict the least recently used entries over the limit.
+
+        Arguments:
+            key -- entry key (see `artifact_key()`).
+            value -- array without Python objects.
+        """
+        path = self.entry_path(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=path.name, suffix=".tmp", delete=False
+        ) as output_file:
+            try:
+                np.save(output_file, np.asarray(value), allow_pickle=False)
+                output_file.close()
+                os.replace(output_file.name, path)
+            except BaseException:
+                os.unlink(output_file.name)
+                raise
+        self.evict()
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], npt.ArrayLike]
+    ) -> npt.NDArray[Any]:
+        """Load entry or compute and store it.
+
+        Arguments:
+            key -- entry key (see `artifact_key()`).
+            compute -- function computing the array on a cache miss.
+
+        Returns:
+            Cached or computed array.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = np.asarray(compute())
+        try:
+            self.put(key, value)
+        except OSError as e:
+            print(f"Failed to cache artifact {key}: {e}")
+        return value
+
+    def size(self) -> int:
+        """Get total size of entries in bytes."""
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self) -> int:
+        """Evict the least recently used entries over the size limit.
+
+        Returns:
+            Number of evicted entries.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass  # evicted by another process
+            total -= size
+        with self._lock:
+            self.stats.evictions += evicted
+        return evicted
+
+    def clear(self):
+        """Remove all entries."""
+        for _, path, _ in self._entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+    def _entries(self) -> list[tuple[int, str, int]]:
+        """List entries with their modification time and size."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(ENTRY_SUFFIX):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return entries
@@ -0,0 +1 @@
+"""Clustering backends independent of the Streamlit application."""
@@ -0,0 +1,436 @@
+"""Command line interface of clustering (without Streamlit).
+
+Clusters report files in parallel (or all of them jointly as a project) and saves
+cluster labels and per-cluster summaries of each file:
+
+```
+poetry run amorphous-metals cluster "data/**/*.TXT" -o results -m ward -k 4
+```
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import os
+import sys
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from amorphous_metals import convert, project
+from amorphous_metals.cluster import hierarchical, kmeans, mixture, pipeline
+from amorphous_metals.cluster.features import summarize_clusters, valid_mask
+
+OutputFormat = Literal["csv", "parquet"]
+"""Format of output tables."""
+
+OUTPUT_FORMATS: tuple[OutputFormat, ...] = ("csv", "parquet")
+"""All available output formats."""
+
+LABEL_COLUMN = "cluster"
+"""Column with cluster labels in label tables (empty for holes)."""
+
+PROJECT_NAME = "project"
+"""Output name of jointly clustered files."""
+
+
+def find_inputs(patterns: Iterable[str | Path]) -> list[Path]:
+    """Find report files matching paths, directories or glob patterns.
+
+    Arguments:
+        patterns -- report paths, directories (searched recursively, see
+            `convert.find_raw_files()`) or glob patterns (`**` matches directories
+            recursively).
+
+    Returns:
+        Unique report paths in order of the patterns.
+    """
+    paths: dict[Path, None] = {}
+    for pattern in map(str, patterns):
+        if glob.has_magic(pattern):
+            matches = sorted(
+                Path(match) for match in glob.glob(pattern, recursive=True)
+            )
+        elif Path(pattern).is_dir():
+            matches = convert.find_raw_files(Path(pattern))
+        else:
+            matches = [Path(pattern)]
+        paths.update(dict.fromkeys(path for path in matches if not path.is_dir()))
+    return list(paths)
+
+
+def label_table(
+    df: pd.DataFrame,
+    clusters: npt.NDArray[np.int_],
+    mask: npt.NDArray[np.bool_] | None = None,
+) -> pd.DataFrame:
+    """Get table of cluster labels of all data frame rows.
+
+    Arguments:
+        df -- clustered data frame.
+        clusters -- cluster labels of the rows without holes.
+        mask -- precomputed `valid_mask()` of the data frame.
+
+    Returns:
+        Positions (and samples of projects) with cluster labels (missing for holes).
+    """
+    mask = valid_mask(df) if mask is None else mask
+    columns = [
+        column
+        for column in (project.SAMPLE_COLUMN, *convert.POSITION_COLUMNS)
+        if column in df.columns
+    ]
+    table = df[columns].copy()
+    table[LABEL_COLUMN] = pd.array(np.zeros(len(df), np.int64), dtype="Int64")
+    table.loc[~mask, LABEL_COLUMN] = pd.NA
+    table.loc[mask, LABEL_COLUMN] = clusters
+    return table
+
+
+def write_table(df: pd.DataFrame, path: Path, file_format: OutputFormat):
+    """Write table in the format (with the format suffix added to the path)."""
+    path = path.with_name(f"{path.name}.{file_format}")
+    if file_format == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
+
+
+def cluster_df(
+    df: pd.DataFrame,
+    output_path: Path,
+    config: pipeline.ClusteringConfig,
+    file_format: OutputFormat,
+):
+    """Cluster data frame and write its labels and summary.
+
+    Arguments:
+        df -- data frame of a single map or a project.
+        output_path -- output path prefix (`_labels`, `_summary` and, for projects,
+            `_samples` tables are written).
+        config -- clustering method and parameters.
+        file_format -- format of output tables.
+    """
+    mask = valid_mask(df)
+    clusters = pipeline.cluster(df, config, mask)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    labels = label_table(df, clusters, mask)
+    write_table(
+        labels, output_path.with_name(f"{output_path.name}_labels"), file_format
+    )
+    summary = summarize_clusters(df.loc[mask, project.feature_columns(df)], clusters)
+    write_table(
+        summary, output_path.with_name(f"{output_path.name}_summary"), file_format
+    )
+    if project.is_project(df):
+        write_table(
+            project.sample_fractions(df.loc[mask, project.SAMPLE_COLUMN], clusters),
+            output_path.with_name(f"{output_path.name}_samples"),
+            file_format,
+        )
+
+
+def _cluster_batch_file(
+    input_path: Path,
+    output_dir: Path,
+    config: pipeline.ClusteringConfig,
+    file_format: OutputFormat,
+) -> str | None:
+    """Cluster a single file in a batch, returning the error message on failure."""
+    try:
+        df = convert.convert_raw_to_df(input_path)
+        cluster_df(df, output_dir / input_path.stem, config, file_format)
+    except (ValueError, RuntimeError, OSError, ImportError) as e:
+        return str(e)
+    return None
+
+
+def _load_project_file(input_path: Path) -> pd.DataFrame | str:
+    """Load a single file of a project, returning the error message on failure."""
+    try:
+        return convert.convert_raw_to_df(input_path)
+    except (ValueError, RuntimeError, OSError) as e:
+        return str(e)
+
+
+@dataclass
+class BatchSummary:
+    """Summary of batch clustering."""
+
+    clustered: list[Path] = field(default_factory=list)
+    """Successfully clustered input files."""
+    errors: dict[Path, str] = field(default_factory=dict)
+    """Error messages of the input files which failed to cluster."""
+    elapsed: float = 0.0
+    """Wall time of the clustering in seconds."""
+
+    def report(self) -> str:
+        """Generate human-readable report with errors and throughput."""
+        lines = [f"{path}: {error}" for path, error in self.errors.items()]
+        lines.append(
+            f"Clustered {len(self.clustered)} files, failed {len(self.errors)} in "
+            f"{self.elapsed:.2f} s "
+            f"({len(self.clustered) / max(self.elapsed, 1e-9):.1f} files/s)."
+        )
+        return "\n".join(lines)
+
+
+def cluster_batch(
+    input_paths: list[Path],
+    output_dir: Path,
+    config: pipeline.ClusteringConfig | None = None,
+    file_format: OutputFormat = "csv",
+    jobs: int | None = None,
+    joint: bool = False,
+) -> BatchSummary:
+    """Cluster report files in parallel.
+
+    Arguments:
+        input_paths -- report files.
+        output_dir -- output directory (tables are named after the input files).
+        config -- clustering method and parameters (defaults of `ClusteringConfig`).
+        file_format -- format of output tables.
+        jobs -- number of worker processes (defaults to CPU count).
+        joint -- cluster all files together as a project (files are loaded in
+            parallel, see `amorphous_metals.project`).
+
+    Returns:
+        Summary of the clustering.
+    """
+    config = pipeline.ClusteringConfig() if config is None else config
+    summary = BatchSummary()
+    start = time.perf_counter()
+
+    jobs = jobs if jobs is not None else os.cpu_count() or 1
+    with (
+        ProcessPoolExecutor(max_workers=jobs)
+        if jobs > 1 and len(input_paths) > 1
+        else contextlib.nullcontext()
+    ) as executor:
+        chunksize = max(len(input_paths) // (jobs * 4), 1)
+        if joint:
+            results = (
+                executor.map(_load_project_file, input_paths, chunksize=chunksize)
+                if executor is not None
+                else map(_load_project_file, input_paths)
+            )
+        else:
+            cluster_file = functools.partial(
+                _cluster_batch_file,
+                output_dir=output_dir,
+                config=config,
+                file_format=file_format,
+            )
+            results = (
+                executor.map(cluster_file, input_paths, chunksize=chunksize)
+                if executor is not None
+                else map(cluster_file, input_paths)
+            )
+
+        dfs: dict[str, pd.DataFrame] = {}
+        for input_path, result in zip(input_paths, results):
+            if isinstance(result, str):
+                summary.errors[input_path] = result
+            elif joint:
+                dfs[input_path.stem] = result
+            else:
+                summary.clustered.append(input_path)
+
+    if joint and len(dfs) > 0:
+        try:
+            cluster_df(
+                project.stack_maps(dfs), output_dir / PROJECT_NAME, config, file_format
+            )
+            summary.clustered.extend(
+                path for path in input_paths if path not in summary.errors
+            )
+        except (ValueError, OSError, ImportError) as e:
+            summary.errors[output_dir / PROJECT_NAME] = str(e)
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run clustering command line interface.
+
+    Arguments:
+        argv -- command line arguments (defaults to `sys.argv`).
+
+    Returns:
+        Exit code.
+    """
+    defaults = pipeline.ClusteringConfig()
+    parser = argparse.ArgumentParser(
+        prog="amorphous-metals cluster",
+        description="Cluster raw files from nanoindenter.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="raw files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-o", "--output-dir", type=Path, required=True, help="output directory"
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        choices=pipeline.METHODS,
+        default=defaults.method,
+        help=f"clustering method (default: {defaults.method})",
+    )
+    parser.add_argument(
+        "-f",
+        "--feature",
+        action="append",
+        dest="features",
+        help="feature used for clustering, can be repeated (default: "
+        + ", ".join(defaults.features).replace("%", "%%")
+        + ")",
+    )
+    parser.add_argument(
+        "--no-normalize", action="store_true", help="don't normalize features"
+    )
+    parser.add_argument(
+        "-k",
+        "--clusters",
+        type=int,
+        default=defaults.cluster_count,
+        help="number of clusters of hierarchical clustering, K-means and Gaussian "
+        "mixture "
+        f"(default: {defaults.cluster_count})",
+    )
+    parser.add_argument(
+        "--metric",
+        default=defaults.metric,
+        help="distance metric of hierarchical clustering "
+        f"(default: {defaults.metric})",
+    )
+    parser.add_argument(
+        "--grid",
+        action="store_true",
+        help="merge only neighbouring points in hierarchical clustering",
+    )
+    parser.add_argument(
+        "--neighbours",
+        type=int,
+        choices=hierarchical.NEIGHBOURHOODS,
+        default=defaults.neighbours,
+        help="neighbours of grid cells of --grid and --smoothing "
+        f"(default: {defaults.neighbours})",
+    )
+    parser.add_argument(
+        "--kmeans-mode",
+        choices=kmeans.MODES,
+        default=defaults.kmeans_mode,
+        help=f"K-means variant (default: {defaults.kmeans_mode})",
+    )
+    parser.add_argument(
+        "--covariance",
+        choices=mixture.COVARIANCE_TYPES,
+        default=defaults.covariance_type,
+        help="covariance of phases of Gaussian mixture "
+        f"(default: {defaults.covariance_type})",
+    )
+    parser.add_argument(
+        "--smoothing",
+        type=float,
+        default=defaults.smoothing,
+        help="strength of spatial smoothing of K-means clusters on the grid "
+        f"(default: {defaults.smoothing}, i.e., disabled)",
+    )
+    parser.add_argument(
+        "--min-samples",
+        type=int,
+        default=defaults.min_samples,
+        help="minimum samples of core points of OPTICS and DBSCAN "
+        f"(default: {defaults.min_samples})",
+    )
+    parser.add_argument(
+        "--radius",
+        type=float,
+        default=defaults.radius,
+        help="neighbourhood radius of OPTICS and DBSCAN (default: suggested)",
+    )
+    parser.add_argument(
+        "--xi",
+        type=float,
+        default=defaults.xi,
+        help=f"OPTICS cluster boundary steepness (default: {defaults.xi})",
+    )
+    parser.add_argument(
+        "--min-cluster-size",
+        type=int,
+        default=defaults.min_cluster_size,
+        help=f"minimum OPTICS cluster size (default: {defaults.min_cluster_size})",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="format of output tables (default: csv)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--joint",
+        action="store_true",
+        help="cluster all files together, so clusters mean the same phase in all "
+        "samples",
+    )
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        print("Number of jobs must be positive")
+        return 1
+    if args.clusters < 1:
+        print("Number of clusters must be positive")
+        return 1
+    if args.radius is not None and args.radius <= 0:
+        print("Neighbourhood radius must be positive")
+        return 1
+    input_paths = find_inputs(args.inputs)
+    if len(input_paths) == 0:
+        print("No input files found")
+        return 1
+
+    config = pipeline.ClusteringConfig(
+        method=args.method,
+        features=(
+            tuple(args.features) if args.features is not None else defaults.features
+        ),
+        normalize=not args.no_normalize,
+        cluster_count=args.clusters,
+        metric=args.metric,
+        grid_constrained=args.grid,
+        neighbours=args.neighbours,
+        kmeans_mode=args.kmeans_mode,
+        smoothing=args.smoothing,
+        covariance_type=args.covariance,
+        min_samples=args.min_samples,
+        radius=args.radius,
+        xi=args.xi,
+        min_cluster_size=args.min_cluster_size,
+    )
+    summary = cluster_batch(
+        input_paths, args.output_dir, config, args.format, args.jobs, args.joint
+    )
+    print(summary.report())
+    return 1 if len(summary.errors) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
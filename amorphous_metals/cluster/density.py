@@ -0,0 +1,175 @@
+"""Density-based clustering (OPTICS and DBSCAN) on sparse neighbour graphs.
+
+Instead of a dense n×n distance matrix, distances are stored only for pairs of points
+within a radius (found with a KD-tree or ball tree), so memory grows with the
+neighbourhood size rather than n². Observations are standardized first, which makes
+euclidean distances equal to SciPy's standardized euclidean (`seuclidean`) metric.
+
+The graph is computed once for a radius and can be reused for any OPTICS or DBSCAN
+parameters with `max_eps`/`eps` up to that radius.
+"""
+
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sps
+
+# scikit-learn is imported by the functions, so pages load it only when clustering.
+if TYPE_CHECKING:
+    from sklearn.cluster import DBSCAN, OPTICS
+
+Algorithm = Literal["auto", "kd_tree", "ball_tree"]
+"""Spatial index used to find neighbours."""
+
+DEFAULT_RADIUS_QUANTILE = 0.9
+"""Default quantile of core distances used by `suggest_radius()`."""
+
+_RADIUS_SAMPLE_SIZE = 2000
+
+
+def standardize(observations: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Scale features to unit variance (constant features are zeroed).
+
+    Arguments:
+        observations -- observations (one row per point).
+
+    Returns:
+        Centered and scaled observations.
+    """
+    scaled = np.array(observations, dtype=np.float64, order="C", ndmin=2)
+    std = scaled.std(axis=0, ddof=1) if len(scaled) > 1 else np.zeros(scaled.shape[1])
+    scaled -= scaled.mean(axis=0)
+    np.divide(scaled, std, out=scaled, where=std > 0)
+    scaled[:, std <= 0] = 0
+    return scaled
+
+
+def suggest_radius(
+    observations: npt.ArrayLike,
+    min_samples: int,
+    quantile: float = DEFAULT_RADIUS_QUANTILE,
+    random_state: int = 0,
+) -> float:
+    """Suggest neighbourhood radius from core distances of a sample of points.
+
+    Arguments:
+        observations -- (standardized) observations.
+        min_samples -- number of neighbours (including the point) of core points.
+        quantile -- quantile of core distances to return.
+        random_state -- random state of sampling.
+
+    Returns:
+        Radius within which the given fraction of points are core points.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    observations = np.asarray(observations, dtype=np.float64)
+    if len(observations) <= 1:
+        return 0.0
+    sample = observations
+    if len(observations) > _RADIUS_SAMPLE_SIZE:
+        rng = np.random.default_rng(random_state)
+        sample = observations[rng.choice(len(observations), _RADIUS_SAMPLE_SIZE)]
+
+    n_neighbors = min(min_samples, len(observations))
+    distances, _ = (
+        NearestNeighbors(n_neighbors=n_neighbors).fit(observations).kneighbors(sample)
+    )
+    return float(np.quantile(distances[:, -1], quantile))
+
+
+def neighbor_graph(
+    observations: npt.ArrayLike,
+    radius: float,
+    min_neighbors: int = 0,
+    algorithm: Algorithm = "auto",
+) -> sps.csr_matrix:
+    """Build sparse graph of distances to neighbours within radius.
+
+    Arguments:
+        observations -- (standardized) observations.
+        radius -- neighbourhood radius.
+        min_neighbors -- minimum number of stored neighbours of each point (nearest
+            points beyond the radius are added if needed, as OPTICS and DBSCAN need at
+            least `min_samples` neighbours for each point).
+        algorithm -- spatial index.
+
+    Returns:
+        Sparse distance matrix with rows sorted by distance (zero distances of
+        duplicate points are stored explicitly, self-distances are not stored).
+    """
+    from sklearn.neighbors import NearestNeighbors, sort_graph_by_row_values
+
+    observations = np.asarray(observations, dtype=np.float64)
+    n = len(observations)
+    neighbors = NearestNeighbors(radius=radius, algorithm=algorithm).fit(observations)
+    graph = neighbors.radius_neighbors_graph(mode="distance", sort_results=True)
+
+    min_neighbors = min(min_neighbors, n - 1)
+    if min_neighbors > 0:
+        # Only neighbours beyond the radius are missing from the radius graph.
+        distances, indices = neighbors.kneighbors(n_neighbors=min_neighbors)
+        beyond = distances > radius
+        rows = np.repeat(np.arange(n), min_neighbors)[beyond.ravel()]
+        graph = graph.tocoo()
+        graph = sps.csr_matrix(
+            (
+                np.concatenate((graph.data, distances[beyond])),
+                (
+                    np.concatenate((graph.row, rows)),
+                    np.concatenate((graph.col, indices[beyond])),
+                ),
+            ),
+            shape=(n, n),
+        )
+        graph = sort_graph_by_row_values(graph, copy=False, warn_when_not_sorted=False)
+
+    return graph
+
+
+def optics(
+    graph: sps.csr_matrix,
+    min_samples: int,
+    xi: float = 0.05,
+    min_cluster_size: int | None = None,
+    max_eps: float = np.inf,
+) -> "OPTICS":
+    """Perform OPTICS clustering on neighbour graph.
+
+    Arguments:
+        graph -- neighbour graph (see `neighbor_graph()`) with at least
+            `min_samples - 1` neighbours of each point.
+        min_samples -- number of neighbours (including the point) of core points.
+        xi -- minimum steepness of reachability plot cluster boundaries.
+        min_cluster_size -- minimum cluster size (`min_samples` by default).
+        max_eps -- maximum neighbourhood radius (at most the graph radius).
+
+    Returns:
+        Fitted OPTICS (labels, reachability and ordering).
+    """
+    from sklearn.cluster import OPTICS
+
+    return OPTICS(
+        min_samples=min_samples,
+        max_eps=max_eps,
+        xi=xi,
+        min_cluster_size=min_cluster_size,
+        metric="precomputed",
+    ).fit(graph.copy())
+
+
+def dbscan(graph: sps.csr_matrix, eps: float, min_samples: int) -> "DBSCAN":
+    """Perform DBSCAN clustering on neighbour graph.
+
+    Arguments:
+        graph -- neighbour graph (see `neighbor_graph()`) with radius at least `eps`.
+        eps -- neighbourhood radius.
+        min_samples -- number of neighbours (including the point) of core points.
+
+    Returns:
+        Fitted DBSCAN (labels and core points).
+    """
+    from sklearn.cluster import DBSCAN
+
+    return DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit(graph)
@@ -0,0 +1,153 @@
+"""Feature matrices of data frames with holes.
+
+Data points with any missing value (holes) cannot be clustered, so clustering backends
+get a matrix of the remaining rows, and their results are put back in place of the
+data frame rows with `fill_holes()` or summarized with `summarize_clusters()`.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """Selected features of data frame rows without holes as a float64 matrix."""
+
+    values: npt.NDArray[np.float64]
+    """C-contiguous matrix with one row per valid data frame row."""
+    columns: tuple[str, ...]
+    """Feature names (matrix columns)."""
+    positions: npt.NDArray[np.intp]
+    """Matrix row of each data frame row (-1 for holes)."""
+    mean: npt.NDArray[np.float64]
+    """Mean of raw features."""
+    std: npt.NDArray[np.float64]
+    """Standard deviation (with Bessel's correction) of raw features."""
+    normalized: bool
+    """True if values are normalized with `mean` and `std`."""
+
+    def row(self, index: int) -> npt.NDArray[np.float64] | None:
+        """Get view of features of data frame row (None for holes)."""
+        position = self.positions[index]
+        return None if position < 0 else self.values[position]
+
+
+def valid_mask(df: pd.DataFrame) -> npt.NDArray[np.bool_]:
+    """Get mask of data frame rows without data holes.
+
+    Arguments:
+        df -- source data frame.
+
+    Returns:
+        Boolean array, True for rows without holes (NaN values).
+    """
+    return df.notna().to_numpy().all(axis=1)
+
+
+def feature_matrix(
+    df: pd.DataFrame,
+    features: Iterable[str],
+    normalize: bool,
+    mask: npt.NDArray[np.bool_] | None = None,
+) -> FeatureMatrix:
+    """Build feature matrix of data frame rows without holes.
+
+    Arguments:
+        df -- source data frame.
+        features -- features to include (columns are always in the data frame order).
+        normalize -- center around mean and divide by std (constant features are
+            zeroed).
+        mask -- precomputed `valid_mask()` of the data frame.
+
+    Returns:
+        Feature matrix.
+    """
+    features = set(features)
+    columns = tuple(column for column in df.columns if column in features)
+    mask = valid_mask(df) if mask is None else mask
+
+    values = np.ascontiguousarray(df.loc[mask, list(columns)].to_numpy(np.float64))
+    mean = values.mean(axis=0)
+    std = values.std(axis=0, ddof=1) if len(values) > 1 else np.zeros(len(columns))
+    if normalize:
+        values -= mean
+        np.divide(values, std, out=values, where=std > 0)
+        values[:, std <= 0] = 0
+    return FeatureMatrix(
+        values,
+        columns,
+        np.where(mask, np.cumsum(mask) - 1, -1),
+        mean,
+        std,
+        normalize,
+    )
+
+
+def fill_holes(
+    source: pd.DataFrame | npt.NDArray[np.bool_],
+    clustered: npt.ArrayLike,
+    fill_with: Any = math.nan,
+) -> npt.NDArray[Any]:
+    """Fill holes in clustering result.
+
+    Arguments:
+        source -- source data frame (with holes) or its precomputed `valid_mask()`.
+        clustered -- clustering result (scalar or vector, e.g., RGB, per row).
+
+    Keyword Arguments:
+        fill_with -- scalar or vector value used to fill the holes with (default:
+            {math.nan}).
+
+    Returns:
+        Clustered data with holes filled.
+    """
+    mask = valid_mask(source) if isinstance(source, pd.DataFrame) else source
+    clustered = np.asarray(clustered)
+    fill_with = np.asarray(fill_with)
+
+    output = np.empty(
+        (len(mask), *clustered.shape[1:]), np.result_type(clustered, fill_with)
+    )
+    output[~mask] = fill_with
+    output[mask] = clustered
+    return output
+
+
+def summarize_clusters(
+    df: pd.DataFrame, clusters: npt.NDArray[np.int_]
+) -> pd.DataFrame:
+    """Compute statistics of all columns for each cluster in a single groupby pass.
+
+    Arguments:
+        df -- data frame (without holes).
+        clusters -- cluster of each data frame row.
+
+    Returns:
+        Tidy data frame indexed by (cluster, statistic) with a column per feature.
+        Statistics are the same as in `DataFrame.describe()`, plus `area fraction` of
+        the cluster (i.e., fraction of all data points).
+    """
+    grouped = df.groupby(np.asarray(clusters))
+    count = grouped.count()
+    quantiles = grouped.quantile([0.25, 0.5, 0.75])
+
+    summary = pd.concat(
+        {
+            "count": count.astype(np.float64),
+            "mean": grouped.mean(),
+            "std": grouped.std(),
+            "min": grouped.min(),
+            "25%": quantiles.xs(0.25, level=1),
+            "50%": quantiles.xs(0.5, level=1),
+            "75%": quantiles.xs(0.75, level=1),
+            "max": grouped.max(),
+            "area fraction": count / len(df),
+        },
+        names=["statistic", "cluster"],
+    )
+    return summary.swaplevel().sort_index(level="cluster", sort_remaining=False)
@@ -0,0 +1,489 @@
+"""Memory-bounded hierarchical clustering.
+
+`scipy.cluster.hierarchy.linkage()` builds a condensed distance matrix, which needs
+O(n²) memory. It is still the fastest option for small maps, but for larger ones this
+module computes the same linkage matrix with O(n) memory:
+
+- `single` linkage with the minimum spanning tree (Prim's algorithm), any metric,
+- `ward` linkage with the nearest-neighbour chain on raw coordinates,
+- `centroid` and `median` linkage with nearest-neighbour lists on raw coordinates,
+- `ward`, `complete`, `average` and `single` linkage constrained to a sparse
+  connectivity graph (e.g., neighbouring points of the indentation grid).
+
+All strategies return a linkage matrix in the SciPy format, and the unconstrained ones
+compute the same merges as `scipy.cluster.hierarchy.linkage()`. Linkage constrained to
+connectivity isn't monotonic (a merge may be closer than the previous one), so it has
+to be cut by the merge order with `cut()` instead of `fcluster()` distance thresholds.
+"""
+
+from typing import Any, Iterable, Literal
+
+import numpy as np
+import numpy.typing as npt
+import scipy.cluster.hierarchy as sph
+import scipy.sparse as sps
+import scipy.spatial.distance as spd
+from scipy.sparse.csgraph import connected_components
+
+Strategy = Literal["auto", "dense", "mst", "nn-chain", "nn-list", "connectivity"]
+"""Linkage computation strategy."""
+
+STRATEGIES: tuple[Strategy, ...] = (
+    "auto",
+    "dense",
+    "mst",
+    "nn-chain",
+    "nn-list",
+    "connectivity",
+)
+"""All available strategies."""
+
+DENSE_MAX_POINTS = 4000
+"""Maximum number of points for the dense strategy in auto mode (~64 MB matrix)."""
+
+CONNECTIVITY_METHODS = ("ward", "complete", "average", "single")
+"""Linkage methods supported with connectivity constraints."""
+
+NEIGHBOURHOODS = (4, 8)
+"""Supported neighbourhoods of grid cells (see `grid_connectivity()`)."""
+
+_BLOCK_ELEMENTS = 2**20
+"""Number of distance matrix elements computed at once (8 MB)."""
+
+
+def select_strategy(
+    n: int, method: str, metric: str = "euclidean", connectivity: Any = None
+) -> Strategy:
+    """Select the most scalable strategy for the clustering problem.
+
+    Arguments:
+        n -- number of points.
+        method -- linkage method (as in SciPy).
+        metric -- distance metric (as in SciPy).
+        connectivity -- optional sparse connectivity graph.
+
+    Raises:
+        ValueError: there is no memory-bounded strategy for the problem.
+
+    Returns:
+        Selected strategy.
+    """
+    if connectivity is not None:
+        return "connectivity"
+    if n <= DENSE_MAX_POINTS:
+        return "dense"
+    if method == "single":
+        return "mst"
+    if method == "ward" and metric == "euclidean":
+        return "nn-chain"
+    if method in ("centroid", "median") and metric == "euclidean":
+        return "nn-list"
+    raise ValueError(
+        f"Linkage method {method} with {metric} metric needs a full distance matrix, "
+        f"which is too big for {n} points. Use grid connectivity or another method."
+    )
+
+
+def linkage(
+    data: npt.ArrayLike,
+    method: str = "centroid",
+    metric: str = "euclidean",
+    strategy: Strategy = "auto",
+    connectivity: sps.spmatrix | sps.sparray | None = None,
+) -> npt.NDArray[np.float64]:
+    """Perform hierarchical clustering.
+
+    Arguments:
+        data -- observations (one row per point).
+        method -- linkage method (as in SciPy).
+        metric -- distance metric (as in SciPy).
+        strategy -- computation strategy (`auto` selects it with `select_strategy()`).
+        connectivity -- sparse connectivity graph (needed for `connectivity` strategy).
+
+    Raises:
+        ValueError: the strategy doesn't support the method or metric.
+
+    Returns:
+        Linkage matrix in SciPy format.
+    """
+    observations = np.asarray(data, dtype=np.float64)
+    if observations.ndim == 1:
+        observations = observations[:, np.newaxis]
+    n = len(observations)
+    if strategy == "auto":
+        strategy = select_strategy(n, method, metric, connectivity)
+
+    if strategy in ("nn-chain", "nn-list") and metric != "euclidean":
+        raise ValueError(f"Strategy {strategy} supports only euclidean metric.")
+
+    match strategy:
+        case "dense":
+            return sph.linkage(observations, method, metric)
+        case "mst":
+            if method != "single":
+                raise ValueError("MST strategy supports only single linkage.")
+            return _mst_linkage(observations, metric)
+        case "nn-chain":
+            if method != "ward":
+                raise ValueError("Nearest-neighbour chain supports only ward linkage.")
+            return _nn_chain_linkage(observations)
+        case "nn-list":
+            if method not in ("ward", "centroid", "median"):
+                raise ValueError(
+                    "Nearest-neighbour lists support only ward, centroid and median "
+                    "linkage."
+                )
+            return _nn_list_linkage(observations, method)
+        case "connectivity":
+            if connectivity is None:
+                raise ValueError("Connectivity strategy needs a connectivity graph.")
+            if method not in CONNECTIVITY_METHODS:
+                raise ValueError(
+                    "Connectivity strategy supports only "
+                    + ", ".join(CONNECTIVITY_METHODS)
+                    + " linkage."
+                )
+            return _connectivity_linkage(observations, method, metric, connectivity)
+
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def grid_connectivity(
+    valid_mask: npt.NDArray[np.bool_], width: int, neighbours: int = 4
+) -> sps.csr_array:
+    """Build connectivity graph of the points of a row-major grid.
+
+    Arguments:
+        valid_mask -- mask of all grid cells, True for points passed to clustering.
+        width -- width of the grid.
+        neighbours -- 4 (edges) or 8 (edges and corners) neighbours of each cell.
+
+    Raises:
+        ValueError: unsupported neighbourhood.
+
+    Returns:
+        Symmetric sparse adjacency matrix of the valid points (in their order).
+    """
+    if neighbours not in NEIGHBOURHOODS:
+        raise ValueError(f"Unsupported grid neighbourhood: {neighbours}")
+
+    cells = np.arange(len(valid_mask))
+    column = cells % width
+    right = cells[(column < width - 1) & (cells + 1 < len(cells))]
+    down = cells[cells + width < len(cells)]
+    edges = [(right, right + 1), (down, down + width)]
+    if neighbours == 8:
+        down_right = down[column[down] < width - 1]
+        down_left = down[column[down] > 0]
+        edges += [
+            (down_right, down_right + width + 1),
+            (down_left, down_left + width - 1),
+        ]
+    sources = np.concatenate([source for source, _ in edges])
+    targets = np.concatenate([target for _, target in edges])
+
+    valid = valid_mask[sources] & valid_mask[targets]
+    index = np.cumsum(valid_mask) - 1
+    sources, targets = index[sources[valid]], index[targets[valid]]
+
+    n = int(np.count_nonzero(valid_mask))
+    graph = sps.coo_array(
+        (np.ones(2 * len(sources)), (np.r_[sources, targets], np.r_[targets, sources])),
+        shape=(n, n),
+    )
+    return graph.tocsr()
+
+
+def cut(
+    linkage_matrix: npt.NDArray[np.float64], cluster_counts: Iterable[int]
+) -> npt.NDArray[np.int32]:
+    """Cut hierarchy into flat clusterings for several cluster counts at once.
+
+    Cutting is cheap compared to computing the linkage, so all cuts of interest can be
+    computed up front and the cluster count can be changed without any clustering.
+
+    Clusters are the subtrees left after the first n - count merges of n points. For
+    monotonic linkages, this is the same as `fcluster()` with `maxclust` (up to ties),
+    but it gives exactly `count` clusters for non-monotonic ones too (e.g., linkage
+    constrained to connectivity), where distance thresholds give fewer.
+
+    Arguments:
+        linkage_matrix -- linkage matrix in SciPy format.
+        cluster_counts -- cluster counts (at most the number of points).
+
+    Returns:
+        Cluster labels (starting from 1), one row per cluster count.
+    """
+    counts = list(cluster_counts)
+    n = len(linkage_matrix) + 1
+    children = linkage_matrix[:, :2].astype(np.intp)
+    parents = np.repeat(np.arange(n, 2 * n - 1), 2)
+    cuts = np.empty((len(counts), n), dtype=np.int32)
+    for row, count in zip(cuts, counts):
+        merges = max(n - count, 0)
+        # Tree of the merges (points and merged clusters are nodes).
+        tree = sps.coo_array(
+            (np.ones(2 * merges), (parents[: 2 * merges], children[:merges].ravel())),
+            shape=(2 * n - 1, 2 * n - 1),
+        )
+        _, components = connected_components(tree, directed=False)
+        _, labels = np.unique(components[:n], return_inverse=True)
+        row[:] = labels + 1
+    return cuts
+
+
+def _merges_to_linkage(
+    merges: npt.NDArray[np.float64], n: int, sort: bool
+) -> npt.NDArray[np.float64]:
+    """Convert merges of points to SciPy linkage matrix.
+
+    Arguments:
+        merges -- (point a, point b, distance) rows, where points are any members of
+            the merged clusters.
+        n -- number of points.
+        sort -- sort merges by distance first (for algorithms merging out of order).
+
+    Returns:
+        Linkage matrix in SciPy format.
+    """
+    if sort:
+        merges = merges[np.argsort(merges[:, 2], kind="stable")]
+
+    parent = np.arange(n)
+    cluster_id = np.arange(n)
+    sizes = np.ones(n, np.intp)
+    result = np.empty((len(merges), 4))
+
+    def find(point: int) -> int:
+        root = point
+        while parent[root] != root:
+            root = parent[root]
+        while parent[point] != root:
+            parent[point], point = root, parent[point]
+        return root
+
+    for step, (a, b, distance) in enumerate(merges):
+        root_a, root_b = find(int(a)), find(int(b))
+        id_a, id_b = sorted((cluster_id[root_a], cluster_id[root_b]))
+        size = sizes[root_a] + sizes[root_b]
+        result[step] = (id_a, id_b, distance, size)
+
+        parent[root_b] = root_a
+        sizes[root_a] = size
+        cluster_id[root_a] = n + step
+
+    return result
+
+
+def _metric_kwargs(observations: npt.NDArray[np.float64], metric: str) -> dict:
+    """Get metric parameters computed from all observations (as `pdist()` does)."""
+    if metric == "seuclidean":
+        return {"V": np.var(observations, axis=0, ddof=1)}
+    if metric == "mahalanobis":
+        return {"VI": np.linalg.inv(np.cov(observations.T)).T}
+    return {}
+
+
+def _mst_linkage(
+    observations: npt.NDArray[np.float64], metric: str
+) -> npt.NDArray[np.float64]:
+    """Single linkage with Prim's minimum spanning tree (O(n) memory)."""
+    n = len(observations)
+    kwargs = _metric_kwargs(observations, metric)
+
+    in_tree = np.zeros(n, np.bool_)
+    nearest = np.full(n, np.inf)
+    parent = np.zeros(n, np.intp)
+    merges = np.empty((n - 1, 3))
+
+    current = 0
+    in_tree[current] = True
+    for step in range(n - 1):
+        distances = spd.cdist(
+            observations[current : current + 1], observations, metric, **kwargs
+        )[0]
+        closer = ~in_tree & (distances < nearest)
+        nearest[closer] = distances[closer]
+        parent[closer] = current
+
+        current = int(np.argmin(np.where(in_tree, np.inf, nearest)))
+        merges[step] = (parent[current], current, nearest[current])
+        in_tree[current] = True
+
+    return _merges_to_linkage(merges, n, sort=True)
+
+
+class _Clusters:
+    """Centroids and sizes of clusters merged on raw coordinates.
+
+    Squared distances are computed from precomputed norms with a single matrix-vector
+    product, so no temporary (n, features) arrays are allocated.
+    """
+
+    def __init__(self, observations: npt.NDArray[np.float64]):
+        # Centering doesn't change distances, but improves numerical precision.
+        self.centroids = observations - np.mean(observations, axis=0)
+        self.norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.sizes = np.ones(len(observations))
+        self.inactive = np.zeros(len(observations))
+        """Zero for active clusters and infinity for merged ones."""
+
+    def distances(self, point: int, method: str) -> npt.NDArray[np.float64]:
+        """Get squared linkage distances from the cluster to all clusters.
+
+        Arguments:
+            point -- cluster index.
+            method -- `ward`, `centroid` or `median`.
+
+        Returns:
+            Squared distances (infinite for inactive clusters and the cluster itself).
+        """
+        squared = (
+            self.norms
+            + self.norms[point]
+            - 2 * (self.centroids @ self.centroids[point])
+        )
+        np.maximum(squared, 0, out=squared)
+        if method == "ward":
+            squared *= (
+                2 * self.sizes[point] * self.sizes / (self.sizes[point] + self.sizes)
+            )
+        squared += self.inactive
+        squared[point] = np.inf
+        return squared
+
+    def pair_distance(self, a: int, b: int, method: str) -> float:
+        """Get exact linkage distance between two clusters."""
+        squared = float(np.sum((self.centroids[a] - self.centroids[b]) ** 2))
+        if method == "ward":
+            squared *= (
+                2 * self.sizes[a] * self.sizes[b] / (self.sizes[a] + self.sizes[b])
+            )
+        return np.sqrt(squared)
+
+    def merge(self, a: int, b: int, method: str):
+        """Merge cluster b into cluster a."""
+        if method == "median":
+            self.centroids[a] = (self.centroids[a] + self.centroids[b]) / 2
+        else:
+            self.centroids[a] = (
+                self.sizes[a] * self.centroids[a] + self.sizes[b] * self.centroids[b]
+            ) / (self.sizes[a] + self.sizes[b])
+        self.norms[a] = self.centroids[a] @ self.centroids[a]
+        self.sizes[a] += self.sizes[b]
+        self.inactive[b] = np.inf
+
+
+def _nn_chain_linkage(
+    observations: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Ward linkage with the nearest-neighbour chain on raw coordinates."""
+    n = len(observations)
+    clusters = _Clusters(observations)
+    merges = np.empty((n - 1, 3))
+
+    chain: list[int] = []
+    for step in range(n - 1):
+        if len(chain) == 0:
+            chain.append(int(np.argmin(clusters.inactive)))
+
+        while True:
+            a = chain[-1]
+            distances = clusters.distances(a, "ward")
+            b = int(np.argmin(distances))
+            # Prefer the previous chain element on ties, so the chain terminates.
+            if len(chain) > 1 and distances[chain[-2]] <= distances[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+
+        del chain[-2:]
+        merges[step] = (a, b, clusters.pair_distance(a, b, "ward"))
+        clusters.merge(a, b, "ward")
+
+    return _merges_to_linkage(merges, n, sort=True)
+
+
+def _nn_list_linkage(
+    observations: npt.NDArray[np.float64], method: str
+) -> npt.NDArray[np.float64]:
+    """Centroid-based linkage with nearest-neighbour lists on raw coordinates."""
+    n = len(observations)
+    clusters = _Clusters(observations)
+    merges = np.empty((n - 1, 3))
+
+    # Initial nearest neighbours (computed in blocks to bound memory). All clusters
+    # have a single point, so ward distance is the same as centroid distance.
+    nearest = np.empty(n, np.intp)
+    nearest_distance = np.empty(n)
+    block = max(_BLOCK_ELEMENTS // n, 1)
+    for start in range(0, n, block):
+        rows = slice(start, min(start + block, n))
+        squared = spd.cdist(observations[rows], observations, "sqeuclidean")
+        squared[np.arange(rows.stop - start), np.arange(start, rows.stop)] = np.inf
+        nearest[rows] = np.argmin(squared, axis=1)
+        nearest_distance[rows] = squared[np.arange(rows.stop - start), nearest[rows]]
+
+    for step in range(n - 1):
+        a = int(np.argmin(nearest_distance))
+        b = int(nearest[a])
+        merges[step] = (a, b, clusters.pair_distance(a, b, method))
+
+        clusters.merge(a, b, method)
+        nearest_distance[b] = np.inf
+        if step == n - 2:
+            break
+
+        # Update nearest neighbours of the merged cluster and of the other clusters.
+        distances = clusters.distances(a, method)
+        nearest[a] = np.argmin(distances)
+        nearest_distance[a] = distances[nearest[a]]
+
+        closer = distances < nearest_distance
+        nearest[closer] = a
+        nearest_distance[closer] = distances[closer]
+
+        # Clusters, which had the merged clusters as nearest, need a full update.
+        stale = (nearest == b) | ((nearest == a) & ~closer)
+        stale &= clusters.inactive == 0
+        stale[a] = False
+        for point in np.flatnonzero(stale):
+            point_distances = clusters.distances(int(point), method)
+            nearest[point] = np.argmin(point_distances)
+            nearest_distance[point] = point_distances[nearest[point]]
+
+    return _merges_to_linkage(merges, n, sort=False)
+
+
+def _connectivity_linkage(
+    observations: npt.NDArray[np.float64],
+    method: str,
+    metric: str,
+    connectivity: sps.spmatrix | sps.sparray,
+) -> npt.NDArray[np.float64]:
+    """Linkage constrained to the connectivity graph (with scikit-learn)."""
+    from sklearn.cluster import AgglomerativeClustering
+
+    n = len(observations)
+    model = AgglomerativeClustering(
+        n_clusters=None,
+        distance_threshold=0,
+        compute_full_tree=True,
+        connectivity=sps.csr_matrix(connectivity),
+        linkage=method,  # type: ignore
+        metric=metric,
+    ).fit(observations)
+
+    children: npt.NDArray[np.intp] = model.children_
+    sizes = np.ones(2 * n - 1)
+    for step, (a, b) in enumerate(children):
+        sizes[n + step] = sizes[a] + sizes[b]
+
+    return np.column_stack(
+        (
+            np.min(children, axis=1),
+            np.max(children, axis=1),
+            model.distances_,
+            sizes[n:],
+        )
+    ).astype(np.float64)
@@ -0,0 +1,156 @@
+"""Warm-started K-means for interactive seed selection.
+
+Seeds (initial centroids) are picked one by one by the user, and the clustering is
+recomputed after every change. Consecutive clusterings differ by a single seed, so
+`WarmStartKMeans` starts each fit from the centroids found by the previous one (for
+the seeds that are kept) and converges in a fraction of the iterations of a fit from
+the raw seeds. Convergence is detected with a tolerance on centroid movement instead
+of running a fixed number of iterations.
+"""
+
+from typing import Hashable, Literal, Mapping
+
+import numpy as np
+import numpy.typing as npt
+
+Mode = Literal["auto", "lloyd", "elkan", "minibatch"]
+"""K-means algorithm variant."""
+
+MODES: tuple[Mode, ...] = ("auto", "lloyd", "elkan", "minibatch")
+"""All available modes."""
+
+MINIBATCH_MIN_POINTS = 50_000
+"""Minimum number of points for mini-batch K-means in auto mode."""
+
+DEFAULT_TOLERANCE = 1e-4
+"""Default convergence tolerance (relative to the mean feature variance)."""
+
+DEFAULT_MAX_ITER = 300
+"""Default safety limit of iterations (the tolerance normally stops earlier)."""
+
+DEFAULT_BATCH_SIZE = 4096
+"""Default mini-batch size."""
+
+
+def select_mode(n: int) -> Mode:
+    """Select K-means variant for the number of points.
+
+    Arguments:
+        n -- number of points.
+
+    Returns:
+        `minibatch` for large maps, `lloyd` otherwise.
+    """
+    return "minibatch" if n >= MINIBATCH_MIN_POINTS else "lloyd"
+
+
+class WarmStartKMeans:
+    """K-means repeatedly fitted to the same observations with changing seeds.
+
+    Seeds are identified by hashable keys (e.g., points of the map). When a seed with
+    the same key was used in the previous fit, its final centroid is used as the
+    initial one instead of the seed itself.
+    """
+
+    def __init__(
+        self,
+        observations: npt.ArrayLike,
+        mode: Mode = "auto",
+        tolerance: float = DEFAULT_TOLERANCE,
+        max_iter: int = DEFAULT_MAX_ITER,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        random_state: int = 0,
+    ):
+        """Create K-means engine.
+
+        Arguments:
+            observations -- observations (one row per point).
+            mode -- K-means variant (`auto` selects it with `select_mode()`).
+            tolerance -- convergence tolerance.
+            max_iter -- maximum number of iterations (epochs for mini-batch).
+            batch_size -- mini-batch size.
+            random_state -- random state of mini-batch sampling.
+
+        Raises:
+            ValueError: unknown mode.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown K-means mode: {mode}")
+
+        self.observations = np.ascontiguousarray(observations, dtype=np.float64)
+        self.mode: Mode = (
+            select_mode(len(self.observations)) if mode == "auto" else mode
+        )
+        self.tolerance = tolerance
+        self.max_iter = max_iter
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+        self.centroids: dict[Hashable, npt.NDArray[np.float64]] = {}
+        """Final centroids of the last fit by seed key."""
+        self.labels: npt.NDArray[np.int32] | None = None
+        """Cluster labels of the last fit (indexes of the seeds)."""
+        self.n_iter = 0
+        """Number of iterations of the last fit."""
+
+    def initial_centroids(
+        self, seeds: Mapping[Hashable, npt.ArrayLike]
+    ) -> npt.NDArray[np.float64]:
+        """Get initial centroids for the seeds (warm-started where possible).
+
+        Arguments:
+            seeds -- seed observations by key.
+
+        Returns:
+            Initial centroids (one row per seed).
+        """
+        return np.array(
+            [self.centroids.get(key, seed) for key, seed in seeds.items()],
+            dtype=np.float64,
+        )
+
+    def fit(self, seeds: Mapping[Hashable, npt.ArrayLike]) -> npt.NDArray[np.int32]:
+        """Cluster the observations starting from the seeds.
+
+        Arguments:
+            seeds -- seed observations by key (in the order of cluster labels).
+
+        Raises:
+            ValueError: there are no seeds.
+
+        Returns:
+            Cluster labels (indexes of the seeds).
+        """
+        if len(seeds) == 0:
+            raise ValueError("At least one seed is needed for K-means.")
+
+        # scikit-learn is imported only when clustering runs, not with the page.
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+
+        init = self.initial_centroids(seeds)
+        if self.mode == "minibatch":
+            model: KMeans | MiniBatchKMeans = MiniBatchKMeans(
+                n_clusters=len(init),
+                init=init,
+                n_init=1,
+                max_iter=self.max_iter,
+                batch_size=self.batch_size,
+                tol=self.tolerance,
+                random_state=self.random_state,
+            )
+        else:
+            model = KMeans(
+                n_clusters=len(init),
+                init=init,
+                n_init=1,
+                max_iter=self.max_iter,
+                tol=self.tolerance,
+                # Elkan's algorithm needs at least two clusters.
+                algorithm=self.mode if len(init) > 1 else "lloyd",
+            )
+        model.fit(self.observations)
+
+        self.centroids = dict(zip(seeds, model.cluster_centers_))
+        self.labels = model.labels_.astype(np.int32)
+        self.n_iter = model.n_iter_
+        return self.labels
@@ -0,0 +1,318 @@
+"""Gaussian mixture models of phases with soft assignments.
+
+Each phase (cluster) is a multivariate normal distribution, and the model gives the
+probability of each phase for each point (responsibilities) instead of a hard label,
+so phase fractions can be reported with their uncertainty.
+
+The model is fitted with expectation-maximization (EM) warm-started from hard labels
+(e.g., K-means clusters of the seeds picked by the user), which converges in a few
+iterations. Both steps are vectorized over the points, and only the n × k
+responsibilities and an n × d array of a single component are kept, so memory is
+O(n·k) for n points, k phases, and a few features d.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Literal, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+CovarianceType = Literal["full", "diag"]
+"""Covariance matrices of phases (full or diagonal, i.e., independent features)."""
+
+COVARIANCE_TYPES: tuple[CovarianceType, ...] = ("full", "diag")
+"""All covariance types."""
+
+DEFAULT_TOLERANCE = 1e-3
+"""Default convergence tolerance (change of the mean log-likelihood per point)."""
+
+DEFAULT_MAX_ITER = 100
+"""Default safety limit of EM iterations."""
+
+DEFAULT_REGULARIZATION = 1e-6
+"""Default variance added to covariance diagonals (keeps them positive-definite)."""
+
+
+@dataclass(frozen=True)
+class GaussianMixture:
+    """Fitted Gaussian mixture with responsibilities of the observations."""
+
+    weights: npt.NDArray[np.float64]
+    """Prior probability (overall fraction) of each phase."""
+    means: npt.NDArray[np.float64]
+    """Mean of each phase (phases × features)."""
+    covariances: npt.NDArray[np.float64]
+    """Covariance of each phase (phases × features × features, or phases × features
+    variances for the diagonal type)."""
+    covariance_type: CovarianceType
+    """Covariance type."""
+    responsibilities: npt.NDArray[np.float64]
+    """Probability of each phase for each observation (points × phases)."""
+    log_likelihood: float
+    """Mean log-likelihood of the observations per point."""
+    n_iter: int
+    """Number of EM iterations."""
+    converged: bool
+    """True if the tolerance was reached before the iteration limit."""
+
+    @cached_property
+    def labels(self) -> npt.NDArray[np.int32]:
+        """Most probable phase of each observation."""
+        return np.argmax(self.responsibilities, axis=1).astype(np.int32)
+
+    @cached_property
+    def full_covariances(self) -> npt.NDArray[np.float64]:
+        """Covariance matrix of each phase (phases × features × features)."""
+        if self.covariance_type == "full":
+            return self.covariances
+        return self.covariances[:, :, np.newaxis] * np.eye(self.covariances.shape[1])
+
+    @property
+    def parameter_count(self) -> int:
+        """Number of free parameters of the model."""
+        count, features = self.means.shape
+        covariance = (
+            features * (features + 1) // 2
+            if self.covariance_type == "full"
+            else features
+        )
+        return count * (features + covariance) + count - 1
+
+    def bic(self) -> float:
+        """Get Bayesian information criterion of the model (lower is better)."""
+        n = len(self.responsibilities)
+        return -2 * n * self.log_likelihood + self.parameter_count * np.log(n)
+
+
+def log_densities(
+    observations: npt.NDArray[np.float64],
+    means: npt.NDArray[np.float64],
+    covariances: npt.NDArray[np.float64],
+    covariance_type: CovarianceType = "full",
+) -> npt.NDArray[np.float64]:
+    """Get log probability density of each observation in each phase.
+
+    Arguments:
+        observations -- observations (one row per point).
+        means -- mean of each phase.
+        covariances -- covariance of each phase (see `GaussianMixture.covariances`).
+        covariance_type -- covariance type.
+
+    Raises:
+        ValueError: a covariance matrix isn't positive-definite.
+
+    Returns:
+        Log densities (points × phases).
+    """
+    n, features = observations.shape
+    constant = features * np.log(2 * np.pi)
+    if covariance_type == "diag":
+        # Squared Mahalanobis distances of all phases with three matrix products.
+        precisions = 1 / covariances
+        squared = (
+            observations**2 @ precisions.T
+            - 2 * observations @ (means * precisions).T
+            + np.sum(means**2 * precisions, axis=1)
+        )
+        log_det = np.sum(np.log(covariances), axis=1)
+        return -0.5 * (constant + log_det + squared)
+
+    import scipy.linalg
+
+    result = np.empty((n, len(means)))
+    for phase, (mean, covariance) in enumerate(zip(means, covariances)):
+        try:
+            cholesky = scipy.linalg.cholesky(covariance, lower=True)
+        except np.linalg.LinAlgError as e:
+            raise ValueError(
+                "Covariance of a phase isn't positive-definite (too few distinct "
+                "points), use fewer phases or diagonal covariance."
+            ) from e
+        # Whitened differences (a single n × d array at a time).
+        whitened = scipy.linalg.solve_triangular(
+            cholesky, (observations - mean).T, lower=True
+        )
+        log_det = 2 * np.sum(np.log(np.diag(cholesky)))
+        result[:, phase] = -0.5 * (
+            constant + log_det + np.einsum("ij,ij->j", whitened, whitened)
+        )
+    return result
+
+
+def estimate_parameters(
+    observations: npt.NDArray[np.float64],
+    responsibilities: npt.NDArray[np.float64],
+    covariance_type: CovarianceType = "full",
+    regularization: float = DEFAULT_REGULARIZATION,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Estimate parameters of phases from responsibilities (M-step).
+
+    Arguments:
+        observations -- observations (one row per point).
+        responsibilities -- probability of each phase for each point.
+        covariance_type -- covariance type.
+        regularization -- variance added to covariance diagonals.
+
+    Returns:
+        Weights, means and covariances of the phases.
+    """
+    # Empty phases keep a tiny weight, so they don't divide by zero.
+    totals = np.sum(responsibilities, axis=0) + 10 * np.finfo(np.float64).eps
+    means = responsibilities.T @ observations / totals[:, np.newaxis]
+    if covariance_type == "diag":
+        covariances = (
+            responsibilities.T @ observations**2 / totals[:, np.newaxis] - means**2
+        )
+        covariances = np.maximum(covariances, 0) + regularization
+    else:
+        features = observations.shape[1]
+        covariances = np.empty((len(means), features, features))
+        for phase, mean in enumerate(means):
+            difference = observations - mean
+            covariances[phase] = (
+                responsibilities[:, phase] * difference.T
+            ) @ difference / totals[phase] + regularization * np.eye(features)
+    return totals / len(observations), means, covariances
+
+
+def fit(
+    observations: npt.ArrayLike,
+    labels: npt.ArrayLike,
+    cluster_count: int | None = None,
+    covariance_type: CovarianceType = "full",
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iter: int = DEFAULT_MAX_ITER,
+    regularization: float = DEFAULT_REGULARIZATION,
+) -> GaussianMixture:
+    """Fit Gaussian mixture warm-started from hard labels.
+
+    Arguments:
+        observations -- observations (one row per point).
+        labels -- initial phase of each point (e.g., K-means labels from 0).
+        cluster_count -- number of phases (the maximum label + 1 by default).
+        covariance_type -- covariance type.
+        tolerance -- convergence tolerance.
+        max_iter -- maximum number of EM iterations.
+        regularization -- variance added to covariance diagonals.
+
+    Raises:
+        ValueError: unknown covariance type, no observations, or a degenerate phase.
+
+    Returns:
+        Fitted model with responsibilities of the observations.
+    """
+    import scipy.special
+
+    if covariance_type not in COVARIANCE_TYPES:
+        raise ValueError(f"Unknown covariance type: {covariance_type}")
+    observations = np.ascontiguousarray(observations, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.intp)
+    if len(observations) == 0:
+        raise ValueError("Gaussian mixture needs at least one observation.")
+    cluster_count = int(np.max(labels)) + 1 if cluster_count is None else cluster_count
+
+    responsibilities = np.zeros((len(observations), cluster_count))
+    responsibilities[np.arange(len(labels)), labels] = 1
+    log_likelihood = -np.inf
+    converged = False
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        weights, means, covariances = estimate_parameters(
+            observations, responsibilities, covariance_type, regularization
+        )
+        # E-step (in place, so there is a single n × k array).
+        responsibilities = log_densities(
+            observations, means, covariances, covariance_type
+        )
+        responsibilities += np.log(weights)
+        norms = scipy.special.logsumexp(responsibilities, axis=1)
+        responsibilities -= norms[:, np.newaxis]
+        np.exp(responsibilities, out=responsibilities)
+
+        previous, log_likelihood = log_likelihood, float(np.mean(norms))
+        if abs(log_likelihood - previous) < tolerance:
+            converged = True
+            break
+
+    return GaussianMixture(
+        weights,
+        means,
+        covariances,
+        covariance_type,
+        responsibilities,
+        log_likelihood,
+        iteration,
+        converged,
+    )
+
+
+def describe_components(
+    model: GaussianMixture,
+    columns: Sequence[str],
+    offset: npt.ArrayLike = 0.0,
+    scale: npt.ArrayLike = 1.0,
+) -> pd.DataFrame:
+    """Get mean and covariance of each phase in feature units.
+
+    Arguments:
+        model -- fitted model.
+        columns -- feature names.
+        offset -- mean of features subtracted by normalization.
+        scale -- standard deviation of features divided by normalization.
+
+    Returns:
+        Tidy data frame indexed by (cluster, statistic) with a column per feature.
+        Statistics are `mean` and the covariance with each feature (`cov <feature>`).
+    """
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), len(columns))
+    # Constant features are zeroed by normalization, so they have no scale.
+    scale = np.where(scale > 0, scale, 1.0)
+    means = model.means * scale + offset
+    covariances = model.full_covariances * np.outer(scale, scale)
+    return pd.concat(
+        {
+            cluster: pd.DataFrame(
+                np.vstack((mean, covariance)),
+                index=["mean", *(f"cov {column}" for column in columns)],
+                columns=list(columns),
+            )
+            for cluster, (mean, covariance) in enumerate(zip(means, covariances))
+        },
+        names=["cluster", "statistic"],
+    )
+
+
+def phase_fractions(responsibilities: npt.ArrayLike) -> pd.DataFrame:
+    """Get fraction of each phase with its uncertainty from soft assignments.
+
+    Arguments:
+        responsibilities -- probability of each phase for each point.
+
+    Returns:
+        Data frame with a row per phase (cluster) and columns `area fraction` (of
+        the most probable phases), `soft fraction` (expected fraction), `std. error`
+        of the soft fraction (the points are independent Bernoulli trials), and
+        `mean uncertainty` (one minus the probability of the most probable phase of
+        the points of the phase).
+    """
+    responsibilities = np.asarray(responsibilities, dtype=np.float64)
+    n, count = responsibilities.shape
+    labels = np.argmax(responsibilities, axis=1)
+    hard = np.bincount(labels, minlength=count)
+    uncertainty = np.bincount(
+        labels, 1 - np.max(responsibilities, axis=1), minlength=count
+    )
+    return pd.DataFrame(
+        {
+            "area fraction": hard / n,
+            "soft fraction": np.sum(responsibilities, axis=0) / n,
+            "std. error": np.sqrt(
+                np.sum(responsibilities * (1 - responsibilities), axis=0)
+            )
+            / n,
+            "mean uncertainty": uncertainty / np.maximum(hard, 1),
+        },
+        index=pd.RangeIndex(count, name="cluster"),
+    )
@@ -0,0 +1,242 @@
+"""Clustering of report data frames with any backend.
+
+`cluster()` prepares the feature matrix of a data frame (a single map or a project of
+stacked maps, see `amorphous_metals.project`) and runs the backend selected by
+`ClusteringConfig` with the same defaults as the Streamlit application, so results of
+scripted runs match the interactive ones.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import scipy.sparse as sps
+
+from amorphous_metals import convert, grid, project
+from amorphous_metals.cluster import density, hierarchical, kmeans, mixture, spatial
+from amorphous_metals.cluster.features import feature_matrix, valid_mask
+
+LINKAGE_METHODS = (
+    "single",
+    "complete",
+    "average",
+    "centroid",
+    "median",
+    "ward",
+    "weighted",
+)
+"""Hierarchical clustering (linkage) methods."""
+
+METHODS = (*LINKAGE_METHODS, "kmeans", "gmm", "optics", "dbscan")
+"""All clustering methods."""
+
+
+@dataclass(frozen=True)
+class ClusteringConfig:
+    """Clustering method and its parameters."""
+
+    method: str = "centroid"
+    """Linkage method (see `LINKAGE_METHODS`), `kmeans`, `gmm`, `optics` or `dbscan`."""
+    features: tuple[str, ...] = convert.DEFAULT_COLUMNS
+    """Features used for clustering."""
+    normalize: bool = True
+    """Normalize features (center and divide by std)."""
+    cluster_count: int = 3
+    """Number of clusters (hierarchical clustering, K-means and Gaussian mixture)."""
+    metric: str = "euclidean"
+    """Distance metric of hierarchical clustering."""
+    grid_constrained: bool = False
+    """Merge only neighbouring points in hierarchical clustering."""
+    neighbours: int = 4
+    """Neighbours of grid cells (4 or 8) of grid-constrained clustering or smoothing."""
+    kmeans_mode: kmeans.Mode = "auto"
+    """K-means variant."""
+    min_samples: int = 10
+    """Number of neighbours (including the point) of core points (OPTICS, DBSCAN)."""
+    radius: float | None = None
+    """Neighbourhood radius of OPTICS and DBSCAN (None suggests it from the data)."""
+    xi: float = 0.0001
+    """Minimum steepness of OPTICS reachability plot cluster boundaries."""
+    min_cluster_size: int = 10
+    """Minimum OPTICS cluster size."""
+    random_state: int = 0
+    """Random state of K-means seeding and mini-batch sampling."""
+    smoothing: float = 0.0
+    """Strength of spatial smoothing of K-means labels (0 disables it)."""
+    covariance_type: mixture.CovarianceType = "full"
+    """Covariance of phases of Gaussian mixture."""
+
+
+def map_connectivity(
+    map_grid: grid.Grid, mask: npt.NDArray[np.bool_], neighbours: int = 4
+) -> sps.csr_array:
+    """Build connectivity graph of the points of a map.
+
+    Arguments:
+        map_grid -- grid of the map (see `grid.from_df()`).
+        mask -- mask of the map rows, True for points passed to clustering.
+        neighbours -- 4 or 8 neighbours of each grid cell.
+
+    Returns:
+        Symmetric sparse adjacency matrix of the valid points (in their order).
+    """
+    # Graph of the valid cells (in cell order).
+    graph = hierarchical.grid_connectivity(
+        map_grid.image(mask, fill=False).ravel(), map_grid.columns, neighbours
+    )
+    if map_grid.is_dense:
+        return graph
+
+    # Reorder nodes from cell order to the order of the points.
+    order = np.argsort(map_grid.cells[mask], kind="stable")
+    nodes = np.empty_like(order)
+    nodes[order] = np.arange(len(order))
+    return graph[nodes][:, nodes]
+
+
+def map_grids(df: pd.DataFrame) -> list[tuple[slice, grid.Grid]]:
+    """Get rows and grid of each map (samples of a project are separate maps)."""
+    samples = (
+        project.sample_slices(df).values()
+        if project.is_project(df)
+        else (slice(0, len(df)),)
+    )
+    return [(rows, grid.from_df(df.iloc[rows])) for rows in samples]
+
+
+def grid_connectivity(
+    df: pd.DataFrame, mask: npt.NDArray[np.bool_] | None = None, neighbours: int = 4
+) -> sps.csr_matrix:
+    """Build connectivity graph of the indentation grid(s).
+
+    Maps of a project are separate grids (see `map_connectivity()`).
+
+    Arguments:
+        df -- source data frame (a single map or a project).
+        mask -- precomputed `valid_mask()` of the data frame.
+        neighbours -- 4 or 8 neighbours of each grid cell.
+
+    Returns:
+        Sparse adjacency matrix of the rows without holes.
+    """
+    mask = valid_mask(df) if mask is None else mask
+    return sps.block_diag(
+        [
+            map_connectivity(map_grid, mask[rows], neighbours)
+            for rows, map_grid in map_grids(df)
+        ],
+        format="csr",
+    )
+
+
+def grid_groups(
+    df: pd.DataFrame, mask: npt.NDArray[np.bool_] | None = None
+) -> npt.NDArray[np.intp]:
+    """Split rows into 4 groups without neighbours (2×2 checkerboard of the grids).
+
+    Arguments:
+        df -- source data frame (a single map or a project).
+        mask -- precomputed `valid_mask()` of the data frame.
+
+    Returns:
+        Group of each row without holes (see `spatial.smooth_labels()`).
+    """
+    mask = valid_mask(df) if mask is None else mask
+    groups = []
+    for rows, map_grid in map_grids(df):
+        row, column = np.divmod(map_grid.cells[mask[rows]], map_grid.columns)
+        groups.append(2 * (row % 2) + column % 2)
+    return np.concatenate(groups)
+
+
+def cluster(
+    df: pd.DataFrame,
+    config: ClusteringConfig | None = None,
+    mask: npt.NDArray[np.bool_] | None = None,
+) -> npt.NDArray[np.int_]:
+    """Cluster data frame rows without holes.
+
+    Arguments:
+        df -- source data frame (a single map or a project).
+        config -- clustering method and parameters (defaults of `ClusteringConfig`).
+        mask -- precomputed `valid_mask()` of the data frame.
+
+    Raises:
+        ValueError: unknown method or invalid parameters.
+
+    Returns:
+        Cluster labels of the rows without holes (hierarchical clusters start from 1,
+        K-means and Gaussian mixture ones from 0, and density-based noise is -1).
+    """
+    config = ClusteringConfig() if config is None else config
+    missing = [feature for feature in config.features if feature not in df.columns]
+    if len(missing) > 0:
+        raise ValueError("Data doesn't contain features: " + ", ".join(missing))
+
+    mask = valid_mask(df) if mask is None else mask
+    observations = feature_matrix(df, config.features, config.normalize, mask).values
+    if (
+        config.method in (*LINKAGE_METHODS, "kmeans", "gmm")
+        and len(observations) < config.cluster_count
+    ):
+        raise ValueError(
+            f"There are fewer points ({len(observations)}) than clusters "
+            f"({config.cluster_count})."
+        )
+
+    if config.method in LINKAGE_METHODS:
+        linkage = hierarchical.linkage(
+            observations,
+            config.method,
+            config.metric,
+            connectivity=(
+                grid_connectivity(df, mask, config.neighbours)
+                if config.grid_constrained
+                else None
+            ),
+        )
+        return hierarchical.cut(linkage, (config.cluster_count,))[0]
+
+    if config.method in ("kmeans", "gmm"):
+        from sklearn.cluster import kmeans_plusplus
+
+        seeds, _ = kmeans_plusplus(
+            observations, config.cluster_count, random_state=config.random_state
+        )
+        labels = kmeans.WarmStartKMeans(
+            observations, config.kmeans_mode, random_state=config.random_state
+        ).fit(dict(enumerate(seeds)))
+        if config.method == "gmm":
+            # Warm-started from K-means (as from the seeds on the K-means page).
+            return mixture.fit(
+                observations, labels, config.cluster_count, config.covariance_type
+            ).labels
+        if config.smoothing > 0:
+            labels = spatial.smooth_labels(
+                observations,
+                labels,
+                grid_connectivity(df, mask, config.neighbours),
+                config.smoothing,
+                grid_groups(df, mask),
+                config.cluster_count,
+            )
+        return labels
+
+    if config.method in ("optics", "dbscan"):
+        radius = (
+            density.suggest_radius(observations, config.min_samples)
+            if config.radius is None
+            else config.radius
+        )
+        if radius <= 0:
+            # The suggested radius is zero for a single point or duplicate points.
+            raise ValueError(f"Neighbourhood radius must be positive (got {radius}).")
+        graph = density.neighbor_graph(observations, radius, config.min_samples)
+        if config.method == "dbscan":
+            return density.dbscan(graph, radius, config.min_samples).labels_
+        return density.optics(
+            graph, config.min_samples, config.xi, config.min_cluster_size, radius
+        ).labels_
+
+    raise ValueError(f"Unknown clustering method: {config.method}")
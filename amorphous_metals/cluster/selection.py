@@ -0,0 +1,283 @@
+"""Automatic selection of the number of clusters.
+
+Candidate clusterings (K-means and Gaussian mixtures for each cluster count, plus any
+precomputed labels, e.g., cuts of a hierarchy) are scored with several criteria:
+
+- `silhouette` -- mean silhouette coefficient (higher is better),
+- `calinski_harabasz` -- ratio of between- and within-cluster dispersion (higher is
+  better),
+- `gap` -- gap statistic, the log within-cluster dispersion of uniform reference data
+  minus that of the clustered data (higher is better),
+- `bic` -- Bayesian information criterion of Gaussian mixtures (lower is better).
+
+The silhouette needs all pairwise distances, i.e., O(n²) time, so it is computed on a
+random sample of points, as is the gap statistic (whose reference data are clustered
+many times). The candidates are fitted in parallel threads: the heavy lifting is done
+by NumPy and scikit-learn, which release the GIL, so threads use all cores without
+copying the observations to other processes.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Literal, Mapping, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from amorphous_metals.cluster import kmeans, mixture
+
+Score = Literal["silhouette", "calinski_harabasz", "gap", "bic"]
+"""Criterion of the number of clusters."""
+
+SCORES: tuple[Score, ...] = ("silhouette", "calinski_harabasz", "gap", "bic")
+"""All criteria (in the order of the last axis of `sweep()` results)."""
+
+COLUMNS = (*SCORES, "gap_error")
+"""Last axis of `sweep()` results, criteria followed by the standard error of the gap
+statistic (the same for all candidates)."""
+
+LOWER_IS_BETTER: tuple[Score, ...] = ("bic",)
+"""Criteria minimized by the best number of clusters (the others are maximized)."""
+
+Method = Literal["kmeans", "gmm"]
+"""Clustering method fitted for each candidate number of clusters."""
+
+METHODS: tuple[Method, ...] = ("kmeans", "gmm")
+"""All methods fitted by `sweep()`."""
+
+DEFAULT_CLUSTER_COUNTS = range(2, 11)
+"""Default candidate numbers of clusters."""
+
+SAMPLE_SIZE = 2000
+"""Number of points of the silhouette and the gap statistic."""
+
+GAP_REFERENCES = 5
+"""Number of uniform reference data sets of the gap statistic."""
+
+
+def _fit(
+    observations: npt.NDArray[np.float64],
+    method: Method,
+    cluster_count: int,
+    random_state: int,
+) -> tuple[npt.NDArray[np.int32], float]:
+    """Cluster observations with the method.
+
+    Returns:
+        Cluster labels and BIC (NaN for K-means).
+    """
+    from sklearn.cluster import kmeans_plusplus
+
+    seeds, _ = kmeans_plusplus(observations, cluster_count, random_state=random_state)
+    engine = kmeans.WarmStartKMeans(observations, random_state=random_state)
+    labels = engine.fit(dict(enumerate(seeds)))
+    if method == "kmeans":
+        return labels, np.nan
+
+    # Gaussian mixtures are warm-started from K-means as on the K-means page.
+    model = mixture.fit(observations, labels, cluster_count)
+    return model.labels, model.bic()
+
+
+def log_dispersion(
+    observations: npt.NDArray[np.float64], labels: npt.NDArray[np.integer]
+) -> float:
+    """Get log of the pooled within-cluster sum of squares (as in the gap statistic).
+
+    Arguments:
+        observations -- observations (one row per point).
+        labels -- cluster of each point.
+
+    Returns:
+        Log within-cluster dispersion.
+    """
+    _, labels = np.unique(labels, return_inverse=True)
+    counts = np.bincount(labels)
+    sums = np.zeros((len(counts), observations.shape[1]))
+    np.add.at(sums, labels, observations)
+    # Sum of squares around centroids without the n × d array of differences.
+    squares = np.sum(observations**2) - np.sum(sums**2 / counts[:, np.newaxis])
+    return float(np.log(max(squares, np.finfo(np.float64).tiny)))
+
+
+def reference_log_dispersion(
+    sample: npt.NDArray[np.float64],
+    cluster_count: int,
+    references: int = GAP_REFERENCES,
+    random_state: int = 0,
+) -> tuple[float, float]:
+    """Get expected log dispersion of uniform data clustered with K-means.
+
+    Arguments:
+        sample -- observations defining the bounding box of the reference data.
+        cluster_count -- number of clusters.
+        references -- number of reference data sets.
+        random_state -- random state of reference data and K-means seeding.
+
+    Returns:
+        Mean log within-cluster dispersion of the reference data sets and its
+        standard error for the gap statistic, i.e., sd·sqrt(1 + 1/B) for B reference
+        data sets (Tibshirani et al.).
+    """
+    from sklearn.cluster import KMeans
+
+    rng = np.random.default_rng(random_state)
+    low, high = np.min(sample, axis=0), np.max(sample, axis=0)
+    dispersions = []
+    for _ in range(references):
+        reference = rng.uniform(low, high, sample.shape)
+        model = KMeans(cluster_count, n_init=1, random_state=random_state)
+        dispersions.append(log_dispersion(reference, model.fit_predict(reference)))
+    return (
+        float(np.mean(dispersions)),
+        float(np.std(dispersions) * np.sqrt(1 + 1 / references)),
+    )
+
+
+def score_labels(
+    observations: npt.NDArray[np.float64],
+    labels: npt.NDArray[np.integer],
+    sample: npt.NDArray[np.intp],
+    random_state: int = 0,
+) -> tuple[float, float, float]:
+    """Score clustering with criteria that don't need refitting.
+
+    Arguments:
+        observations -- observations (one row per point).
+        labels -- cluster of each point.
+        sample -- indexes of the points of the silhouette and the log dispersion.
+        random_state -- random state of the silhouette.
+
+    Returns:
+        Silhouette, Calinski-Harabasz index and log dispersion of the sample (NaN if
+        the labels have a single cluster).
+    """
+    from sklearn.metrics import calinski_harabasz_score, silhouette_score
+
+    if len(np.unique(labels[sample])) < 2:
+        return np.nan, np.nan, np.nan
+    return (
+        float(
+            silhouette_score(
+                observations[sample], labels[sample], random_state=random_state
+            )
+        ),
+        float(calinski_harabasz_score(observations, labels)),
+        log_dispersion(observations[sample], labels[sample]),
+    )
+
+
+def sweep(
+    observations: npt.ArrayLike,
+    cluster_counts: Iterable[int] = DEFAULT_CLUSTER_COUNTS,
+    methods: Sequence[Method] = METHODS,
+    labels: Mapping[str, npt.ArrayLike] | None = None,
+    jobs: int | None = None,
+    random_state: int = 0,
+) -> npt.NDArray[np.float64]:
+    """Score candidate clusterings for each number of clusters.
+
+    Arguments:
+        observations -- observations (one row per point).
+        cluster_counts -- candidate numbers of clusters.
+        methods -- clustering methods fitted for each number of clusters.
+        labels -- additional precomputed candidates by name, cluster labels of each
+            point with one row per number of clusters (e.g., `hierarchical.cut()`).
+        jobs -- number of threads (defaults to CPU count).
+        random_state -- random state of fitting and sampling.
+
+    Raises:
+        ValueError: there are fewer points than the largest number of clusters.
+
+    Returns:
+        Scores of candidates (methods and then labels) × numbers of clusters ×
+        `COLUMNS` (NaN where a criterion doesn't apply).
+    """
+    observations = np.ascontiguousarray(observations, dtype=np.float64)
+    counts = list(cluster_counts)
+    if len(counts) > 0 and len(observations) < max(counts):
+        raise ValueError(
+            f"There are fewer points ({len(observations)}) than clusters "
+            f"({max(counts)})."
+        )
+    # Each candidate is a method to fit or precomputed labels (one row per count).
+    candidates: list[Method | npt.NDArray[np.int32]] = [
+        *methods,
+        *(np.asarray(rows, dtype=np.int32) for rows in (labels or {}).values()),
+    ]
+
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(
+        rng.choice(len(observations), min(SAMPLE_SIZE, len(observations)), False)
+    )
+
+    def evaluate(candidate: Method | npt.NDArray[np.int32], row: int) -> list[float]:
+        if isinstance(candidate, str):
+            clusters, bic = _fit(observations, candidate, counts[row], random_state)
+        else:
+            clusters, bic = candidate[row], np.nan
+        return [*score_labels(observations, clusters, sample, random_state), bic]
+
+    def expected_dispersion(count: int) -> tuple[float, float]:
+        return reference_log_dispersion(
+            observations[sample], count, random_state=random_state
+        )
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        futures = [
+            [executor.submit(evaluate, candidate, row) for row in range(len(counts))]
+            for candidate in candidates
+        ]
+        expected = np.array(
+            list(executor.map(expected_dispersion, counts)), dtype=np.float64
+        ).reshape((len(counts), 2))
+        scores = np.array(
+            [[future.result() for future in row] for row in futures], dtype=np.float64
+        ).reshape((len(candidates), len(counts), len(SCORES)))
+
+    # Log dispersion of the data is replaced by the gap.
+    gap = SCORES.index("gap")
+    scores[:, :, gap] = expected[:, 0] - scores[:, :, gap]
+    errors = np.broadcast_to(expected[:, 1], (len(candidates), len(counts)))
+    return np.concatenate((scores, errors[:, :, np.newaxis]), axis=2)
+
+
+def best_counts(
+    scores: npt.NDArray[np.float64], cluster_counts: Iterable[int]
+) -> npt.NDArray[np.float64]:
+    """Get the best number of clusters of each candidate by each criterion.
+
+    The best number of the gap statistic is the smallest k with
+    Gap(k) ≥ Gap(k + 1) - s(k + 1), where s is the standard error of the reference
+    dispersions (Tibshirani et al.), instead of the global maximum, as the gap of real
+    data often keeps growing slowly with the number of clusters.
+
+    Arguments:
+        scores -- results of `sweep()` (with `COLUMNS`).
+        cluster_counts -- numbers of clusters of the results.
+
+    Returns:
+        Best numbers of clusters (candidates × `SCORES`, NaN where a criterion doesn't
+        apply).
+    """
+    counts = np.asarray(list(cluster_counts), dtype=np.float64)
+    best = np.full((scores.shape[0], len(SCORES)), np.nan)
+    for column, score in enumerate(SCORES):
+        values = scores[:, :, column]
+        if score in LOWER_IS_BETTER:
+            values = -values
+        valid = np.any(np.isfinite(values), axis=1)
+        finite = np.where(np.isfinite(values[valid]), values[valid], -np.inf)
+        if score == "gap":
+            # The first count within a standard error of the next one (or the last).
+            errors = np.nan_to_num(scores[valid, :, COLUMNS.index("gap_error")])
+            local = np.column_stack(
+                (
+                    finite[:, :-1] >= finite[:, 1:] - errors[:, 1:],
+                    np.ones(len(finite), np.bool_),
+                )
+            )
+            best[valid, column] = counts[np.argmax(local & np.isfinite(finite), axis=1)]
+        else:
+            best[valid, column] = counts[np.argmax(finite, axis=1)]
+    return best
@@ -0,0 +1,122 @@
+"""Spatial smoothing of cluster labels on the indentation grid.
+
+Clustering backends treat data points as an unordered cloud, so noisy points get
+labels of other phases even when all their neighbours on the map agree. The smoothing
+treats labels as a Markov random field with the Potts model: the energy of a label is
+the squared distance of the point from the cluster centroid plus a penalty for each
+neighbour with a different label, and the energy is minimized with iterated
+conditional modes (ICM), refitting the centroids after each sweep.
+
+Only the sparse neighbour graph is used (see `hierarchical.grid_connectivity()`), so
+each sweep takes O(n·k) time and memory for n points and k clusters.
+"""
+
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sps
+
+DEFAULT_MAX_ITER = 20
+"""Default maximum number of sweeps (usually converges in a few)."""
+
+
+def centroids(
+    observations: npt.NDArray[np.float64],
+    labels: npt.NDArray[np.integer],
+    previous: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Get centroids of clusters (the previous centroids of empty clusters).
+
+    Arguments:
+        observations -- observations (one row per point).
+        labels -- cluster of each point.
+        previous -- previous centroids (one row per cluster).
+
+    Returns:
+        Centroids (one row per cluster).
+    """
+    counts = np.bincount(labels, minlength=len(previous))
+    sums = np.zeros_like(previous)
+    np.add.at(sums, labels, observations)
+    return np.where(
+        counts[:, np.newaxis] > 0,
+        sums / np.maximum(counts, 1)[:, np.newaxis],
+        previous,
+    )
+
+
+def smooth_labels(
+    observations: npt.ArrayLike,
+    labels: npt.ArrayLike,
+    graph: sps.spmatrix | sps.sparray,
+    strength: float,
+    groups: npt.ArrayLike | None = None,
+    cluster_count: int | None = None,
+    max_iter: int = DEFAULT_MAX_ITER,
+) -> npt.NDArray[np.int32]:
+    """Smooth cluster labels with neighbours on the grid.
+
+    Points of a group are updated together, so they must not be neighbours of each
+    other (e.g., a checkerboard of the grid, see `pipeline.grid_groups()`). Updating
+    neighbours at once can make them swap their labels forever instead of agreeing.
+
+    Arguments:
+        observations -- observations (one row per point).
+        labels -- initial cluster of each point (e.g., K-means labels).
+        graph -- symmetric sparse adjacency matrix of the points.
+        strength -- penalty of a neighbour with a different label (relative to the
+            mean squared distance of points from their centroids), 0 keeps labels.
+        groups -- group of each point (all points are a single group by default).
+        cluster_count -- number of clusters (the maximum label + 1 by default).
+        max_iter -- maximum number of sweeps.
+
+    Returns:
+        Smoothed cluster labels.
+    """
+    observations = np.asarray(observations, dtype=np.float64)
+    labels = np.array(labels, dtype=np.int32)
+    if strength <= 0 or len(labels) == 0:
+        return labels
+    cluster_count = int(np.max(labels)) + 1 if cluster_count is None else cluster_count
+    groups = np.zeros(len(labels), np.intp) if groups is None else np.asarray(groups)
+    graph = sps.csr_array(graph)
+    # Points of each group with their rows of the graph.
+    members = [
+        (points, graph[points])
+        for points in (np.flatnonzero(groups == group) for group in np.unique(groups))
+    ]
+
+    centers = centroids(
+        observations, labels, np.zeros((cluster_count, observations.shape[1]))
+    )
+    # Squared distances are relative to their mean, so the strength has the same
+    # meaning for any features (and normalization).
+    scale = np.mean(np.sum((observations - centers[labels]) ** 2, axis=1))
+    scale = scale if scale > 0 else 1.0
+    squared_norms = np.sum(observations**2, axis=1)
+
+    for _ in range(max_iter):
+        changed = 0
+        for points, neighbours in members:
+            # Squared distances from centroids (n × k, without the n × k × d array).
+            energy = (
+                squared_norms[points, np.newaxis]
+                - 2 * observations[points] @ centers.T
+                + np.sum(centers**2, axis=1)
+            ) / scale
+            # Penalties of the other labels are the same for all labels but the
+            # labels of neighbours, so only neighbours with each label are counted.
+            neighbour_labels = sps.csr_array(
+                (
+                    np.ones(len(labels)),
+                    (np.arange(len(labels)), labels),
+                ),
+                shape=(len(labels), cluster_count),
+            )
+            energy -= strength * (neighbours @ neighbour_labels).toarray()
+            updated = np.argmin(energy, axis=1).astype(np.int32)
+            changed += int(np.count_nonzero(updated != labels[points]))
+            labels[points] = updated
+        if changed == 0:
+            break
+        centers = centroids(observations, labels, centers)
+    return labels
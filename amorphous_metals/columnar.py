@@ -0,0 +1,222 @@
+"""Columnar binary cache (sidecar) of parsed nanoindenter reports.
+
+The sidecar is stored next to the source file (with `SIDECAR_SUFFIX` appended to
+its name) and has the following layout:
+
+- `MAGIC` bytes,
+- little-endian `uint32` length of the JSON header,
+- JSON header (report name, columns, units, row count and source fingerprint),
+- zero padding to `ALIGNMENT` bytes,
+- float64 columns stored one after another.
+
+The columns are memory-mapped when the sidecar is read, so loading a report doesn't
+copy the data.
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+SIDECAR_SUFFIX = ".columns"
+"""Suffix appended to the source file name to get the sidecar path."""
+
+MAGIC = b"AMCOLS\x01\n"
+"""Magic bytes (with format version) at the beginning of each sidecar."""
+
+ALIGNMENT = 64
+"""Alignment of the column data in the sidecar file."""
+
+_HEADER_LENGTH = struct.Struct("<I")
+_UNIT_PATTERN = re.compile(r"\[(.*)\]$")
+
+
+def sidecar_path(source_path: Path | str) -> Path:
+    """Get the sidecar path for the given source file.
+
+    Arguments:
+        source_path -- path to the raw report.
+
+    Returns:
+        Path to the sidecar.
+    """
+    source_path = Path(source_path)
+    return source_path.with_name(source_path.name + SIDECAR_SUFFIX)
+
+
+def source_fingerprint(source_path: Path, content: bytes | None = None) -> dict:
+    """Get fingerprint of the source file used to invalidate the sidecar.
+
+    Arguments:
+        source_path -- path to the raw report.
+        content -- content of the file if already read (avoids reading it again).
+
+    Returns:
+        Size, modification time and SHA-256 hash of the source file.
+    """
+    stat = source_path.stat()
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(
+            source_path.read_bytes() if content is None else content
+        ).hexdigest(),
+    }
+
+
+def column_units(columns: list[str]) -> dict[str, str]:
+    """Extract units from column names (e.g., `MPa` from `HIT (O&P) [MPa]`).
+
+    Arguments:
+        columns -- column names.
+
+    Returns:
+        Mapping of column name to its unit (empty if the column has no unit).
+    """
+    units = {}
+    for column in columns:
+        match = _UNIT_PATTERN.search(column)
+        units[column] = match.group(1) if match is not None else ""
+    return units
+
+
+def write_sidecar(
+    df: pd.DataFrame, source_path: Path | str, content: bytes | None = None
+) -> Path:
+    """Write parsed report as a sidecar next to its source file.
+
+    The file is written atomically, so concurrent readers never see partial data.
+
+    Arguments:
+        df -- parsed report (all columns are stored as float64).
+        source_path -- path to the raw report.
+        content -- content of the source file if already read.
+
+    Raises:
+        OSError: the sidecar cannot be written (e.g., read-only data directory).
+
+    Returns:
+        Path to the written sidecar.
+    """
+    source_path = Path(source_path)
+    columns = [str(column) for column in df.columns]
+    header = json.dumps(
+        {
+            "name": getattr(df, "Name", ""),
+            "columns": columns,
+            "units": column_units(columns),
+            "rows": len(df),
+            "source": source_fingerprint(source_path, content),
+        }
+    ).encode("utf8")
+
+    prefix_length = len(MAGIC) + _HEADER_LENGTH.size + len(header)
+    padding = -prefix_length % ALIGNMENT
+    data = np.ascontiguousarray(df.to_numpy(np.float64).T)
+
+    output_path = sidecar_path(source_path)
+    with tempfile.NamedTemporaryFile(
+        dir=output_path.parent, prefix=output_path.name, delete=False
+    ) as output_file:
+        try:
+            output_file.write(MAGIC)
+            output_file.write(_HEADER_LENGTH.pack(len(header)))
+            output_file.write(header)
+            output_file.write(b"\0" * padding)
+            output_file.write(data.tobytes())
+            output_file.close()
+            os.replace(output_file.name, output_path)
+        except BaseException:
+            os.unlink(output_file.name)
+            raise
+
+    return output_path
+
+
+def read_header(path: Path) -> tuple[dict[str, Any], int]:
+    """Read sidecar header.
+
+    Arguments:
+        path -- path to the sidecar.
+
+    Raises:
+        ValueError: the file is not a valid sidecar.
+
+    Returns:
+        Decoded header and offset of the column data.
+    """
+    with open(path, "rb") as sidecar_file:
+        if sidecar_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a sidecar file: {path}")
+        (header_length,) = _HEADER_LENGTH.unpack(sidecar_file.read(_HEADER_LENGTH.size))
+        header = json.loads(sidecar_file.read(header_length))
+
+    prefix_length = len(MAGIC) + _HEADER_LENGTH.size + header_length
+    return header, prefix_length + (-prefix_length % ALIGNMENT)
+
+
+def is_fresh(header: dict[str, Any], source_path: Path) -> bool:
+    """Check if sidecar is up to date with its source file.
+
+    Size and modification time are compared first. The (slower) content hash is
+    checked only when the modification time changed, e.g., after copying the data.
+
+    Arguments:
+        header -- sidecar header.
+        source_path -- path to the raw report.
+
+    Returns:
+        True if the sidecar can be used in place of the source file.
+    """
+    fingerprint = header["source"]
+    stat = source_path.stat()
+    if stat.st_size != fingerprint["size"]:
+        return False
+    if stat.st_mtime_ns == fingerprint["mtime_ns"]:
+        return True
+    return source_fingerprint(source_path)["sha256"] == fingerprint["sha256"]
+
+
+def read_sidecar(source_path: Path | str) -> pd.DataFrame | None:
+    """Read parsed report from its sidecar without copying the data.
+
+    Columns are memory-mapped copy-on-write, so modifying the data frame never
+    changes the sidecar.
+
+    Arguments:
+        source_path -- path to the raw report.
+
+    Returns:
+        Parsed report or None if there is no valid and fresh sidecar.
+    """
+    source_path = Path(source_path)
+    path = sidecar_path(source_path)
+    try:
+        header, offset = read_header(path)
+        if not is_fresh(header, source_path):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+
+    columns: list[str] = header["columns"]
+    if len(columns) == 0 or header["rows"] == 0:
+        data = np.empty((len(columns), header["rows"]))
+    else:
+        data = np.memmap(
+            path,
+            dtype=np.float64,
+            mode="c",
+            offset=offset,
+            shape=(len(columns), header["rows"]),
+        )
+
+    df = pd.DataFrame(data.T, columns=columns, copy=False)
+    df.Name = header["name"]
+    return df
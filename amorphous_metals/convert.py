@@ -1,12 +1,22 @@
 """Tools used to convert raw data from nanoindenter to a data frame."""
 
+import argparse
+import contextlib
+import functools
 import math
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import BinaryIO, Iterable
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
-from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from amorphous_metals import columnar, curves, grid, oliver_pharr
 
 DEFAULT_COLUMNS = (
     "HIT (O&P) [MPa]",
@@ -16,130 +26,510 @@ DEFAULT_COLUMNS = (
 )
 """Default columns used for clustering."""
 
-REQUIRED_COLUMNS = ("X [mm]", "Y [mm]", *DEFAULT_COLUMNS)
+POSITION_COLUMNS = grid.POSITION_COLUMNS
+"""Columns with positions of data points."""
+
+REQUIRED_COLUMNS = (*POSITION_COLUMNS, *DEFAULT_COLUMNS)
 """Required columns in source file to perform the default analysis."""
 
+_DATA_PREFIX = b"Data : "
+_DATA_LABEL = np.frombuffer(_DATA_PREFIX[:4], np.uint8)
 
-def convert_raw_to_df(
-    raw_input: Path | str | UploadedFile, sort_x_y: bool = False
-) -> pd.DataFrame:
-    """Convert raw file from nanoindenter to a data frame.
+
+def _gather_fields(
+    buffer: npt.NDArray[np.uint8],
+    starts: npt.NDArray[np.intp],
+    stops: npt.NDArray[np.intp],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.bool_]]:
+    """Gather variable-length byte fields into a padded character matrix.
 
     Arguments:
-        raw_input -- either a path to the source file or UploadedFile from Streamlit.
-        sort_x_y -- sort data frame by X and Y coordinates.
+        buffer -- source byte buffer.
+        starts -- start offsets of the fields.
+        stops -- end offsets (exclusive) of the fields.
+
+    Returns:
+        Character matrix (one field per row) and mask of characters inside fields.
+    """
+    lengths = stops - starts
+    width = max(int(np.max(lengths, initial=0)), 1)
+    if len(starts) > 0 and int(np.max(starts)) + width > len(buffer):
+        buffer = np.concatenate((buffer, np.zeros(width, np.uint8)))
+
+    chars = np.lib.stride_tricks.sliding_window_view(buffer, width)[starts]
+    inside = np.arange(width) < lengths[:, np.newaxis]
+    chars[~inside] = 0
+    return chars, inside
+
+
+def _parse_decimals(
+    buffer: npt.NDArray[np.uint8],
+    starts: npt.NDArray[np.intp],
+    stops: npt.NDArray[np.intp],
+) -> npt.NDArray[np.float64]:
+    """Parse decimal numbers (with comma or dot separator) from byte fields.
+
+    Fields without any digit (e.g., `--.--`) are parsed as NaN.
+
+    Arguments:
+        buffer -- source byte buffer.
+        starts -- start offsets of the fields.
+        stops -- end offsets (exclusive) of the fields.
+
+    Raises:
+        ValueError: a field is not a valid decimal number.
+
+    Returns:
+        Parsed values.
+    """
+    chars, _ = _gather_fields(buffer, starts, stops)
+    chars[chars == ord(",")] = ord(".")
+
+    missing = ~((chars >= ord("0")) & (chars <= ord("9"))).any(axis=1)
+    fields = chars.view(f"S{chars.shape[1]}").ravel()
+    fields[missing] = b"nan"
+    return fields.astype(np.float64)
+
+
+def _parse_indexes(
+    buffer: npt.NDArray[np.uint8],
+    starts: npt.NDArray[np.intp],
+    stops: npt.NDArray[np.intp],
+) -> npt.NDArray[np.intp]:
+    """Parse positive integers (data point indexes) from byte fields.
+
+    Arguments:
+        buffer -- source byte buffer.
+        starts -- start offsets of the fields.
+        stops -- end offsets (exclusive) of the fields.
+
+    Raises:
+        ValueError: a field is not a valid index.
+
+    Returns:
+        Parsed indexes.
+    """
+    chars, inside = _gather_fields(buffer, starts, stops)
+    digits = chars - np.uint8(ord("0"))
+    is_digit = inside & (digits <= 9)
+    if np.any(inside & ~is_digit & (chars != ord(" "))) or not np.all(
+        is_digit.any(axis=1)
+    ):
+        raise ValueError("Invalid data point index")
+
+    indexes = np.zeros(len(chars), np.intp)
+    for position in range(chars.shape[1]):
+        indexes = np.where(
+            is_digit[:, position], indexes * 10 + digits[:, position], indexes
+        )
+    if np.any(indexes < 1):
+        raise ValueError("Invalid data point index")
+    return indexes
+
+
+def _parse_report(buffer: bytes) -> tuple[str, dict[str, npt.NDArray[np.float64]]]:
+    """Parse the whole report buffer in a single vectorized pass.
+
+    Arguments:
+        buffer -- raw report file content.
 
     Raises:
         ValueError: error during parsing.
 
     Returns:
-        Data frame with parsed data.
+        Report name and parsed columns (in order of appearance).
     """
-    if not isinstance(raw_input, UploadedFile):
-        print(f"Parsing {raw_input}")
+    head = buffer.split(b"\n", 4)
+    if [line.strip() for line in head[:3]] != [b"", b"New Report", b"----------"]:
+        raise ValueError("File header is not valid")
+    name = head[3].strip().decode("utf8") if len(head) > 3 else ""
+    body_offset = sum(len(line) + 1 for line in head[:4])
+    if body_offset >= len(buffer):
+        return name, {}
+
+    body = np.frombuffer(buffer, np.uint8, offset=body_offset)
+
+    # Line boundaries (without trailing CR).
+    newlines = np.flatnonzero(body == ord("\n"))
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_stops = np.concatenate((newlines, [len(body)]))
+    line_stops -= (line_stops > line_starts) & (
+        body[np.maximum(line_stops - 1, 0)] == ord("\r")
+    )
+
+    # First three tab positions in each line (sentinels for lines without them).
+    sentinel = len(body) + 1
+    tabs = np.concatenate((np.flatnonzero(body == ord("\t")), [sentinel] * 3))
+    first_tab = np.searchsorted(tabs, line_starts)
+    tab1, tab2, tab3 = tabs[first_tab], tabs[first_tab + 1], tabs[first_tab + 2]
+
+    # Ignore lines with less than three fields (e.g., empty lines).
+    rows = tab2 < line_stops
+    line_starts, line_stops = line_starts[rows], line_stops[rows]
+    tab1, tab2, tab3 = tab1[rows], tab2[rows], tab3[rows]
+
+    # Section headers and units in the first field.
+    first_chars, _ = _gather_fields(
+        body, line_starts, np.minimum(tab1, line_starts + 1)
+    )
+    has_label = tab1 > line_starts
+    is_unit = has_label & (first_chars[:, 0] == ord("["))
+    is_header = has_label & ~is_unit
+    section = np.cumsum(is_header) - 1
+
+    # Data rows (`Data : N`) in the second field; the rest are statistics.
+    label_chars, _ = _gather_fields(
+        body, tab1 + 1, np.minimum(tab2, tab1 + 1 + len(_DATA_LABEL))
+    )
+    is_data = (section >= 0) & (label_chars.shape[1] == len(_DATA_LABEL))
+    is_data &= np.all(label_chars == _DATA_LABEL, axis=1)
+
+    indexes = _parse_indexes(body, tab1[is_data] + 1 + len(_DATA_PREFIX), tab2[is_data])
+    values = _parse_decimals(
+        body, tab2[is_data] + 1, np.minimum(tab3[is_data], line_stops[is_data])
+    )
+
+    # Scatter values straight into preallocated columns (one row per section).
+    header_lines = np.flatnonzero(is_header)
+    columns = np.full((len(header_lines), int(np.max(indexes, initial=0))), math.nan)
+    columns[section[is_data], indexes - 1] = values
+
+    # Section names with units.
+    names = [
+        bytes(body[line_starts[line] : tab1[line]]).decode("utf8")
+        for line in header_lines
+    ]
+    for line in np.flatnonzero(is_unit & (section >= 0)):
+        names[section[line]] += " " + bytes(
+            body[line_starts[line] : tab1[line]]
+        ).decode("utf8")
 
-    df = pd.DataFrame()
+    # Only columns with any values are kept (later sections override earlier ones).
+    has_values = ~np.all(np.isnan(columns), axis=1)
+    parsed: dict[str, npt.NDArray[np.float64]] = {}
+    for section_i in np.flatnonzero(has_values):
+        parsed[names[section_i]] = columns[section_i]
+    return name, parsed
 
-    with (
-        raw_input if isinstance(raw_input, UploadedFile) else open(raw_input, "rb")
-    ) as raw_file:
-        if [raw_file.readline().strip() for _ in range(3)] != [
-            b"",
-            b"New Report",
-            b"----------",
-        ]:
-            raise ValueError("File header is not valid")
-
-        df.Name = raw_file.readline().strip().decode("utf8")
-
-        column_name = ""
-        data: dict[int, float | None] = {}
-        for line in raw_file.readlines():
-            line = line.decode("utf8")
-
-            row = line.split("\t")
-            if len(row) < 3:
-                # Ignore empty lines.
-                continue
-
-            if row[0] != "" and not row[0].startswith("["):
-                # Section header.
-                if any(isinstance(element, float) for element in data.values()):
-                    # Save current column to data frame if the column has any values.
-                    data_list = np.full(max(data.keys()), math.nan)
-                    for i, value in data.items():
-                        data_list[i - 1] = value
-                    df[column_name] = data_list
-
-                # Initialize new section.
-                data = {}
-                column_name = row[0]
-            elif row[0] != "":
-                # Section header unit.
-                column_name += " " + row[0]
-
-            if not row[1].startswith("Data"):
-                # Ignore statistics at the end of column.
-                continue
-
-            data[int(row[1].split(" : ")[1])] = (
-                float(row[2].replace(",", ".")) if row[2] != "--.--" else None
-            )
 
-    # Postprocessing
+def _validate_df(df: pd.DataFrame, required_columns: Iterable[str] = REQUIRED_COLUMNS):
+    """Ensure parsed data frame can be used for the analysis.
+
+    Arguments:
+        df -- parsed data frame.
+        required_columns -- columns the data frame must contain.
+
+    Raises:
+        ValueError: data frame is not valid.
+    """
     ## Ensure data has all the required columns.
     missing_columns = [
-        column_name for column_name in REQUIRED_COLUMNS if column_name not in df.columns
+        column_name for column_name in required_columns if column_name not in df.columns
     ]
     if len(missing_columns) > 0:
         raise ValueError(
             "Input data doesn't contain required columns: " + ", ".join(missing_columns)
         )
 
+    ## Check if data points form a grid (for visualization).
+    if all(column in df.columns for column in POSITION_COLUMNS):
+        grid.from_df(df)
+
+
+def convert_raw_to_df(
+    raw_input: Path | str | BinaryIO,
+    sort_x_y: bool = False,
+    use_sidecar: bool = True,
+    required_columns: Iterable[str] = REQUIRED_COLUMNS,
+) -> pd.DataFrame:
+    """Convert raw file from nanoindenter to a data frame.
+
+    The whole file is read at once and tokenized with vectorized NumPy operations.
+
+    If the input is a path, the parsed data is also stored in a columnar sidecar next
+    to the source file (see `amorphous_metals.columnar`), and subsequent calls load
+    the sidecar instead of parsing the file again.
+
+    Arguments:
+        raw_input -- either a path to the source file or a binary file object (e.g.,
+            UploadedFile from Streamlit), which is closed after reading.
+        sort_x_y -- sort data frame by X and Y coordinates.
+        use_sidecar -- read and write columnar sidecar for the source file.
+        required_columns -- columns the parsed data must contain (e.g., only positions
+            if Oliver–Pharr results are recomputed from curves).
+
+    Raises:
+        ValueError: error during parsing.
+
+    Returns:
+        Data frame with parsed data.
+    """
+    is_path = isinstance(raw_input, (str, os.PathLike))
+
+    df = columnar.read_sidecar(raw_input) if is_path and use_sidecar else None
+    if df is None:
+        if is_path:
+            print(f"Parsing {raw_input}")
+
+        with raw_input if not is_path else open(raw_input, "rb") as raw_file:
+            content = raw_file.read()
+        name, columns = _parse_report(content)
+
+        df = pd.DataFrame(columns)
+        df.Name = name
+        _validate_df(df, required_columns)
+
+        if is_path and use_sidecar:
+            try:
+                columnar.write_sidecar(df, raw_input, content)
+            except OSError as e:
+                print(f"Failed to write sidecar for {raw_input}: {e}")
+    else:
+        # Sidecars of reports parsed with fewer required columns.
+        _validate_df(df, required_columns)
+
     if sort_x_y:
         ## Ensure data points are in order.
         df.sort_values(["Y [mm]", "X [mm]"], inplace=True)
 
-    ## Check if we can make a square out of the data frame (for visualization).
-    square = math.sqrt(len(df))
-    if square != int(square):
-        raise ValueError("Input data frame is not square.")
-
     return df
 
 
-def convert_single_file(input_path: Path, output_path: Path):
+def convert_single_file(
+    input_path: Path,
+    output_path: Path,
+    indenter: oliver_pharr.Indenter | None = None,
+):
     """Convert a single file from raw data to a CSV.
 
     Arguments:
         input_path -- path to the input raw file.
         output_path -- path to the output CSV file.
+        indenter -- recompute Oliver–Pharr results from curves with this indenter
+            (see `oliver_pharr.update_report()`) instead of using exported values.
     """
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     if not input_path.exists():
         raise RuntimeError(f"The input path does not exist: {input_path}")
 
-    df = convert_raw_to_df(input_path)
+    if indenter is None:
+        df = convert_raw_to_df(input_path)
+    else:
+        df = convert_raw_to_df(input_path, required_columns=POSITION_COLUMNS)
+        store = curves.load_curves(input_path)
+        if store is None:
+            raise RuntimeError(f"Curves of {input_path} were not found")
+        df = oliver_pharr.update_report(df, store, indenter)
+        _validate_df(df)
     print(f"Saving the data to {output_path}.")
     df.to_csv(output_path, index=False)
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Wrong number of arguments. Expected format: INPUT_DIR OUTPUT_DIR")
-        sys.exit(1)
+def find_raw_files(input_dir: Path) -> list[Path]:
+    """Find raw report files in the directory (skipping `*_curves` directories).
+
+    Arguments:
+        input_dir -- directory to search recursively.
+
+    Returns:
+        Sorted list of raw report paths.
+    """
+    return sorted(
+        input_file
+        for input_file in input_dir.rglob("**/*.TXT")
+        if not input_file.is_dir() and not input_file.parent.name.endswith("_curves")
+    )
+
+
+def _convert_batch_file(
+    input_path: Path,
+    output_path: Path,
+    with_curves: bool = False,
+    indenter: oliver_pharr.Indenter | None = None,
+) -> str | None:
+    """Convert a single file in a batch, returning the error message on failure."""
+    try:
+        convert_single_file(input_path, output_path, indenter)
+        if with_curves:
+            curves.load_curves(input_path)
+    except (ValueError, RuntimeError, OSError) as e:
+        return str(e)
+    return None
+
+
+@dataclass
+class BatchSummary:
+    """Summary of batch conversion."""
+
+    converted: list[Path] = field(default_factory=list)
+    """Successfully converted input files."""
+    skipped: list[Path] = field(default_factory=list)
+    """Input files with up-to-date outputs."""
+    errors: dict[Path, str] = field(default_factory=dict)
+    """Error messages of the input files which failed to convert."""
+    converted_bytes: int = 0
+    """Total size of the converted input files."""
+    elapsed: float = 0.0
+    """Wall time of the conversion in seconds."""
+
+    def report(self) -> str:
+        """Generate human-readable report with errors and throughput."""
+        lines = [f"{path}: {error}" for path, error in self.errors.items()]
+        elapsed = max(self.elapsed, 1e-9)
+        lines.append(
+            f"Converted {len(self.converted)} files, skipped {len(self.skipped)} "
+            f"up-to-date, failed {len(self.errors)} in {self.elapsed:.2f} s "
+            f"({len(self.converted) / elapsed:.1f} files/s, "
+            f"{self.converted_bytes / 1e6 / elapsed:.2f} MB/s)."
+        )
+        return "\n".join(lines)
 
-    input_dir, output_dir = Path(sys.argv[1]), Path(sys.argv[2])
-    if not input_dir.is_dir() or not input_dir.exists():
-        print("Input directory is not a directory or doesn't exist")
-        sys.exit(1)
 
-    for input_file in input_dir.rglob("**/*.TXT"):
-        if input_file.is_dir() or input_file.parent.name.endswith("_curves"):
-            continue
+def convert_batch(
+    input_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    force: bool = False,
+    with_curves: bool = False,
+    indenter: oliver_pharr.Indenter | None = None,
+) -> BatchSummary:
+    """Convert all raw files in the directory to CSVs in parallel.
 
-        convert_single_file(
-            input_file,
-            (output_dir / input_file.relative_to(input_dir)).with_suffix(".csv"),
+    Arguments:
+        input_dir -- directory with raw files (searched recursively).
+        output_dir -- output directory (mirrors the input directory structure).
+        jobs -- number of worker processes (defaults to CPU count).
+        force -- convert even if the output is newer than the input.
+        with_curves -- also build curve stores of converted files (next to the raw
+            files, see `curves.load_curves()`).
+        indenter -- recompute Oliver–Pharr results from curves with this indenter.
+
+    Returns:
+        Summary of the conversion.
+    """
+    summary = BatchSummary()
+    start = time.perf_counter()
+
+    pending: dict[Path, Path] = {}
+    for input_path in find_raw_files(input_dir):
+        output_path = (output_dir / input_path.relative_to(input_dir)).with_suffix(
+            ".csv"
+        )
+        if (
+            not force
+            and output_path.exists()
+            and output_path.stat().st_mtime_ns > input_path.stat().st_mtime_ns
+        ):
+            summary.skipped.append(input_path)
+        else:
+            pending[input_path] = output_path
+
+    jobs = jobs if jobs is not None else os.cpu_count() or 1
+    with (
+        ProcessPoolExecutor(max_workers=jobs)
+        if jobs > 1 and len(pending) > 1
+        else contextlib.nullcontext()
+    ) as executor:
+        convert_file = functools.partial(
+            _convert_batch_file, with_curves=with_curves, indenter=indenter
+        )
+        errors = (
+            executor.map(
+                convert_file,
+                pending.keys(),
+                pending.values(),
+                chunksize=max(len(pending) // (jobs * 4), 1),
+            )
+            if executor is not None
+            else map(convert_file, pending.keys(), pending.values())
         )
+        for input_path, error in zip(pending, errors):
+            if error is None:
+                summary.converted.append(input_path)
+                summary.converted_bytes += input_path.stat().st_size
+            else:
+                summary.errors[input_path] = error
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run conversion command line interface.
+
+    Arguments:
+        argv -- command line arguments (defaults to `sys.argv`).
+
+    Returns:
+        Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert raw files from nanoindenter to CSVs."
+    )
+    parser.add_argument("input_dir", type=Path, help="directory with raw files")
+    parser.add_argument("output_dir", type=Path, help="output directory for CSVs")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="convert even if the output is newer than the input",
+    )
+    parser.add_argument(
+        "-c",
+        "--curves",
+        action="store_true",
+        help="also build stores of load-displacement curves from *_curves directories",
+    )
+    parser.add_argument(
+        "-r",
+        "--recompute",
+        action="store_true",
+        help="recompute Oliver-Pharr results from load-displacement curves",
+    )
+    parser.add_argument(
+        "--area-function",
+        type=float,
+        nargs="+",
+        metavar="C",
+        default=None,
+        help="area function coefficients C0 C1 ... used with --recompute "
+        "(default: ideal Berkovich)",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.input_dir.is_dir():
+        print("Input directory is not a directory or doesn't exist")
+        return 1
+    if args.jobs is not None and args.jobs < 1:
+        print("Number of jobs must be positive")
+        return 1
+
+    if args.area_function is not None and not args.recompute:
+        print("Area function can only be used with --recompute")
+        return 1
+
+    indenter = None
+    if args.recompute:
+        indenter = oliver_pharr.Indenter(
+            oliver_pharr.AreaFunction(tuple(args.area_function))
+            if args.area_function is not None
+            else oliver_pharr.AreaFunction()
+        )
+
+    summary = convert_batch(
+        args.input_dir, args.output_dir, args.jobs, args.force, args.curves, indenter
+    )
+    print(summary.report())
+    return 1 if len(summary.errors) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
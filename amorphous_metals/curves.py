@@ -0,0 +1,407 @@
+"""Load–displacement curves of individual indents.
+
+Besides the report, the nanoindenter software can export the raw curve of every indent
+into a directory next to the report named after it with `CURVES_DIR_SUFFIX` (e.g.,
+`sample_curves/` for `sample.TXT`). Each curve is a text file with a header (column
+names, optionally followed by a line with units in brackets) and tab- or
+semicolon-separated rows of numbers (with decimal commas or dots). The indent number is
+the last number in the file name (e.g., `sample_12.TXT` is indent 12), i.e., the
+`Data : 12` row of the report.
+
+Curves are read one at a time and streamed into a single store file (with
+`STORE_SUFFIX` appended to the report name) with the following layout:
+
+- `MAGIC` bytes with zero padding to `columnar.ALIGNMENT` bytes,
+- float64 samples of all curves (one row per sample, curves one after another),
+- JSON footer (columns, indent numbers, sample offsets and source fingerprint),
+- little-endian `uint64` length of the footer and `MAGIC` bytes again.
+
+The samples are memory-mapped when the store is opened, so each curve is a view read
+from disk only when used.
+"""
+
+import io
+import json
+import os
+import re
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from amorphous_metals import columnar
+
+CURVES_DIR_SUFFIX = "_curves"
+"""Suffix of the curve directory name (appended to the report name without suffix)."""
+
+STORE_SUFFIX = ".curves"
+"""Suffix appended to the report file name to get the curve store path."""
+
+MAGIC = b"AMCURV\x01\n"
+"""Magic bytes (with format version) at the beginning and the end of each store."""
+
+_FOOTER_LENGTH = struct.Struct("<Q")
+_INDENT_PATTERN = re.compile(r"(\d+)\D*$")
+_UNIT_PATTERN = re.compile(rb"^\[.*\]$")
+_NUMBER_PATTERN = re.compile(rb"^[-+]?(\d+([.,]\d*)?|[.,]\d+)([eE][-+]?\d+)?$")
+# Instrument exports end lines with "\t\r\n", so delimiters before CR are trailing too.
+_TRAILING_DELIMITERS = re.compile(rb"[\t; ]+(?=\r?$)", re.MULTILINE)
+
+
+def curves_dir(report_path: Path | str) -> Path:
+    """Get the curve directory of the report.
+
+    Arguments:
+        report_path -- path to the raw report.
+
+    Returns:
+        Path to the curve directory (may not exist).
+    """
+    report_path = Path(report_path)
+    return report_path.with_name(report_path.stem + CURVES_DIR_SUFFIX)
+
+
+def store_path(report_path: Path | str) -> Path:
+    """Get the curve store path of the report.
+
+    Arguments:
+        report_path -- path to the raw report.
+
+    Returns:
+        Path to the curve store.
+    """
+    report_path = Path(report_path)
+    return report_path.with_name(report_path.name + STORE_SUFFIX)
+
+
+def indent_numbers(df: pd.DataFrame) -> npt.NDArray[np.int64]:
+    """Get indent numbers of data frame rows produced by `convert_raw_to_df()`.
+
+    Row labels are zero-based `Data : N` numbers of the report, so they stay valid
+    after sorting the rows.
+
+    Arguments:
+        df -- parsed report.
+
+    Returns:
+        Indent number of each row.
+    """
+    return df.index.to_numpy(np.int64) + 1
+
+
+def find_curve_files(directory: Path) -> dict[int, Path]:
+    """Find curve files by indent number.
+
+    Arguments:
+        directory -- curve directory.
+
+    Raises:
+        ValueError: a file name has no indent number or the number is repeated.
+
+    Returns:
+        Curve file paths by indent number (in ascending order).
+    """
+    files: dict[int, Path] = {}
+    for path in directory.iterdir():
+        if path.is_dir() or path.name.startswith("."):
+            continue
+        match = _INDENT_PATTERN.search(path.stem)
+        if match is None:
+            raise ValueError(f"No indent number in curve file name: {path}")
+        indent = int(match.group(1))
+        if indent in files:
+            raise ValueError(f"Duplicate curves of indent {indent} in {directory}")
+        files[indent] = path
+    return dict(sorted(files.items()))
+
+
+def directory_fingerprint(directory: Path) -> list[list[Any]]:
+    """Get fingerprint of the curve directory used to invalidate the store.
+
+    Arguments:
+        directory -- curve directory.
+
+    Returns:
+        Name, size and modification time of every curve file.
+    """
+    fingerprint = []
+    for path in find_curve_files(directory).values():
+        stat = path.stat()
+        fingerprint.append([path.name, stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def _split(line: bytes, delimiter: bytes | None) -> list[bytes]:
+    """Split line into stripped fields."""
+    return [field.strip() for field in line.rstrip(b"\r\n\t; ").split(delimiter)]
+
+
+def parse_curve(content: bytes) -> tuple[list[str], npt.NDArray[np.float64]]:
+    """Parse a single curve file.
+
+    Arguments:
+        content -- content of the curve file.
+
+    Raises:
+        ValueError: there are no samples or the rows have different lengths.
+
+    Returns:
+        Column names and samples (one row per sample).
+    """
+    lines = content.splitlines(keepends=True)
+    offset = 0
+    header: list[bytes] = []
+    for line in lines:
+        delimiter = b"\t" if b"\t" in line else b";" if b";" in line else None
+        fields = _split(line, delimiter)
+        if any(fields):
+            if all(_NUMBER_PATTERN.match(field) for field in fields):
+                break
+            header.append(line)
+        offset += len(line)
+    else:
+        raise ValueError("No curve samples found.")
+
+    # Parse all the samples at once.
+    block = _TRAILING_DELIMITERS.sub(b"", content[offset:].replace(b",", b"."))
+    try:
+        samples = np.loadtxt(
+            io.BytesIO(block),
+            delimiter=None if delimiter is None else delimiter.decode(),
+            ndmin=2,
+        )
+    except ValueError as e:
+        raise ValueError(f"Invalid curve samples: {e}") from e
+
+    # Column names with units (if in a separate line).
+    names = [b""] * samples.shape[1]
+    units = [b""] * samples.shape[1]
+    for line in header:
+        fields = _split(line, delimiter)
+        if len(fields) != samples.shape[1]:
+            continue
+        if all(_UNIT_PATTERN.match(field) or field == b"" for field in fields):
+            units = fields
+        else:
+            names, units = fields, [b""] * samples.shape[1]
+
+    columns = [
+        " ".join(filter(None, (name.decode("utf8"), unit.decode("utf8"))))
+        or f"Column {index + 1}"
+        for index, (name, unit) in enumerate(zip(names, units))
+    ]
+    return columns, samples
+
+
+def _write_samples(
+    output_file: BinaryIO, columns: list[str], curve_columns: list[str], samples
+):
+    """Write curve samples in the store column order."""
+    if curve_columns != columns:
+        if not set(curve_columns) <= set(columns):
+            raise ValueError(f"Inconsistent curve columns: {curve_columns}")
+        reordered = np.full((len(samples), len(columns)), np.nan)
+        reordered[:, [columns.index(column) for column in curve_columns]] = samples
+        samples = reordered
+    output_file.write(np.ascontiguousarray(samples, dtype="<f8").tobytes())
+
+
+def write_store(directory: Path | str, output_path: Path | str) -> Path:
+    """Stream curves from the directory into a store.
+
+    Only a single curve is kept in memory at a time. The file is written atomically,
+    so concurrent readers never see partial data.
+
+    Arguments:
+        directory -- curve directory.
+        output_path -- path to the written store.
+
+    Raises:
+        ValueError: a curve cannot be parsed or has columns not present in the first
+            curve.
+        OSError: the store cannot be written (e.g., read-only data directory).
+
+    Returns:
+        Path to the written store.
+    """
+    directory, output_path = Path(directory), Path(output_path)
+    files = find_curve_files(directory)
+    fingerprint = directory_fingerprint(directory)
+    columns: list[str] = []
+    offsets = [0]
+
+    with tempfile.NamedTemporaryFile(
+        dir=output_path.parent, prefix=output_path.name, delete=False
+    ) as output_file:
+        try:
+            output_file.write(MAGIC)
+            output_file.write(b"\0" * (-len(MAGIC) % columnar.ALIGNMENT))
+
+            for path in files.values():
+                try:
+                    curve_columns, samples = parse_curve(path.read_bytes())
+                except ValueError as e:
+                    raise ValueError(f"{path}: {e}") from e
+                if not columns:
+                    columns = curve_columns
+                _write_samples(output_file, columns, curve_columns, samples)
+                offsets.append(offsets[-1] + len(samples))
+
+            footer = json.dumps(
+                {
+                    "columns": columns,
+                    "indents": list(files),
+                    "offsets": offsets,
+                    "source": fingerprint,
+                }
+            ).encode("utf8")
+            output_file.write(footer)
+            output_file.write(_FOOTER_LENGTH.pack(len(footer)))
+            output_file.write(MAGIC)
+            output_file.close()
+            os.replace(output_file.name, output_path)
+        except BaseException:
+            os.unlink(output_file.name)
+            raise
+
+    return output_path
+
+
+class CurveStore:
+    """Memory-mapped load–displacement curves of a single report."""
+
+    def __init__(self, path: Path | str):
+        """Open curve store (only the footer is read).
+
+        Arguments:
+            path -- path to the store.
+
+        Raises:
+            ValueError: the file is not a valid store.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as store_file:
+            if store_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a curve store: {path}")
+            store_file.seek(-len(MAGIC) - _FOOTER_LENGTH.size, os.SEEK_END)
+            (footer_length,) = _FOOTER_LENGTH.unpack(
+                store_file.read(_FOOTER_LENGTH.size)
+            )
+            if store_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Incomplete curve store: {path}")
+            store_file.seek(-len(MAGIC) - _FOOTER_LENGTH.size - footer_length, 2)
+            footer = json.loads(store_file.read(footer_length))
+
+        self.columns: list[str] = footer["columns"]
+        """Names of curve columns."""
+        self.indents = np.array(footer["indents"], dtype=np.int64)
+        """Indent numbers (ascending)."""
+        self.offsets = np.array(footer["offsets"], dtype=np.int64)
+        """First sample of each curve (with the total sample count at the end)."""
+        self.source: list[list[Any]] = footer["source"]
+        """Fingerprint of the curve directory."""
+
+        self.samples: npt.NDArray[np.float64] = (
+            np.memmap(
+                self.path,
+                dtype="<f8",
+                mode="r",
+                offset=len(MAGIC) + (-len(MAGIC) % columnar.ALIGNMENT),
+                shape=(int(self.offsets[-1]), len(self.columns)),
+            )
+            if self.offsets[-1] > 0 and len(self.columns) > 0
+            else np.empty((0, len(self.columns)))
+        )
+        """All samples (one row per sample, curves one after another)."""
+
+    def __len__(self) -> int:
+        """Get number of curves."""
+        return len(self.indents)
+
+    def __contains__(self, indent: object) -> bool:
+        """Check if there is a curve of the indent."""
+        return self._position(indent) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over indent numbers."""
+        return iter(self.indents.tolist())
+
+    def _position(self, indent: object) -> int | None:
+        """Get position of the indent in the store (None if not present)."""
+        if not isinstance(indent, (int, np.integer)):
+            return None
+        position = int(np.searchsorted(self.indents, indent))
+        if position < len(self.indents) and self.indents[position] == indent:
+            return position
+        return None
+
+    def curve_array(self, indent: int) -> npt.NDArray[np.float64]:
+        """Get samples of the indent (read-only view).
+
+        Arguments:
+            indent -- indent number.
+
+        Raises:
+            KeyError: there is no curve of the indent.
+
+        Returns:
+            Samples (one row per sample, columns as in `columns`).
+        """
+        position = self._position(indent)
+        if position is None:
+            raise KeyError(indent)
+        return self.samples[self.offsets[position] : self.offsets[position + 1]]
+
+    def curve(self, indent: int) -> pd.DataFrame:
+        """Get curve of the indent as a data frame (without copying the samples).
+
+        Arguments:
+            indent -- indent number.
+
+        Raises:
+            KeyError: there is no curve of the indent.
+
+        Returns:
+            Curve data frame.
+        """
+        return pd.DataFrame(self.curve_array(indent), columns=self.columns, copy=False)
+
+    def is_fresh(self, directory: Path) -> bool:
+        """Check if the store is up to date with the curve directory."""
+        return self.source == directory_fingerprint(directory)
+
+
+def load_curves(report_path: Path | str, build: bool = True) -> CurveStore | None:
+    """Open curves of the report, building (or rebuilding) the store if needed.
+
+    Arguments:
+        report_path -- path to the raw report.
+        build -- build the store if missing or stale.
+
+    Raises:
+        ValueError: a curve cannot be parsed.
+        OSError: the store cannot be written.
+
+    Returns:
+        Curve store or None if the report has no curves (or the store is not built).
+    """
+    directory = curves_dir(report_path)
+    if not directory.is_dir():
+        return None
+
+    path = store_path(report_path)
+    try:
+        store = CurveStore(path)
+        if store.is_fresh(directory):
+            return store
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if not build:
+        return None
+    print(f"Building curve store {path}")
+    return CurveStore(write_store(directory, path))
@@ -0,0 +1,599 @@
+"""Out-of-core dataset of many reports in a partitioned Parquet store.
+
+Reports of an archive (e.g., tens of thousands of maps) don't fit in memory at once,
+so they are converted one by one (in parallel processes) into a Parquet store with a
+file per report, partitioned by the alloy folder (the first directory of the report
+in the archive) in the Hive layout:
+
+```
+STORE_DIR/alloy=ZrCu%20alloys/Be0_matryca15_50mN_spacing7um_strefa_przejsciowa.parquet
+STORE_DIR/alloy=ZrTi%20alloys/s3_matryca15_25mN_spacing5um.parquet
+```
+
+Each row has the `report` name (the file name without the suffix) besides the columns
+of the report. Scans of the store read only the requested columns and skip whole
+partitions and files by the alloy and report filters (predicate pushdown), and the
+data is streamed in record batches, so cross-sample statistics (`summarize()`) and
+clustering inputs (`load_project()`) are computed with bounded memory:
+
+```
+poetry run amorphous-metals dataset build INPUT_DIR STORE_DIR
+poetry run amorphous-metals dataset summary STORE_DIR --by alloy -c "HIT (O&P) [MPa]"
+```
+
+The store is read and written with `pyarrow`, which is imported only when it is used
+(so the CLI starts quickly).
+"""
+
+import argparse
+import contextlib
+import glob
+import os
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from amorphous_metals import convert, project
+
+if TYPE_CHECKING:
+    import pyarrow.dataset as ds
+
+PARTITION_COLUMN = "alloy"
+"""Partition column with the alloy folder of the report."""
+
+REPORT_COLUMN = "report"
+"""Column with the report name."""
+
+STORE_SUFFIX = ".parquet"
+"""Suffix of report files in the store."""
+
+DEFAULT_BATCH_ROWS = 65_536
+"""Default maximum number of rows of streamed batches."""
+
+STATISTICS = ("count", "mean", "std", "min", "max")
+"""Statistics of `summarize()`."""
+
+
+def alloy_of(input_dir: Path, input_path: Path) -> str:
+    """Get alloy folder of the report (the input directory name for top-level ones).
+
+    Arguments:
+        input_dir -- root directory of the archive.
+        input_path -- path to the raw report.
+
+    Returns:
+        Name of the first directory of the report in the archive.
+    """
+    parts = input_path.relative_to(input_dir).parts
+    return parts[0] if len(parts) > 1 else input_dir.resolve().name
+
+
+def report_path(store_dir: Path, alloy: str, report: str) -> Path:
+    """Get path of the report file in the store.
+
+    Arguments:
+        store_dir -- root directory of the store.
+        alloy -- alloy folder of the report.
+        report -- report name.
+
+    Returns:
+        Path in the Hive layout (partition values are percent-encoded).
+    """
+    partition = f"{PARTITION_COLUMN}={urllib.parse.quote(alloy, safe='')}"
+    return store_dir / partition / f"{report}{STORE_SUFFIX}"
+
+
+def write_report(df: pd.DataFrame, store_dir: Path, alloy: str, report: str) -> Path:
+    """Write parsed report into the store.
+
+    The file is written atomically, so concurrent scans never see partial data.
+
+    Arguments:
+        df -- parsed report.
+        store_dir -- root directory of the store.
+        alloy -- alloy folder of the report.
+        report -- report name.
+
+    Raises:
+        OSError: the file cannot be written.
+
+    Returns:
+        Path to the written file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column(
+        REPORT_COLUMN,
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(len(df), dtype=np.int32)), pa.array([report])
+        ),
+    )
+
+    output_path = report_path(store_dir, alloy, report)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=output_path.parent, prefix=f".{output_path.name}", delete=False
+    ) as output_file:
+        try:
+            output_file.close()
+            pq.write_table(table, output_file.name)
+            os.replace(output_file.name, output_path)
+        except BaseException:
+            os.unlink(output_file.name)
+            raise
+    return output_path
+
+
+def _build_store_file(input_path: Path, store_dir: Path, alloy: str) -> str | None:
+    """Add a single report to the store, returning the error message on failure."""
+    try:
+        write_report(
+            convert.convert_raw_to_df(input_path), store_dir, alloy, input_path.stem
+        )
+    except (ValueError, RuntimeError, OSError, ImportError) as e:
+        return str(e)
+    return None
+
+
+def build_store(
+    input_dir: Path, store_dir: Path, jobs: int | None = None, force: bool = False
+) -> convert.BatchSummary:
+    """Convert all raw files in the directory into the store in parallel.
+
+    Each worker holds a single report at a time, so memory doesn't grow with the
+    archive, and reports with up-to-date files in the store are skipped.
+
+    Arguments:
+        input_dir -- directory with raw files (searched recursively).
+        store_dir -- root directory of the store.
+        jobs -- number of worker processes (defaults to CPU count).
+        force -- convert even if the file in the store is newer than the input.
+
+    Returns:
+        Summary of the conversion.
+    """
+    summary = convert.BatchSummary()
+    start = time.perf_counter()
+
+    # Alloy of each report to convert.
+    pending: dict[Path, str] = {}
+    output_paths: set[Path] = set()
+    for input_path in convert.find_raw_files(input_dir):
+        alloy = alloy_of(input_dir, input_path)
+        output_path = report_path(store_dir, alloy, input_path.stem)
+        if output_path in output_paths:
+            # Reports are named by the file names, which must be unique in an alloy.
+            summary.errors[input_path] = (
+                f"Another report of {alloy} has the same name {input_path.stem}"
+            )
+            continue
+        output_paths.add(output_path)
+        if (
+            not force
+            and output_path.exists()
+            and output_path.stat().st_mtime_ns > input_path.stat().st_mtime_ns
+        ):
+            summary.skipped.append(input_path)
+        else:
+            pending[input_path] = alloy
+
+    jobs = jobs if jobs is not None else os.cpu_count() or 1
+    with (
+        ProcessPoolExecutor(max_workers=jobs)
+        if jobs > 1 and len(pending) > 1
+        else contextlib.nullcontext()
+    ) as executor:
+        arguments = (pending.keys(), [store_dir] * len(pending), pending.values())
+        errors = (
+            executor.map(
+                _build_store_file,
+                *arguments,
+                chunksize=max(len(pending) // (jobs * 4), 1),
+            )
+            if executor is not None
+            else map(_build_store_file, *arguments)
+        )
+        for input_path, error in zip(pending, errors):
+            if error is None:
+                summary.converted.append(input_path)
+                summary.converted_bytes += input_path.stat().st_size
+            else:
+                summary.errors[input_path] = error
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def open_dataset(store_dir: Path, reports: Iterable[str] | None = None) -> "ds.Dataset":
+    """Open the store as a PyArrow dataset (without reading any data).
+
+    The schema is taken from the first report file, so reports of an archive should
+    have the same columns (missing ones are read as nulls).
+
+    Arguments:
+        store_dir -- root directory of the store.
+        reports -- include only files of these reports (other files are never
+            opened, not even their footers).
+
+    Raises:
+        ValueError: the store has no (matching) reports.
+
+    Returns:
+        Dataset with the partition column.
+    """
+    import pyarrow.dataset as ds
+
+    if reports is not None:
+        # Files are named by the reports, so they are found without listing them all.
+        paths = sorted(
+            str(path)
+            for report in set(reports)
+            for path in store_dir.glob(f"*/{glob.escape(report)}{STORE_SUFFIX}")
+        )
+        if len(paths) == 0:
+            raise ValueError("No reports match the filters.")
+        return ds.dataset(
+            paths,
+            format="parquet",
+            partitioning=ds.partitioning(flavor="hive"),
+            partition_base_dir=str(store_dir),
+        )
+    if not any(store_dir.glob(f"*/*{STORE_SUFFIX}")):
+        raise ValueError(f"Store has no reports: {store_dir}")
+    return ds.dataset(
+        store_dir,
+        format="parquet",
+        partitioning=ds.partitioning(flavor="hive"),
+        # Temporary files of writers are hidden by the leading dot.
+        ignore_prefixes=["."],
+    )
+
+
+def _filter(
+    alloys: Iterable[str] | None = None,
+    reports: Iterable[str] | None = None,
+    expression: "ds.Expression | None" = None,
+) -> "ds.Expression | None":
+    """Combine alloy and report filters with an additional expression."""
+    import pyarrow.dataset as ds
+
+    conditions = [
+        ds.field(column).isin(list(values))
+        for column, values in ((PARTITION_COLUMN, alloys), (REPORT_COLUMN, reports))
+        if values is not None
+    ]
+    if expression is not None:
+        conditions.append(expression)
+    if len(conditions) == 0:
+        return None
+    combined = conditions[0]
+    for condition in conditions[1:]:
+        combined &= condition
+    return combined
+
+
+def scan(
+    store_dir: Path,
+    columns: Iterable[str] | None = None,
+    alloys: Iterable[str] | None = None,
+    reports: Iterable[str] | None = None,
+    expression: "ds.Expression | None" = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Stream rows of the store in batches.
+
+    Only the requested columns are read, and partitions and files which cannot match
+    the filters are skipped without reading them.
+
+    Arguments:
+        store_dir -- root directory of the store.
+        columns -- columns to read (all columns by default).
+        alloys -- read only reports of these alloys.
+        reports -- read only reports with these names.
+        expression -- additional filter of rows (e.g.,
+            `pyarrow.dataset.field("HIT (O&P) [MPa]") > 10000`).
+        batch_rows -- maximum number of rows of each batch.
+
+    Raises:
+        ValueError: the store has no (matching) reports.
+
+    Yields:
+        Data frames with the columns, at most `batch_rows` rows each.
+    """
+    import pyarrow as pa
+
+    dataset = open_dataset(store_dir, reports)
+    # Batches end with the files, so batches of small reports are merged (converting
+    # each of them to pandas separately would dominate the time).
+    pending: list[pa.RecordBatch] = []
+    pending_rows = 0
+    for batch in dataset.to_batches(
+        columns=list(columns) if columns is not None else None,
+        filter=_filter(alloys, reports, expression),
+        batch_size=batch_rows,
+    ):
+        if pending_rows + batch.num_rows > batch_rows and pending_rows > 0:
+            yield pa.Table.from_batches(pending).to_pandas()
+            pending, pending_rows = [], 0
+        if batch.num_rows > 0:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+    if pending_rows > 0:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def list_reports(store_dir: Path, alloys: Iterable[str] | None = None) -> pd.DataFrame:
+    """List reports of the store with their row counts.
+
+    Arguments:
+        store_dir -- root directory of the store.
+        alloys -- list only reports of these alloys.
+
+    Returns:
+        Data frame indexed by (alloy, report) with `rows` column.
+    """
+    dataset = open_dataset(store_dir)
+    reports: dict[tuple[str, str], int] = {}
+    for fragment in dataset.get_fragments(filter=_filter(alloys)):
+        alloy = urllib.parse.unquote(Path(fragment.path).parent.name.split("=", 1)[1])
+        reports[(alloy, Path(fragment.path).stem)] = fragment.metadata.num_rows
+    return pd.DataFrame(
+        {"rows": list(reports.values())},
+        index=pd.MultiIndex.from_tuples(
+            list(reports.keys()), names=[PARTITION_COLUMN, REPORT_COLUMN]
+        ),
+    ).sort_index()
+
+
+def _moments(df: pd.DataFrame, by: str, columns: list[str]) -> dict[str, pd.DataFrame]:
+    """Get count, mean, sum of squared deviations, minimum and maximum by group."""
+    grouped = df.groupby(by, observed=True)[columns]
+    mean = grouped.mean()
+    return {
+        "count": grouped.count().astype(np.float64),
+        "mean": mean,
+        "m2": grouped.var(ddof=0) * grouped.count(),
+        "min": grouped.min(),
+        "max": grouped.max(),
+    }
+
+
+def _merge_moments(
+    a: dict[str, pd.DataFrame], b: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Merge moments of two batches (the parallel algorithm of Chan et al.)."""
+    a = {
+        key: value.reindex(a["count"].index.union(b["count"].index))
+        for key, value in a.items()
+    }
+    b = {key: value.reindex(a["count"].index) for key, value in b.items()}
+    count_a, count_b = a["count"].fillna(0), b["count"].fillna(0)
+    count = count_a + count_b
+    delta = b["mean"].fillna(0) - a["mean"].fillna(0)
+    share = (count_b / count.where(count > 0)).fillna(0)
+    return {
+        "count": count,
+        "mean": a["mean"].fillna(0) + delta * share,
+        "m2": a["m2"].fillna(0) + b["m2"].fillna(0) + delta**2 * count_a * share,
+        "min": a["min"].combine(b["min"], np.fmin),
+        "max": a["max"].combine(b["max"], np.fmax),
+    }
+
+
+def summarize(
+    store_dir: Path,
+    columns: Iterable[str] | None = None,
+    by: str = REPORT_COLUMN,
+    alloys: Iterable[str] | None = None,
+    reports: Iterable[str] | None = None,
+    expression: "ds.Expression | None" = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> pd.DataFrame:
+    """Compute statistics of columns for each report (or alloy) in a single pass.
+
+    Batches are streamed from the store and only running moments of each group are
+    kept, so memory depends on the number of groups rather than rows.
+
+    Arguments:
+        store_dir -- root directory of the store.
+        columns -- columns to summarize (all feature columns by default).
+        by -- group rows by `REPORT_COLUMN` or `PARTITION_COLUMN`.
+        alloys -- summarize only reports of these alloys.
+        reports -- summarize only reports with these names.
+        expression -- additional filter of rows.
+        batch_rows -- maximum number of rows of each streamed batch.
+
+    Raises:
+        ValueError: the store has no reports or unknown grouping.
+
+    Returns:
+        Tidy data frame indexed by (group, statistic) with a column per feature.
+        Statistics are `STATISTICS` (missing values are skipped).
+    """
+    if by not in (REPORT_COLUMN, PARTITION_COLUMN):
+        raise ValueError(f"Unknown grouping: {by}")
+    if columns is None:
+        schema = open_dataset(store_dir).schema
+        columns = [
+            name
+            for name in schema.names
+            if name not in (REPORT_COLUMN, PARTITION_COLUMN)
+        ]
+    columns = list(columns)
+
+    moments: dict[str, pd.DataFrame] | None = None
+    for batch in scan(
+        store_dir, [*columns, by], alloys, reports, expression, batch_rows
+    ):
+        # Group names are plain strings in all batches.
+        batch[by] = batch[by].astype(str)
+        batch_moments = _moments(batch, by, columns)
+        moments = (
+            batch_moments if moments is None else _merge_moments(moments, batch_moments)
+        )
+
+    if moments is None:
+        return pd.DataFrame(
+            columns=columns,
+            index=pd.MultiIndex.from_tuples([], names=[by, "statistic"]),
+        )
+    count = moments["count"]
+    summary = pd.concat(
+        {
+            "count": count,
+            "mean": moments["mean"].where(count > 0),
+            "std": np.sqrt(moments["m2"] / (count - 1).where(count > 1)),
+            "min": moments["min"],
+            "max": moments["max"],
+        },
+        names=["statistic", by],
+    )
+    return summary.swaplevel().sort_index(level=by, sort_remaining=False)
+
+
+def load_project(
+    store_dir: Path,
+    reports: Iterable[str] | None = None,
+    columns: Iterable[str] | None = None,
+    alloys: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """Load selected reports as a project for joint clustering.
+
+    Only the selected reports and columns are read, so a project of a few maps can be
+    clustered from a store of any size.
+
+    Arguments:
+        store_dir -- root directory of the store.
+        reports -- names of the reports (all reports of the alloys by default).
+        columns -- columns to load (all columns by default, positions are always
+            loaded, so the maps can be placed on grids).
+        alloys -- load only reports of these alloys.
+
+    Raises:
+        ValueError: no report matches the filters.
+
+    Returns:
+        Stacked data frame (see `project.stack_maps()`) with samples named by the
+        reports.
+    """
+    if columns is not None:
+        columns = [
+            *convert.POSITION_COLUMNS,
+            *(column for column in columns if column not in convert.POSITION_COLUMNS),
+        ]
+    batches: dict[str, list[pd.DataFrame]] = {}
+    for batch in scan(
+        store_dir,
+        None if columns is None else [*columns, REPORT_COLUMN],
+        alloys,
+        reports,
+    ):
+        for report, rows in batch.groupby(REPORT_COLUMN, observed=True, sort=False):
+            batches.setdefault(str(report), []).append(
+                rows.drop(columns=[REPORT_COLUMN, PARTITION_COLUMN], errors="ignore")
+            )
+    if len(batches) == 0:
+        raise ValueError("No reports match the filters.")
+    return project.stack_maps(
+        {
+            report: pd.concat(frames, ignore_index=True)
+            for report, frames in batches.items()
+        }
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run dataset command line interface.
+
+    Arguments:
+        argv -- command line arguments (defaults to `sys.argv`).
+
+    Returns:
+        Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog="amorphous-metals dataset",
+        description="Build and query partitioned Parquet store of reports.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="convert raw files into the store")
+    build.add_argument("input_dir", type=Path, help="directory with raw files")
+    build.add_argument("store_dir", type=Path, help="root directory of the store")
+    build.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: CPU count)",
+    )
+    build.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="convert even if the report in the store is newer than the input",
+    )
+
+    summary = commands.add_parser(
+        "summary", help="print statistics of columns of each report or alloy"
+    )
+    summary.add_argument("store_dir", type=Path, help="root directory of the store")
+    summary.add_argument(
+        "-c",
+        "--column",
+        action="append",
+        dest="columns",
+        help="column to summarize, can be repeated (default: all columns)",
+    )
+    summary.add_argument(
+        "-a", "--alloy", action="append", dest="alloys", help="alloy to include"
+    )
+    summary.add_argument(
+        "-r", "--report", action="append", dest="reports", help="report to include"
+    )
+    summary.add_argument(
+        "--by",
+        choices=(REPORT_COLUMN, PARTITION_COLUMN),
+        default=REPORT_COLUMN,
+        help=f"group rows by report or alloy (default: {REPORT_COLUMN})",
+    )
+    summary.add_argument(
+        "-o", "--output", type=Path, default=None, help="output CSV (default: print)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "build":
+            if not args.input_dir.is_dir():
+                print("Input directory is not a directory or doesn't exist")
+                return 1
+            if args.jobs is not None and args.jobs < 1:
+                print("Number of jobs must be positive")
+                return 1
+            built = build_store(args.input_dir, args.store_dir, args.jobs, args.force)
+            print(built.report())
+            return 1 if len(built.errors) > 0 else 0
+
+        result = summarize(
+            args.store_dir, args.columns, args.by, args.alloys, args.reports
+        )
+    except ImportError as e:
+        print(f"Parquet store needs pyarrow: {e}")
+        return 1
+    except ValueError as e:
+        print(e)
+        return 1
+    if args.output is not None:
+        result.to_csv(args.output)
+    else:
+        with pd.option_context("display.max_rows", None):
+            print(result)
+    return 0
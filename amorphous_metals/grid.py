@@ -0,0 +1,163 @@
+"""Indentation grids of maps.
+
+Data points of a map are placed on a rectangular grid by their `X [mm]` and `Y [mm]`
+positions, snapped to the spacing of the indentation matrix. The grid doesn't have to
+be square or complete (e.g., a run aborted before the last row), and the data points
+can be in any order. Grid rows go along the Y axis and columns along the X axis, so
+images of complete maps measured row by row are the same as reshaping the columns.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+POSITION_COLUMNS = ("X [mm]", "Y [mm]")
+"""Columns with positions of data points."""
+
+MAX_CELLS_PER_POINT = 16
+"""Maximum number of grid cells per data point (i.e., the points form a grid)."""
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Grid cells of data points of a map (row-major)."""
+
+    rows: int
+    """Number of grid rows (image height)."""
+    columns: int
+    """Number of grid columns (image width)."""
+    cells: npt.NDArray[np.intp]
+    """Cell index of each data point."""
+    index: npt.NDArray[np.intp]
+    """Data point of each cell (-1 for cells without a data point)."""
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Image shape of the grid (rows, columns)."""
+        return self.rows, self.columns
+
+    @cached_property
+    def is_dense(self) -> bool:
+        """True if all cells have a data point and the points are in cell order."""
+        return len(self.cells) == len(self.index) and bool(
+            np.all(self.cells == np.arange(len(self.cells)))
+        )
+
+    def point(self, column: int, row: int) -> int | None:
+        """Get data point at the cell.
+
+        Arguments:
+            column -- cell column (image X coordinate).
+            row -- cell row (image Y coordinate).
+
+        Returns:
+            Data point index or None if the cell is empty or outside the grid.
+        """
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return None
+        point = int(self.index[row * self.columns + column])
+        return point if point >= 0 else None
+
+    def image(self, values: npt.ArrayLike, fill: Any = np.nan) -> npt.NDArray[Any]:
+        """Place values of data points into their grid cells.
+
+        Arguments:
+            values -- value of each data point (optionally with more axes, e.g., RGB
+                colors).
+            fill -- value of empty cells.
+
+        Returns:
+            Image array (rows × columns × additional axes of values), a view of the
+            values for dense grids.
+        """
+        values = np.asarray(values)
+        if self.is_dense:
+            return values.reshape((self.rows, self.columns, *values.shape[1:]))
+        image = np.full(
+            (len(self.index), *values.shape[1:]),
+            fill,
+            dtype=np.result_type(values, np.min_scalar_type(fill)),
+        )
+        image[self.cells] = values
+        return image.reshape((self.rows, self.columns, *values.shape[1:]))
+
+
+def _snap(values: npt.NDArray[np.float64], step: float) -> npt.NDArray[np.intp]:
+    """Snap positions along an axis to grid indexes.
+
+    Arguments:
+        values -- positions of data points (in any order).
+        step -- rough estimate of the grid spacing.
+
+    Returns:
+        Zero-based grid index of each data point.
+    """
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    # Split sorted positions into grid lines (the noise of positions on a line is much
+    # smaller than a half of the spacing).
+    between = np.diff(values) > step / 2
+    line_of_value = np.concatenate(([0], np.cumsum(between)))
+    starts = np.flatnonzero(np.concatenate(([True], between)))
+    centers = np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
+
+    # Distances between line centers are mostly a single spacing (unless whole lines
+    # are missing), and each is rounded on its own, so errors don't accumulate.
+    distances = np.diff(centers)
+    spacing = float(np.median(distances)) if len(distances) > 0 else step
+    lines = np.concatenate(
+        ([0], np.cumsum(np.maximum(np.rint(distances / spacing), 1), dtype=np.intp))
+    )
+
+    indexes = np.empty(len(values), dtype=np.intp)
+    indexes[order] = lines[line_of_value]
+    return indexes
+
+
+def from_positions(x: npt.ArrayLike, y: npt.ArrayLike) -> Grid:
+    """Build grid of data points from their positions.
+
+    The spacing of each axis is the median distance between grid lines, so a few missing
+    points (or whole rows) don't change it.
+
+    Arguments:
+        x -- X positions of data points.
+        y -- Y positions of data points.
+
+    Raises:
+        ValueError: positions are missing or don't form a grid.
+
+    Returns:
+        Grid of the data points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        raise ValueError("Input data has no data points.")
+    if not (np.all(np.isfinite(x)) and np.all(np.isfinite(y))):
+        raise ValueError("Input data has data points without positions.")
+
+    # Spacing of a complete grid with the same extent (or of a single row or column).
+    width, height = float(np.ptp(x)), float(np.ptp(y))
+    count = max(len(x) - 1, 1)
+    step = max(np.sqrt(width * height / count), width / count, height / count)
+    columns, rows = _snap(x, step or 1.0), _snap(y, step or 1.0)
+
+    shape = (int(np.max(rows)) + 1, int(np.max(columns)) + 1)
+    if shape[0] * shape[1] > MAX_CELLS_PER_POINT * len(x):
+        raise ValueError("Positions of data points don't form a grid.")
+    cells = rows * shape[1] + columns
+    index = np.full(shape[0] * shape[1], -1, dtype=np.intp)
+    index[cells] = np.arange(len(cells))
+    if np.count_nonzero(index >= 0) < len(cells):
+        raise ValueError("Input data has several data points at the same position.")
+    return Grid(shape[0], shape[1], cells, index)
+
+
+def from_df(df: pd.DataFrame) -> Grid:
+    """Build grid of data points of a map (see `from_positions()`)."""
+    return from_positions(*(df[column].to_numpy() for column in POSITION_COLUMNS))
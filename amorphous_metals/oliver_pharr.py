@@ -0,0 +1,419 @@
+"""Oliver–Pharr analysis of load–displacement curves.
+
+Recomputes the instrumented indentation results of a whole map at once from the curves
+in a `curves.CurveStore`:
+
+1. All curves are split into loading and unloading segments with array operations on
+   the concatenated samples (the unloading starts at the last sample of the hold at
+   maximum load).
+2. The power law `F = α (h - hp)^m` is fitted to the upper part of all unloading
+   segments together with a batched Levenberg–Marquardt method (each iteration solves
+   one 3×3 system per indent with a single `numpy.linalg.solve()` call).
+3. Stiffness `S = dF/dh` at maximum depth gives contact depth, projected contact area
+   (from an `AreaFunction`), hardness and reduced and indentation moduli, and the areas
+   under the segments give the elastic and total work of indentation.
+
+Results use the same column names and units as the instrument report, so they can be
+compared with (or replace) the columns produced by `convert.convert_raw_to_df()`.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from amorphous_metals import columnar
+from amorphous_metals.curves import CurveStore
+
+LOAD_UNIT = "mN"
+"""Unit of the curve load column."""
+
+DEPTH_UNIT = "nm"
+"""Unit of the curve depth column."""
+
+HVIT_FACTOR = 0.0926109
+"""Ratio of Vickers hardness to indentation hardness (in MPa) used by the instrument."""
+
+DEFAULT_POISSON_RATIO = 0.3
+"""Default Poisson's ratio of the sample (if not given in the report)."""
+
+DEFAULT_FIT_RANGE = (0.4, 0.98)
+"""Default part of the unloading segment (as fractions of maximum load) to fit."""
+
+DEFAULT_HOLD_TOLERANCE = 0.01
+"""Relative load drop ending the hold at maximum load."""
+
+_MIN_EXPONENT = 1.0 + 1e-6
+_MAX_EXPONENT = 10.0
+_MPA_PER_MN_NM2 = 1e9
+_GPA_PER_MN_NM2 = 1e6
+
+
+@dataclass(frozen=True)
+class AreaFunction:
+    """Projected contact area `Ap(hc) = C0 hc² + C1 hc + C2 hc^(1/2) + C3 hc^(1/4) + …`."""
+
+    coefficients: tuple[float, ...] = (24.5,)
+    """Coefficients `C0, C1, …` for depth in nm and area in nm² (ideal Berkovich)."""
+
+    def exponents(self) -> npt.NDArray[np.float64]:
+        """Get exponents of the terms (2, 1, 1/2, 1/4, …)."""
+        return 2.0 ** (1 - np.arange(len(self.coefficients)))
+
+    def __call__(self, depth: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """Get projected contact area for contact depth."""
+        depth = np.asarray(depth, dtype=np.float64)
+        return np.sum(
+            np.asarray(self.coefficients)
+            * np.power(depth[..., np.newaxis], self.exponents()),
+            axis=-1,
+        )
+
+    @classmethod
+    def fit(
+        cls, depth: npt.ArrayLike, area: npt.ArrayLike, terms: int = 4
+    ) -> "AreaFunction":
+        """Fit area function to contact depths and areas (e.g., from a report).
+
+        Arguments:
+            depth -- contact depths (`hc (O&P) [nm]`).
+            area -- projected contact areas (`Ap (O&P) [nm2]`).
+            terms -- number of coefficients.
+
+        Returns:
+            Least squares fit of the area function.
+        """
+        depth = np.asarray(depth, dtype=np.float64)
+        area = np.asarray(area, dtype=np.float64)
+        valid = np.isfinite(depth) & np.isfinite(area)
+        exponents = 2.0 ** (1 - np.arange(terms))
+        coefficients, *_ = np.linalg.lstsq(
+            np.power(depth[valid, np.newaxis], exponents), area[valid], rcond=None
+        )
+        return cls(tuple(coefficients.tolist()))
+
+
+@dataclass(frozen=True)
+class Indenter:
+    """Indenter properties."""
+
+    area_function: AreaFunction = AreaFunction()
+    """Projected contact area function."""
+    beta: float = 1.034
+    """Correction factor of the reduced modulus (Berkovich)."""
+    epsilon: float | None = None
+    """Geometry constant of contact depth (None computes it from the fitted `m`)."""
+    modulus: float = 1141.0
+    """Young's modulus in GPa (diamond)."""
+    poisson_ratio: float = 0.07
+    """Poisson's ratio (diamond)."""
+
+
+BERKOVICH = Indenter()
+"""Ideal diamond Berkovich indenter."""
+
+
+def epsilon_from_exponent(m: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Get contact depth geometry constant for the unloading power law exponent.
+
+    Arguments:
+        m -- power law exponent (above 1).
+
+    Returns:
+        Geometry constant (0.75 for a paraboloid of revolution, i.e., m = 1.5).
+    """
+    # SciPy special functions take long to import and are not needed for reports.
+    from scipy.special import gamma
+
+    m = np.asarray(m, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return m * (
+            1
+            - 2
+            * gamma(m / (2 * (m - 1)))
+            * (m - 1)
+            / (np.sqrt(np.pi) * gamma(1 / (2 * (m - 1))))
+        )
+
+
+def _power_law(
+    depth: npt.NDArray[np.float64], params: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Evaluate power law for padded depths (one row per indent).
+
+    Parameters are `(ln α, m, hp)`, as `α` spans orders of magnitude with `m`.
+    """
+    offset = np.maximum(depth - params[:, 2:3], np.finfo(np.float64).tiny)
+    return np.exp(params[:, 0:1] + params[:, 1:2] * np.log(offset))
+
+
+def _power_law_jacobian(
+    depth: npt.NDArray[np.float64],
+    params: npt.NDArray[np.float64],
+    load: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Get Jacobian of the power law (shape indents × 3 × samples)."""
+    offset = np.maximum(depth - params[:, 2:3], np.finfo(np.float64).tiny)
+    jacobian = np.empty((len(depth), 3, depth.shape[1]))
+    jacobian[:, 0] = load
+    np.multiply(load, np.log(offset), out=jacobian[:, 1])
+    np.divide(-params[:, 1:2] * load, offset, out=jacobian[:, 2])
+    return jacobian
+
+
+def fit_unloading(
+    depth: npt.NDArray[np.float64],
+    load: npt.NDArray[np.float64],
+    mask: npt.NDArray[np.bool_],
+    max_iter: int = 100,
+    tolerance: float = 1e-8,
+) -> npt.NDArray[np.float64]:
+    """Fit `F = α (h - hp)^m` to unloading segments of all indents at once.
+
+    Arguments:
+        depth -- padded depths (one row per indent).
+        load -- padded loads.
+        mask -- True for valid (not padding) samples.
+        max_iter -- maximum number of Levenberg–Marquardt iterations.
+        tolerance -- relative decrease of the residual sum of squares considered
+            converged.
+
+    Returns:
+        Parameters (α, m, hp), one row per indent (NaN if there are less than three
+        samples).
+    """
+    count = mask.sum(axis=1)
+    valid = count >= 3
+    depth = np.where(mask, depth, 0.0)
+    load = np.where(mask, load, 0.0)
+
+    # Initial guess: m = 1.5 through the lowest and the highest sample.
+    rows = np.arange(len(depth))
+    low = np.where(mask, load, np.inf).argmin(axis=1)
+    high = np.where(mask, load, -np.inf).argmax(axis=1)
+    ratio = np.clip(load[rows, low] / np.maximum(load[rows, high], 1e-300), 0, 0.99)
+    ratio = ratio ** (1 / 1.5)
+    hp = (depth[rows, low] - ratio * depth[rows, high]) / (1 - ratio)
+    # Permanent depth stays below all fitted samples (the power law is undefined there).
+    hp_max = np.where(valid, np.where(mask, depth, np.inf).min(axis=1), 0.0)
+    hp_max -= 1e-9 * np.maximum(np.abs(hp_max), 1.0)
+    hp = np.minimum(hp, hp_max)
+    alpha = load[rows, high] / np.maximum(depth[rows, high] - hp, 1e-300) ** 1.5
+    alpha = np.maximum(alpha, np.finfo(np.float64).tiny)
+    params = np.stack((np.log(alpha), np.full(len(depth), 1.5), hp), axis=-1)
+    params[~valid] = 1.0
+
+    def residuals(
+        params: npt.NDArray[np.float64], rows: npt.NDArray[np.intp]
+    ) -> npt.NDArray[np.float64]:
+        return np.where(mask[rows], _power_law(depth[rows], params) - load[rows], 0.0)
+
+    damping = np.full(len(depth), 1e-3)
+    current = residuals(params, rows)
+    cost = np.einsum("nl,nl->n", current, current)
+    active = np.flatnonzero(valid)
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        jacobian = _power_law_jacobian(
+            depth[active], params[active], current[active] + load[active]
+        )
+        jacobian *= mask[active, np.newaxis]
+        normal = jacobian @ jacobian.transpose(0, 2, 1)
+        gradient = jacobian @ current[active, :, np.newaxis]
+
+        # Marquardt damping scaled by the diagonal of the normal matrix.
+        diagonal = np.einsum("nii->ni", normal)
+        normal += np.eye(3) * (damping[active, np.newaxis] * diagonal)[:, np.newaxis]
+        normal += np.eye(3) * np.finfo(np.float64).tiny
+        step = np.linalg.solve(normal, -gradient)[..., 0]
+
+        candidate = params[active] + step
+        candidate[:, 1] = np.clip(candidate[:, 1], _MIN_EXPONENT, _MAX_EXPONENT)
+        candidate[:, 2] = np.minimum(candidate[:, 2], hp_max[active])
+        candidate_residuals = residuals(candidate, active)
+        candidate_cost = np.einsum("nl,nl->n", candidate_residuals, candidate_residuals)
+
+        better = np.isfinite(candidate_cost) & (candidate_cost < cost[active])
+        improvement = (cost[active] - candidate_cost) / np.maximum(
+            cost[active], np.finfo(np.float64).tiny
+        )
+        params[active[better]] = candidate[better]
+        current[active[better]] = candidate_residuals[better]
+        cost[active[better]] = candidate_cost[better]
+        damping[active] = np.where(better, damping[active] / 3, damping[active] * 4)
+        converged = (better & (improvement < tolerance)) | (damping[active] > 1e12)
+        active = active[~converged]
+
+    params[:, 0] = np.exp(params[:, 0])
+    params[~valid] = np.nan
+    return params
+
+
+def _last_where(
+    condition: npt.NDArray[np.bool_], offsets: npt.NDArray[np.int64]
+) -> npt.NDArray[np.intp]:
+    """Get index of the last sample of each curve meeting the condition (-1 if none)."""
+    indexes = np.where(condition, np.arange(len(condition)), -1)
+    return np.maximum.reduceat(indexes, offsets[:-1])
+
+
+def recompute(
+    store: CurveStore,
+    indenter: Indenter = BERKOVICH,
+    poisson_ratio: float | npt.ArrayLike = DEFAULT_POISSON_RATIO,
+    fit_range: tuple[float, float] = DEFAULT_FIT_RANGE,
+    hold_tolerance: float = DEFAULT_HOLD_TOLERANCE,
+    load_column: str | None = None,
+    depth_column: str | None = None,
+) -> pd.DataFrame:
+    """Recompute Oliver–Pharr results of all indents from their curves.
+
+    Arguments:
+        store -- curves of the map.
+        indenter -- indenter properties (area function, constants).
+        poisson_ratio -- Poisson's ratio of the sample (scalar or one per curve).
+        fit_range -- part of the unloading segment to fit (fractions of maximum load).
+        hold_tolerance -- relative load drop ending the hold at maximum load.
+        load_column -- load column of the curves (first column in mN by default).
+        depth_column -- depth column of the curves (first column in nm by default).
+
+    Raises:
+        ValueError: load or depth column is not found.
+
+    Returns:
+        Results with report column names, one row per curve with the row label
+        matching `convert_raw_to_df()` (indent number - 1).
+    """
+    units = columnar.column_units(store.columns)
+    load_column = load_column or next(
+        (name for name, unit in units.items() if unit == LOAD_UNIT), None
+    )
+    depth_column = depth_column or next(
+        (name for name, unit in units.items() if unit == DEPTH_UNIT), None
+    )
+    if load_column is None or depth_column is None:
+        raise ValueError(f"Load and depth columns not found in: {store.columns}")
+
+    samples = np.asarray(store.samples)
+    load = samples[:, store.columns.index(load_column)]
+    depth = samples[:, store.columns.index(depth_column)]
+    offsets = store.offsets
+    lengths = np.diff(offsets)
+    if len(lengths) == 0 or (lengths == 0).any():
+        raise ValueError("Curves without samples cannot be analysed.")
+    curve_of = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Maximum load and the end of its hold (start of the unloading segment).
+    max_load = np.maximum.reduceat(load, offsets[:-1])
+    start = _last_where(load >= (1 - hold_tolerance) * max_load[curve_of], offsets)
+    f_max, h_max = load[start], depth[start]
+
+    # Work of indentation (areas under loading and unloading segments).
+    work = np.zeros(len(load))
+    work[:-1] = 0.5 * (load[1:] + load[:-1]) * np.diff(depth)
+    work[offsets[1:] - 1] = 0.0
+    loading = np.arange(len(load)) < start[curve_of]
+    w_total = np.add.reduceat(np.where(loading, work, 0.0), offsets[:-1])
+    w_elastic = -np.add.reduceat(np.where(loading, 0.0, work), offsets[:-1])
+
+    # Padded upper part of unloading segments.
+    unloading = ~loading & (
+        (load >= fit_range[0] * f_max[curve_of])
+        & (load <= fit_range[1] * f_max[curve_of])
+    )
+    fit_indexes = np.flatnonzero(unloading)
+    fit_curves = curve_of[fit_indexes]
+    fit_counts = np.bincount(fit_curves, minlength=len(lengths))
+    fit_starts = np.concatenate(([0], np.cumsum(fit_counts)[:-1]))
+    columns = np.arange(len(fit_indexes)) - fit_starts[fit_curves]
+    width = max(int(fit_counts.max()), 1)
+    padded_depth = np.zeros((len(lengths), width))
+    padded_load = np.zeros((len(lengths), width))
+    mask = np.zeros((len(lengths), width), dtype=np.bool_)
+    padded_depth[fit_curves, columns] = depth[fit_indexes]
+    padded_load[fit_curves, columns] = load[fit_indexes]
+    mask[fit_curves, columns] = True
+    alpha, m, h_p = fit_unloading(padded_depth, padded_load, mask).T
+
+    # Oliver–Pharr quantities.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stiffness = alpha * m * (h_max - h_p) ** (m - 1)
+        epsilon = (
+            epsilon_from_exponent(m)
+            if indenter.epsilon is None
+            else np.full(len(m), indenter.epsilon)
+        )
+        h_c = h_max - epsilon * f_max / stiffness
+        area = indenter.area_function(h_c)
+        hardness = f_max / area * _MPA_PER_MN_NM2
+        reduced_modulus = (
+            np.sqrt(np.pi) / (2 * indenter.beta) * stiffness / np.sqrt(area)
+        ) * _GPA_PER_MN_NM2
+        plane_strain_modulus = 1 / (
+            1 / reduced_modulus - (1 - indenter.poisson_ratio**2) / indenter.modulus
+        )
+        poisson_ratio = np.broadcast_to(
+            np.asarray(poisson_ratio, dtype=np.float64), m.shape
+        )
+        modulus = plane_strain_modulus * (1 - poisson_ratio**2)
+
+    return pd.DataFrame(
+        {
+            "HIT (O&P) [MPa]": hardness,
+            "HVIT (O&P) [Vickers]": hardness * HVIT_FACTOR,
+            "EIT (O&P) [GPa]": modulus,
+            "E* (O&P) [GPa]": plane_strain_modulus,
+            "Er (O&P) [GPa]": reduced_modulus,
+            "hm (O&P) [nm]": h_max,
+            "Fm (O&P) [mN]": f_max,
+            "S (O&P) [mN/nm]": stiffness,
+            "Poisson's ratio [Nu]": poisson_ratio,
+            "hc (O&P) [nm]": h_c,
+            "hr (O&P) [nm]": h_max - f_max / stiffness,
+            "hp (O&P) [nm]": h_p,
+            "Epsilon (O&P) []": epsilon,
+            "Ap (O&P) [nm2]": area,
+            "m (O&P) []": m,
+            "Welast [pJ]": w_elastic,
+            "Wplast [pJ]": w_total - w_elastic,
+            "Wtotal [pJ]": w_total,
+            "nit [%]": w_elastic / w_total * 100,
+        },
+        index=pd.Index(store.indents - 1),
+    )
+
+
+def update_report(
+    df: pd.DataFrame, store: CurveStore, indenter: Indenter = BERKOVICH
+) -> pd.DataFrame:
+    """Replace Oliver–Pharr results of a report with values recomputed from curves.
+
+    Arguments:
+        df -- report data frame (see `convert.convert_raw_to_df()`).
+        store -- curves of the report.
+        indenter -- indenter properties.
+
+    Returns:
+        Data frame with recomputed columns (indents without curves keep the original
+        values, Poisson's ratio of the report is used if present).
+    """
+    poisson_ratio: float | npt.NDArray[np.float64] = DEFAULT_POISSON_RATIO
+    if "Poisson's ratio [Nu]" in df.columns:
+        poisson_ratio = (
+            df["Poisson's ratio [Nu]"]
+            .reindex(store.indents - 1)
+            .fillna(DEFAULT_POISSON_RATIO)
+            .to_numpy()
+        )
+    results = recompute(store, indenter, poisson_ratio)
+
+    updated = df.copy()
+    for column in results.columns:
+        if column not in updated.columns:
+            updated[column] = np.nan
+    rows = results.index.intersection(updated.index)
+    updated.loc[rows, results.columns] = results.loc[rows]
+    updated.Name = getattr(df, "Name", "")
+    return updated
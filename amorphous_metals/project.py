@@ -0,0 +1,106 @@
+"""Projects of many maps clustered jointly.
+
+Data frames of all maps (samples) are stacked into a single data frame with a
+categorical sample id column. Clustering the stacked data gives cluster labels, which
+mean the same phase in all samples, and the result can be split back into maps with
+`sample_slices()`.
+"""
+
+from typing import Mapping
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+SAMPLE_COLUMN = "Sample"
+"""Column with sample id (categorical) of stacked data frames."""
+
+
+def stack_maps(dfs: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """Stack data frames of maps into a single data frame.
+
+    Only columns present in all maps are kept (in the order of the first map). Rows of
+    each map are kept together and in order, so maps can be reshaped to images again.
+
+    Arguments:
+        dfs -- data frames of maps by sample name.
+
+    Raises:
+        ValueError: there are no maps or they have no common columns.
+
+    Returns:
+        Stacked data frame with the sample column (last) and a new range index.
+    """
+    if len(dfs) == 0:
+        raise ValueError("Project has no maps.")
+    frames = list(dfs.values())
+    columns = [
+        column
+        for column in frames[0].columns
+        if column != SAMPLE_COLUMN and all(column in df.columns for df in frames[1:])
+    ]
+    if len(columns) == 0:
+        raise ValueError("Maps of the project have no common columns.")
+
+    # Categorical codes need a single byte per row for up to 127 samples.
+    names = list(dfs.keys())
+    codes = np.repeat(
+        np.arange(len(names), dtype=np.min_scalar_type(-len(names))),
+        [len(df) for df in frames],
+    )
+    stacked = pd.concat(
+        [df[columns] for df in frames], ignore_index=True, copy=False
+    ).astype(np.float64, copy=False)
+    stacked[SAMPLE_COLUMN] = pd.Categorical.from_codes(codes, names)
+    stacked.Name = f"Project of {len(names)} samples"
+    return stacked
+
+
+def is_project(df: pd.DataFrame) -> bool:
+    """Check if data frame is stacked from several maps (see `stack_maps()`)."""
+    return SAMPLE_COLUMN in df.columns
+
+
+def feature_columns(df: pd.DataFrame) -> list[str]:
+    """Get columns with features (i.e., without the sample column)."""
+    return [column for column in df.columns if column != SAMPLE_COLUMN]
+
+
+def sample_slices(df: pd.DataFrame) -> dict[str, slice]:
+    """Get rows of each sample of stacked data frame.
+
+    Arguments:
+        df -- stacked data frame (see `stack_maps()`).
+
+    Returns:
+        Slice of rows (positions) by sample name.
+    """
+    samples = df[SAMPLE_COLUMN]
+    counts = np.bincount(
+        samples.cat.codes.to_numpy(), minlength=len(samples.cat.categories)
+    )
+    stops = np.cumsum(counts)
+    return {
+        str(name): slice(int(stop - count), int(stop))
+        for name, count, stop in zip(samples.cat.categories, counts, stops)
+    }
+
+
+def sample_fractions(
+    samples: pd.Series | npt.ArrayLike, clusters: npt.ArrayLike
+) -> pd.DataFrame:
+    """Get area fraction of each cluster in each sample.
+
+    Arguments:
+        samples -- sample of each clustered row.
+        clusters -- cluster of each row.
+
+    Returns:
+        Data frame with a row per sample and a column per cluster.
+    """
+    return pd.crosstab(
+        pd.Series(pd.Categorical(samples), name="sample"),
+        pd.Series(np.asarray(clusters), name="cluster"),
+        normalize="index",
+        dropna=False,
+    )
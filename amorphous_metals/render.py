@@ -0,0 +1,114 @@
+"""Fast rendering of maps into RGB images without Matplotlib figures.
+
+Values are mapped to colors with a lookup table (LUT) of the colormap, which gives
+the same colors as `imshow()` with the default (256 colors) colormaps, and the result
+is a `uint8` RGB array ready for `st.image()`. Rendering a map this way takes
+microseconds instead of laying out and rasterizing a figure with Agg.
+"""
+
+import functools
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+LUT_SIZE = 256
+"""Number of colors of colormap lookup tables."""
+
+HOLE_COLOR = (255, 255, 255)
+"""Color of data holes (NaN values)."""
+
+
+@functools.cache
+def colormap_lut(name: str = "viridis") -> npt.NDArray[np.uint8]:
+    """Get lookup table of Matplotlib colormap.
+
+    Arguments:
+        name -- colormap name.
+
+    Returns:
+        Read-only array of LUT_SIZE RGB colors.
+    """
+    import matplotlib as mpl
+
+    # Truncated to bytes the same way as colormaps do (`bytes=True`).
+    lut = (mpl.colormaps[name](np.arange(LUT_SIZE))[:, :3] * 255).astype(np.uint8)
+    lut.flags.writeable = False  # shared by all callers
+    return lut
+
+
+def color_indexes(
+    values: npt.ArrayLike, vmin: float | None = None, vmax: float | None = None
+) -> npt.NDArray[np.intp]:
+    """Get colormap LUT indexes of values (same scaling as `imshow()`).
+
+    Arguments:
+        values -- array of values (NaN for holes).
+        vmin -- value of the first color (minimum of values by default).
+        vmax -- value of the last color (maximum of values by default).
+
+    Returns:
+        Array of indexes of the same shape as values (-1 for NaN values).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(values.shape, -1, dtype=np.intp)
+    if vmin is None:
+        vmin = float(np.min(values, where=finite, initial=np.inf))
+    if vmax is None:
+        vmax = float(np.max(values, where=finite, initial=-np.inf))
+
+    scale = LUT_SIZE / (vmax - vmin) if vmax > vmin else 0.0
+    scaled = np.clip((values - vmin) * scale, 0, LUT_SIZE - 1)
+    return np.where(finite, scaled, -1).astype(np.intp)
+
+
+def upscale(image: npt.NDArray[Any], scale: int) -> npt.NDArray[Any]:
+    """Upscale image by nearest neighbour interpolation.
+
+    Arguments:
+        image -- image array (height × width or height × width × channels).
+        scale -- integral scale factor.
+
+    Returns:
+        Image (scale × height) × (scale × width) (the same image if scale is 1).
+    """
+    if scale == 1:
+        return image
+    # Repeating whole pixels along rows and copying the rows once from a broadcast
+    # view is much faster than repeating along both axes (or broadcasting both).
+    rows = np.repeat(image, scale, axis=1)
+    return np.broadcast_to(
+        rows[:, None], (rows.shape[0], scale, *rows.shape[1:])
+    ).reshape((rows.shape[0] * scale, *rows.shape[1:]))
+
+
+def render_map(
+    values: npt.ArrayLike,
+    vmin: float | None = None,
+    vmax: float | None = None,
+    cmap: str = "viridis",
+    scale: int = 1,
+) -> npt.NDArray[np.uint8]:
+    """Render map of values into RGB image.
+
+    Arguments:
+        values -- 2D array of values (NaN for holes, which are white).
+        vmin -- value of the first color (minimum of values by default).
+        vmax -- value of the last color (maximum of values by default).
+        cmap -- Matplotlib colormap name.
+        scale -- integral upscaling factor (nearest neighbour).
+
+    Returns:
+        Image array (height × width × 3 uint8 RGB).
+    """
+    indexes = color_indexes(values, vmin, vmax)
+    # The hole color is the last color of the extended LUT, i.e., the index -1.
+    lut = np.vstack((colormap_lut(cmap), np.array(HOLE_COLOR, dtype=np.uint8)))
+    return upscale(lut[indexes], scale)
+
+
+def scale_to_width(width: int, target: int) -> int:
+    """Get upscaling factor for rendering map at least target pixels wide."""
+    return max(1, -(-target // max(width, 1)))
@@ -0,0 +1,332 @@
+"""Batched persistence of streamlit-analytics counts.
+
+`streamlit_analytics2` keeps counts of page views and widget interactions in a
+process-wide dictionary. Loading and saving them with `start_tracking()` and
+`stop_tracking()` reads and rewrites the whole JSON store on every rerun, and
+concurrent sessions overwrite each other's counts.
+
+`AnalyticsSink` loads the store once per process instead, and the counts in memory
+serve as the buffer of events. A background thread appends the increments since the
+previous flush to a log next to the store in batches, so reruns never wait for the
+disk:
+
+- the store stays a single JSON snapshot of counts (the format written by
+  streamlit-analytics, so it can be read by it and other tools at any time),
+- each line of the increments log has the increments of a single flush,
+- compaction merges the log into the snapshot when there are many lines.
+
+Processes (e.g., replicas of the app) sharing the store lock the log with `flock()`
+for appends and for the whole compaction, so no increments are lost between reading
+the log and replacing the snapshot.
+"""
+
+import atexit
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Mapping
+
+CounterPath = tuple[str, ...]
+"""Path of a counter in the nested counts dictionary (e.g., widget and option)."""
+
+COUNTER_KEYS = ("total_pageviews", "total_script_runs", "total_time_seconds")
+"""Top-level counters."""
+
+DEFAULT_FLUSH_INTERVAL = 10.0
+"""Default interval of flushes in seconds."""
+
+DEFAULT_COMPACT_AFTER = 500
+"""Default number of increment lines of the store which triggers compaction."""
+
+
+def flatten_counts(counts: Mapping[str, Any]) -> dict[CounterPath, float]:
+    """Get all counters of counts as a flat dictionary.
+
+    Dictionaries are copied before iteration, so counts can be flattened while other
+    sessions update them.
+
+    Arguments:
+        counts -- counts in the format of streamlit-analytics.
+
+    Returns:
+        Value of each counter by its path (widget options are converted to strings,
+        as in the JSON store).
+    """
+    flat: dict[CounterPath, float] = {
+        (key,): counts[key] for key in COUNTER_KEYS if key in counts
+    }
+
+    per_day = counts.get("per_day", {})
+    for day, pageviews, script_runs in zip(
+        list(per_day.get("days", ())),
+        list(per_day.get("pageviews", ())),
+        list(per_day.get("script_runs", ())),
+    ):
+        flat[("per_day", day, "pageviews")] = pageviews
+        flat[("per_day", day, "script_runs")] = script_runs
+
+    for label, value in list(counts.get("widgets", {}).items()):
+        if isinstance(value, dict):
+            for option, count in list(value.items()):
+                path = ("widgets", str(label), str(option))
+                flat[path] = flat.get(path, 0) + count
+        else:
+            flat[("widgets", str(label))] = value
+    return flat
+
+
+def add_counts(counts: dict[str, Any], increments: Iterable[tuple[CounterPath, float]]):
+    """Add increments of counters to counts (in place).
+
+    Arguments:
+        counts -- counts in the format of streamlit-analytics.
+        increments -- increment of each counter by its path (see `flatten_counts()`).
+    """
+    for path, value in increments:
+        if path[0] == "per_day":
+            per_day = counts.setdefault(
+                "per_day", {"days": [], "pageviews": [], "script_runs": []}
+            )
+            day, name = path[1], path[2]
+            if day not in per_day["days"]:
+                # Days are ISO dates, so their order is the string order.
+                position = sum(1 for other in per_day["days"] if other < day)
+                for key, new in (("days", day), ("pageviews", 0), ("script_runs", 0)):
+                    per_day[key].insert(position, new)
+            per_day[name][per_day["days"].index(day)] += value
+        elif path[0] == "widgets":
+            widgets = counts.setdefault("widgets", {})
+            if len(path) == 2:
+                widgets[path[1]] = widgets.get(path[1], 0) + value
+            else:
+                options = widgets.setdefault(path[1], {})
+                options[path[2]] = options.get(path[2], 0) + value
+        else:
+            counts[path[0]] = counts.get(path[0], 0) + value
+
+
+def default_log_path(path: Path) -> Path:
+    """Get default path of the increments log of the store (in the same directory)."""
+    return path.with_name(f"{path.stem}.increments.jsonl")
+
+
+@contextlib.contextmanager
+def locked_log(log_path: Path, exclusive: bool = True) -> Iterator[IO[str]]:
+    """Open increments log locked against other processes.
+
+    Arguments:
+        log_path -- increments log path (created if it doesn't exist).
+        exclusive -- lock for writing (or shared for reading).
+
+    Yields:
+        Log opened for appending and reading (the lock is released on close).
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("a+") as log:
+        fcntl.flock(log, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield log
+
+
+def read_store(path: Path, log_path: Path | None = None) -> tuple[dict[str, Any], int]:
+    """Read counts from the store and its increments log.
+
+    Arguments:
+        path -- store path.
+        log_path -- increments log path (see `default_log_path()` for the default).
+
+    Returns:
+        Counts (empty if the store doesn't exist) and the number of increment lines.
+    """
+    with locked_log(log_path or default_log_path(path), exclusive=False) as log:
+        return _read_store(path, log)
+
+
+def _read_store(path: Path, log: IO[str]) -> tuple[dict[str, Any], int]:
+    """Read counts from the store and the locked log."""
+    try:
+        snapshot = path.read_text()
+    except FileNotFoundError:
+        snapshot = ""
+    log.seek(0)
+    # Stores with appended increments (of earlier versions) are read as well.
+    text = snapshot + "\n" + log.read()
+
+    decoder = json.JSONDecoder()
+    counts: dict[str, Any] = {}
+    lines = 0
+    position = 0
+    while True:
+        # Skip whitespace between documents (raw_decode() doesn't).
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position == len(text):
+            break
+        try:
+            document, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            # A flush interrupted by a crash leaves an incomplete last line.
+            print(f'Skipping corrupted end of "{path}".')
+            break
+        if "increments" in document:
+            add_counts(
+                counts,
+                ((tuple(counter), value) for counter, value in document["increments"]),
+            )
+            lines += 1
+        else:
+            counts = document
+    return counts, lines
+
+
+def write_snapshot(path: Path, counts: Mapping[str, Any]):
+    """Replace the store with a snapshot of counts.
+
+    The snapshot is written to a temporary file first, but stores mounted as single
+    files (e.g., into a container) cannot be replaced, so they are rewritten in place.
+    """
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=path.name, delete=False
+    ) as output_file:
+        try:
+            json.dump(counts, output_file)
+            output_file.write("\n")
+            output_file.close()
+            try:
+                os.replace(output_file.name, path)
+            except OSError:
+                path.write_text(Path(output_file.name).read_text())
+                os.unlink(output_file.name)
+        except BaseException:
+            if os.path.exists(output_file.name):
+                os.unlink(output_file.name)
+            raise
+
+
+class AnalyticsSink:
+    """Background persistence of streamlit-analytics counts of a process."""
+
+    def __init__(
+        self,
+        path: Path | str,
+        counts: dict[str, Any],
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        compact_after: int = DEFAULT_COMPACT_AFTER,
+        log_path: Path | str | None = None,
+    ):
+        """Create sink (see `start()`).
+
+        Arguments:
+            path -- store path.
+            counts -- counts of streamlit-analytics (updated by page runs).
+            flush_interval -- interval of flushes in seconds.
+            compact_after -- number of increment lines which triggers compaction.
+            log_path -- increments log path (see `default_log_path()` for the
+                default).
+        """
+        self.path = Path(path)
+        self.log_path = (
+            default_log_path(self.path) if log_path is None else Path(log_path)
+        )
+        self.counts = counts
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self._flushed: dict[CounterPath, float] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Load counts from the store and start flushing in a background thread."""
+        try:
+            stored, self._lines = read_store(self.path, self.log_path)
+        except (OSError, ValueError, TypeError) as e:
+            print(f'Failed to read "{self.path}": {e}')
+            stored = {}
+        # Same as streamlit-analytics, unknown keys of the store are ignored.
+        for key in stored:
+            if key in self.counts:
+                self.counts[key] = stored[key]
+        self._flushed = flatten_counts(self.counts)
+
+        self._thread = threading.Thread(
+            target=self._run, name="analytics-sink", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def flush(self) -> int:
+        """Append increments of counts since the previous flush to the log.
+
+        Returns:
+            Number of changed counters.
+        """
+        with self._lock:
+            current = flatten_counts(self.counts)
+            increments = [
+                (list(path), value - self._flushed.get(path, 0))
+                for path, value in current.items()
+                if value != self._flushed.get(path, 0)
+            ]
+            # Counters removed by resetting the counts (in the analytics results).
+            increments.extend(
+                (list(path), -value)
+                for path, value in self._flushed.items()
+                if path not in current and value != 0
+            )
+            if len(increments) == 0:
+                return 0
+
+            line = json.dumps(
+                {
+                    "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "increments": increments,
+                }
+            )
+            with locked_log(self.log_path) as log:
+                log.write(line + "\n")
+            self._flushed = current
+            self._lines += 1
+
+            if self._lines >= self.compact_after:
+                self._compact()
+        return len(increments)
+
+    def compact(self):
+        """Merge the increments log into the store snapshot."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        # Other processes cannot append until the log is emptied.
+        with locked_log(self.log_path) as log:
+            counts, _ = _read_store(self.path, log)
+            write_snapshot(self.path, counts)
+            log.truncate(0)
+        self._lines = 0
+
+    def close(self):
+        """Stop the background thread and persist the remaining increments."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+            # The snapshot is up to date for readers of the store after exit.
+            if self._lines > 0:
+                self.compact()
+        except OSError as e:
+            print(f'Failed to write "{self.path}": {e}')
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f'Failed to write "{self.path}": {e}')
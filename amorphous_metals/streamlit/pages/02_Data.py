@@ -1,13 +1,14 @@
 """Materials and research methods used for this study Streamlit subpage."""
 
-import math
 import os
+from collections.abc import Container
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from amorphous_metals import columnar, curves, grid, project, render
 from amorphous_metals.streamlit import utils
 
 utils.page_head()
@@ -36,11 +37,11 @@ def show_file(df: pd.DataFrame):
         pass
 
     # Check if there are holes in the data.
-    holes = utils.has_holes(df)
-    if any(holes):
+    holes = np.flatnonzero(utils.has_holes(df))
+    if len(holes) > 0:
         st.warning(
             "**Warning:** The data has holes in rows: *"
-            + "*, *".join(str(i) for i, hole in enumerate(holes) if hole)
+            + "*, *".join(str(i) for i in holes)
             + "*. Clustering will skip these rows."
         )
 
@@ -49,24 +50,123 @@ def show_file(df: pd.DataFrame):
     df_expander.dataframe(df)
     df_expander.dataframe(df.describe())
 
-    # Create plots.
-    try:
-        plot_name = df.Name
-    except AttributeError:
-        plot_name = None
-    fig = plt.figure(num=plot_name, figsize=(7, 12))
-    fig.tight_layout()
-
+    # Show images of all columns (each with its own color scale).
+    map_grid = grid.from_df(df)
+    scale = render.scale_to_width(map_grid.columns, utils.MAP_IMAGE_WIDTH)
     subplot_cols = 4
-    subplot_rows = math.ceil(len(df.columns) / subplot_cols)
+    for row_start in range(0, len(df.columns), subplot_cols):
+        for st_column, column in zip(
+            st.columns(subplot_cols), df.columns[row_start : row_start + subplot_cols]
+        ):
+            st_column.image(
+                render.render_map(map_grid.image(df[column].to_numpy()), scale=scale),
+                caption=str(column),
+                use_column_width=True,
+            )
+
+
+@utils.default_st_cache(show_spinner="Processing project…")
+def show_project(df: pd.DataFrame):
+    """Visualize maps stacked into a project.
+
+    Arguments:
+        df -- stacked data frame (see `project.stack_maps()`).
+    """
+    st.write(f"Results for `{df.Name}`:")
+
+    samples = df.groupby(project.SAMPLE_COLUMN, observed=False, sort=False)
+    holes = pd.Series(utils.has_holes(df), index=df.index)
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "data points": samples.size(),
+                "holes": holes.groupby(
+                    df[project.SAMPLE_COLUMN], observed=False, sort=False
+                ).sum(),
+            }
+        )
+    )
+
+    # Show "raw" data frame.
+    df_expander = st.expander("Stacked data frame")
+    df_expander.dataframe(df)
+    df_expander.dataframe(samples.mean())
+
+
+def unique_name(name: str, taken: Container[str]) -> str:
+    """Make a sample name unique by adding a number (e.g., `name (2)`)."""
+    unique, number = name, 1
+    while unique in taken:
+        number += 1
+        unique = f"{name} ({number})"
+    return unique
+
+
+def load_project(presets: dict[str, Path]) -> pd.DataFrame | None:
+    """Show project inputs and stack the selected maps.
+
+    Arguments:
+        presets -- available presets by name.
+
+    Returns:
+        Stacked data frame or None if no map is selected (samples with the same name,
+        e.g., uploads from different folders, are numbered).
+    """
+    input_files = st.file_uploader(
+        "Upload raw data of samples:", type="txt", accept_multiple_files=True
+    )
+    selected_presets = (
+        st.multiselect("Select presets:", presets) if len(presets) > 0 else []
+    )
+
+    dfs: dict[str, pd.DataFrame] = {}
+    for input_file in input_files or []:
+        df = utils.convert_raw_to_df(input_file)
+        if df is not None:
+            dfs[unique_name(Path(input_file.name).stem, dfs)] = df
+    for preset in selected_presets:
+        df = utils.convert_raw_to_df(presets[preset])
+        if df is not None:
+            dfs[unique_name(preset, dfs)] = df
+
+    if len(dfs) == 0:
+        return None
+    return project.stack_maps(dfs)
+
+
+def show_curves(store: curves.CurveStore, df: pd.DataFrame):
+    """Visualize load–displacement curves of the indents.
 
-    for subplot_i, column in enumerate(df):
-        a = fig.add_subplot(subplot_rows, subplot_cols, subplot_i + 1)
-        a.imshow(df[column].to_numpy().reshape((utils.image_width(df), -1)))
-        a.set_title(str(column), fontsize=10)
-        a.set_axis_off()
+    Arguments:
+        store -- curves of the file.
+        df -- data frame generated from the file.
+    """
+    curves_expander = st.expander("Load–displacement curves")
+    indent = curves_expander.selectbox("Select indent:", store.indents)
+    if indent is None:
+        return
+
+    # Defaults to displacement on X axis and load on Y axis.
+    units = list(columnar.column_units(store.columns).values())
+    x_column = curves_expander.selectbox(
+        "X axis:", store.columns, units.index("nm") if "nm" in units else 0
+    )
+    y_column = curves_expander.selectbox(
+        "Y axis:", store.columns, units.index("mN") if "mN" in units else 1
+    )
+
+    import matplotlib.pyplot as plt
 
-    st.pyplot(fig)
+    rows = df.index[curves.indent_numbers(df) == indent]
+    curve = store.curve(indent)
+    fig, ax = plt.subplots()
+    ax.plot(curve[x_column], curve[y_column])
+    ax.set_xlabel(x_column)
+    ax.set_ylabel(y_column)
+    if len(rows) > 0:
+        point = df.loc[rows[0]]
+        ax.set_title(f"Indent {indent} (X = {point['X [mm]']}, Y = {point['Y [mm]']})")
+    curves_expander.pyplot(fig)
 
 
 with input_tab:
@@ -81,12 +181,20 @@ with input_tab:
         else {}
     )
 
+    project_mode = st.toggle(
+        "Project mode",
+        help="Load many maps and cluster them jointly, so that clusters mean the same "
+        "phase in all samples.",
+    )
+
     # Source selection (file or preset).
-    source_cols = st.columns(1 if len(presets) == 0 else 2)
+    source_cols = st.columns(1 if len(presets) == 0 or project_mode else 2)
 
-    input_file = source_cols[0].file_uploader(
-        "Upload raw data from nanoindenter:", type="txt"
-    )
+    input_file = None
+    if not project_mode:
+        input_file = source_cols[0].file_uploader(
+            "Upload raw data from nanoindenter:", type="txt"
+        )
 
     preset: str | None = None
     if len(source_cols) > 1:
@@ -95,21 +203,35 @@ with input_tab:
         )
 
     try:
-        if input_file is not None:
+        curve_store = None
+        if project_mode:
+            with source_cols[0]:
+                df = load_project(presets)
+        elif input_file is not None:
             df = utils.convert_raw_to_df(input_file)
         elif preset is not None:
             df = utils.convert_raw_to_df(presets[preset])
+            try:
+                curve_store = curves.load_curves(presets[preset])
+            except (ValueError, OSError) as e:
+                st.warning(f"Load–displacement curves cannot be loaded: {e}")
         else:
             df = None
 
         if df is not None:
             st.session_state.df = df
+            st.session_state.curves = curve_store
     except ValueError as e:
         st.error(f"Parser error: {e}")
 
     # Show the data frame.
     if "df" in st.session_state:
-        show_file(st.session_state.df)
+        if project.is_project(st.session_state.df):
+            show_project(st.session_state.df)
+        else:
+            show_file(st.session_state.df)
+        if st.session_state.get("curves") is not None:
+            show_curves(st.session_state.curves, st.session_state.df)
 
         col1, col2 = st.columns(2)
         col1.write(
@@ -1,10 +1,12 @@
 """Hierarchical clustering Streamlit subpage."""
 
+import numpy as np
+import numpy.typing as npt
 import scipy.cluster.hierarchy as sph
 import scipy.spatial.distance as spd
 import streamlit as st
-from matplotlib import pyplot as plt
 
+from amorphous_metals.cluster import hierarchical, pipeline, selection
 from amorphous_metals.streamlit import utils
 
 utils.page_head()
@@ -17,38 +19,104 @@ with method:
     utils.show_markdown_sibling(__file__)
 
 
-@utils.default_st_cache(show_spinner="Performing hierarchical clustering…")
-def hierarchical_clustering(
-    data: utils.SelectedData, method: str, metric: str, cluster_count: int
-) -> utils.ClusteringResult:
-    """Perform hierarchical clustering."""
-    # Prepare "clusterable" data.
-    df_clust = data.prepare_df_for_clustering()
-
-    # Prepare figure.
-    fig = plt.figure()
-    fig.canvas.header_visible = False  # type: ignore
-    fig.tight_layout()
-
-    # Show reference image.
-    ref_plot = fig.add_subplot(1, 2, 1)
-    ref_plot.set_title(f"Reference: {data.reference_name}")
-    ref_plot.set_axis_off()
-    ref_plot.imshow(data.get_reference_image())
-
-    # Perform clustering.
-    clusters = sph.fcluster(
-        sph.linkage(df_clust, method, metric), cluster_count, "maxclust"
+CLUSTER_COUNTS = range(2, 11)
+"""Cluster counts available for selection (all cuts are precomputed)."""
+
+
+@utils.artifact_cache(
+    utils.SelectedData.clustering_input_key, "Performing hierarchical clustering…"
+)
+def hierarchical_linkage(
+    data: utils.SelectedData,
+    method: str,
+    metric: str,
+    grid_constrained: bool,
+    neighbours: int = 4,
+) -> npt.NDArray[np.float64]:
+    """Compute linkage matrix (independent of the selected reference feature)."""
+    connectivity = (
+        pipeline.grid_connectivity(data.df, data.valid_mask, neighbours)
+        if grid_constrained
+        else None
+    )
+    return hierarchical.linkage(
+        data.feature_matrix().values, method, metric, connectivity=connectivity
+    )
+
+
+@utils.artifact_cache(utils.SelectedData.clustering_input_key, "Cutting hierarchy…")
+def hierarchical_cuts(
+    data: utils.SelectedData,
+    method: str,
+    metric: str,
+    grid_constrained: bool,
+    neighbours: int = 4,
+) -> npt.NDArray[np.int32]:
+    """Get clusters for all `CLUSTER_COUNTS` (one row per count)."""
+    linkage = hierarchical_linkage(data, method, metric, grid_constrained, neighbours)
+    return hierarchical.cut(linkage, CLUSTER_COUNTS)
+
+
+@utils.artifact_cache(
+    utils.SelectedData.clustering_input_key, "Scoring cluster counts…"
+)
+def hierarchical_scores(
+    data: utils.SelectedData,
+    method: str,
+    metric: str,
+    grid_constrained: bool,
+    neighbours: int = 4,
+) -> npt.NDArray[np.float64]:
+    """Score cuts of the hierarchy for all `CLUSTER_COUNTS` (`selection.COLUMNS`)."""
+    cuts = hierarchical_cuts(data, method, metric, grid_constrained, neighbours)
+    return selection.sweep(
+        data.feature_matrix().values, CLUSTER_COUNTS, (), {method: cuts}
     )
 
-    # Show clustering result.
-    clust_plot = fig.add_subplot(1, 2, 2)
-    clust_plot.set_title("Clustered")
-    clust_plot.set_axis_off()
-    clust_plot.imshow(data.get_clustered_image(clusters))
 
-    # Show plot in Streamlit.
-    st.pyplot(fig)
+def show_scores(
+    data: utils.SelectedData,
+    method: str,
+    metric: str,
+    grid_constrained: bool = False,
+    neighbours: int = 4,
+):
+    """Show scores of cluster counts of the hierarchy, K-means and Gaussian mixtures."""
+    try:
+        scores = np.concatenate(
+            (
+                hierarchical_scores(data, method, metric, grid_constrained, neighbours),
+                utils.cluster_count_scores(data, tuple(CLUSTER_COUNTS)),
+            )
+        )
+    except ValueError as e:
+        st.error(f"Scoring error: {e}")
+        return
+    names = [
+        f"Hierarchical ({method})",
+        *(utils.METHOD_NAMES[name] for name in selection.METHODS),
+    ]
+    utils.show_cluster_count_scores(scores, names, CLUSTER_COUNTS)
+
+
+def hierarchical_clustering(
+    data: utils.SelectedData,
+    method: str,
+    metric: str,
+    cluster_count: int,
+    grid_constrained: bool = False,
+    neighbours: int = 4,
+) -> utils.ClusteringResult | None:
+    """Perform hierarchical clustering."""
+    try:
+        cuts = hierarchical_cuts(data, method, metric, grid_constrained, neighbours)
+    except ValueError as e:
+        st.error(f"Clustering error: {e}")
+        return None
+    clusters = cuts[CLUSTER_COUNTS.index(cluster_count)]
+
+    # Show reference and clustered images in Streamlit.
+    utils.show_maps(data, clusters)
 
     return utils.ClusteringResult(data.df, clusters)
 
@@ -68,7 +136,32 @@ with results:
             "Select distance metric:", metrics, metrics.index("euclidean")
         )
     cluster_count = st.slider(
-        "Select cluster count:", min_value=2, max_value=10, value=3
+        "Select cluster count:",
+        min_value=CLUSTER_COUNTS[0],
+        max_value=CLUSTER_COUNTS[-1],
+        value=3,
+    )
+    grid_constrained = st.toggle(
+        "Merge only neighbouring points",
+        help="Spatially-constrained clustering: only clusters neighbouring on the "
+        "indentation grid can be merged (supported by "
+        + ", ".join(hierarchical.CONNECTIVITY_METHODS)
+        + " methods).",
+    )
+    neighbours = 4
+    if grid_constrained:
+        neighbours = st.radio(
+            "Grid neighbourhood:",
+            hierarchical.NEIGHBOURHOODS,
+            format_func=lambda count: f"{count} neighbours",
+            horizontal=True,
+            help="Cells sharing an edge (4) or also a corner (8) are neighbours.",
+        )
+    suggest = st.toggle(
+        "Suggest cluster count",
+        help="Score all cluster counts of the hierarchy, K-means and Gaussian "
+        "mixtures with the silhouette, Calinski–Harabasz index, gap statistic and "
+        "BIC.",
     )
 
     if selected_data is None:
@@ -76,8 +169,12 @@ with results:
     assert selected_data is not None
 
     if method is not None and metric is not None:
-        hierarchical_clustering(
-            selected_data, method, metric, cluster_count
-        ).show_summary()
+        if suggest:
+            show_scores(selected_data, method, metric, grid_constrained, neighbours)
+        result = hierarchical_clustering(
+            selected_data, method, metric, cluster_count, grid_constrained, neighbours
+        )
+        if result is not None:
+            result.show_summary()
 
 utils.page_tail()
@@ -1,12 +1,18 @@
 """KMeans clustering Streamlit subpage."""
 
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 import numpy as np
 import streamlit as st
-from sklearn.cluster import KMeans
 from streamlit_image_coordinates import streamlit_image_coordinates
 
+from amorphous_metals import render
+from amorphous_metals.cluster import (
+    hierarchical,
+    kmeans,
+    mixture,
+    pipeline,
+    selection,
+    spatial,
+)
 from amorphous_metals.streamlit import utils
 
 utils.page_head()
@@ -19,86 +25,152 @@ with method:
     utils.show_markdown_sibling(__file__)
 
 
-@utils.default_st_cache(show_spinner="Performing K-means clustering")
+MODEL_NAMES = {
+    "kmeans": "K-means",
+    "full": "Gaussian mixture (full covariance)",
+    "diag": "Gaussian mixture (diagonal covariance)",
+}
+"""Names of phase models (K-means or covariance types of Gaussian mixture)."""
+
+
+def kmeans_engine(
+    data: utils.SelectedData, mode: kmeans.Mode
+) -> kmeans.WarmStartKMeans:
+    """Get K-means engine kept in the session state between reruns.
+
+    The engine is recreated only when the data selection or mode changes, so adding or
+    removing a seed point warm-starts from the previous centroids.
+    """
+    key = (data.features, data.normalize_data, mode)
+    stored = st.session_state.get("kmeans_engine")
+    if stored is None or stored[0] is not data.df or stored[1] != key:
+        engine = kmeans.WarmStartKMeans(data.feature_matrix().values, mode)
+        st.session_state.kmeans_engine = (data.df, key, engine)
+    return st.session_state.kmeans_engine[2]
+
+
 def kmeans_clustering(
-    data: utils.SelectedData, points: list[utils.Point]
-) -> utils.ClusteringResult:
+    data: utils.SelectedData,
+    points: list[utils.Point],
+    mode: kmeans.Mode = "auto",
+    smoothing: float = 0.0,
+    neighbours: int = 4,
+    covariance_type: mixture.CovarianceType | None = None,
+) -> utils.ClusteringResult | None:
     """Perform k-means clustering.
 
     Arguments:
         data -- data input.
         points -- selected initial points.
+        mode -- K-means variant.
+        smoothing -- strength of spatial smoothing of labels (0 disables it).
+        neighbours -- 4 or 8 neighbours of grid cells used by smoothing.
+        covariance_type -- fit Gaussian mixture warm-started from the K-means
+            clusters with the covariance type (None for K-means only).
     """
-    df_clust = data.prepare_df_for_clustering()
+    engine = kmeans_engine(data, mode)
+
+    seeds = {point: data.get_features_from_point(point) for point in points}
+    with st.spinner("Performing K-means clustering"):
+        clusters = engine.fit(seeds)
+        if smoothing > 0:
+            clusters = spatial.smooth_labels(
+                engine.observations,
+                clusters,
+                pipeline.grid_connectivity(data.df, data.valid_mask, neighbours),
+                smoothing,
+                pipeline.grid_groups(data.df, data.valid_mask),
+                len(seeds),
+            )
+
+    if covariance_type is None:
+        # Show clustered images in Streamlit.
+        utils.show_maps(data, clusters, reference=False)
+        return utils.ClusteringResult(data.df, clusters)
 
-    init_rows = np.array(
-        [
-            data.get_row_from_point(point, data.normalize_data)[[*data.features]]
-            for point in points
-        ]
+    with st.spinner("Fitting Gaussian mixture"):
+        try:
+            model = mixture.fit(
+                engine.observations, clusters, len(seeds), covariance_type
+            )
+        except ValueError as e:
+            st.error(f"Clustering error: {e}")
+            return None
+    features = data.feature_matrix()
+    components = (
+        mixture.describe_components(
+            model, features.columns, features.mean, features.std
+        )
+        if features.normalized
+        else mixture.describe_components(model, features.columns)
     )
-    clusters = (
-        KMeans(n_clusters=len(init_rows), init=init_rows, max_iter=2000)
-        .fit(df_clust)
-        .labels_
+    utils.show_maps(data, model.labels, reference=False)
+    return utils.ClusteringResult(
+        data.df, model.labels, model.responsibilities, components
     )
 
-    # Prepare figure.
-    fig, ax = plt.subplots()
-    fig.canvas.header_visible = False  # type: ignore
-    ax.set_axis_off()
-    ax.imshow(data.get_clustered_image(clusters))
-
-    # Show plot in Streamlit.
-    st.pyplot(fig)
-
-    return utils.ClusteringResult(data.df, clusters)
-
-
-REP_COUNT = 22
-
 
-@st.cache_data(ttl=3600, max_entries=200)
+@utils.artifact_cache(lambda data: (data.fingerprint, data.reference_name))
 def generate_reference_array(
-    selected_data: utils.SelectedData, points: list[utils.Point]
+    selected_data: utils.SelectedData, sample: str = "", scale: int = 1
 ):
     """Generate reference image array for use with streamlit_image_coordinates().
 
+    Colors are scaled to all samples of a project, so they can be compared. Selected
+    points are drawn over a copy of the image (see `draw_points()`), so it is cached
+    regardless of the points.
+
     Arguments:
         selected_data -- data selected for clustering.
-        points -- list of selected initial points.
+        sample -- sample of a project to show.
+        scale -- upscaling factor (pixels of a data point in each direction).
 
     Returns:
-        Reference numpy image array (square with RGB888 pixels).
+        Reference numpy image array (RGB888 pixels, holes and empty cells of the grid
+        are white).
     """
-    # Load reference data without holes.
-    reference = utils.filter_holes(
-        selected_data.df[[selected_data.reference_name]]
-    ).to_numpy()
-
-    # Normalization (0-1) for matplotlib color mapping.
-    reference -= np.min(reference)
-    reference /= np.max(reference)
+    values = selected_data.df[selected_data.reference_name]
+    rows = selected_data.samples[sample]
+    reference = selected_data.grids[sample].image(
+        np.where(selected_data.valid_mask[rows], values.to_numpy()[rows], np.nan)
+    )
+    return render.render_map(reference, values.min(), values.max(), scale=scale)
 
-    # Map to matplotlib colors (RGB without A).
-    reference = np.delete(mpl.colormaps["viridis"](reference), 3, 2)
 
-    # Fill data holes with white color.
-    reference = utils.fill_holes(
-        selected_data.df, reference, fill_with=np.array([[1, 1, 1]])
-    )
+def point_patch(image: np.ndarray, point: utils.Point, scale: int) -> np.ndarray:
+    """Get view of the pixels of a point in an upscaled image."""
+    return image[
+        point.y * scale : (point.y + 1) * scale,
+        point.x * scale : (point.x + 1) * scale,
+    ]
 
-    # Make it RGB888 and reshape to square.
-    reference = (
-        (reference * 255).astype(np.uint8).reshape((selected_data.image_width, -1, 3))
-    )
 
-    # Color selected points red.
-    for point in points:
-        reference[point.y, point.x] = (255, 0, 0)
+def draw_points(
+    selected_data: utils.SelectedData,
+    points: list[utils.Point],
+    sample: str,
+    scale: int,
+) -> np.ndarray:
+    """Get reference image of the sample with selected points drawn red.
 
-    # Upscale the reference image.
-    return np.repeat(np.repeat(reference, REP_COUNT, 0), REP_COUNT, 1)
+    The drawn image is kept in the session state with the reference image, and only
+    patches of added or removed points are repainted, so a click doesn't copy or load
+    the whole upscaled image.
+    """
+    key = (selected_data.fingerprint, selected_data.reference_name, sample, scale)
+    stored = st.session_state.get("reference_image")
+    if stored is None or stored[0] != key:
+        reference = generate_reference_array(selected_data, sample, scale)
+        stored = (key, reference, reference.copy(), set())
+    _, reference, image, drawn = stored
+
+    selected = {point for point in points if point.sample == sample}
+    for point in drawn - selected:
+        point_patch(image, point, scale)[:] = point_patch(reference, point, scale)
+    for point in selected - drawn:
+        point_patch(image, point, scale)[:] = (255, 0, 0)
+    st.session_state.reference_image = (key, reference, image, selected)
+    return image
 
 
 with results:
@@ -107,23 +179,96 @@ with results:
         utils.page_tail()
     assert selected_data is not None
 
-    if "points" not in st.session_state:
-        st.session_state.points = []
+    mode = st.selectbox(
+        "Select K-means variant:",
+        kmeans.MODES,
+        help="Auto uses mini-batch K-means for maps with at least "
+        f"{kmeans.MINIBATCH_MIN_POINTS} points and Lloyd's algorithm otherwise.",
+    )
+    model = st.radio(
+        "Select phase model:",
+        ("kmeans", *mixture.COVARIANCE_TYPES),
+        format_func=lambda name: MODEL_NAMES[name],
+        help="Gaussian mixture is warm-started from the K-means clusters and gives "
+        "the probability of each cluster for each point, so area fractions of the "
+        "clusters are reported with their uncertainty.",
+    )
+    covariance_type = None if model == "kmeans" else model
+    smoothing = 0.0
+    if covariance_type is None:
+        smoothing = st.slider(
+            "Spatial smoothing:",
+            0.0,
+            2.0,
+            0.0,
+            0.1,
+            help="Penalty of each neighbour on the indentation grid with a different "
+            "cluster (Markov random field over K-means labels), 0 disables "
+            "smoothing.",
+        )
+    neighbours = 4
+    if smoothing > 0:
+        neighbours = st.radio(
+            "Grid neighbourhood:",
+            hierarchical.NEIGHBOURHOODS,
+            format_func=lambda count: f"{count} neighbours",
+            horizontal=True,
+            help="Cells sharing an edge (4) or also a corner (8) are neighbours.",
+        )
+    if st.toggle(
+        "Suggest cluster count",
+        help="Score cluster counts of K-means and Gaussian mixtures with the "
+        "silhouette, Calinski–Harabasz index, gap statistic and BIC, to choose the "
+        "number of points.",
+    ):
+        try:
+            scores = utils.cluster_count_scores(
+                selected_data, tuple(selection.DEFAULT_CLUSTER_COUNTS)
+            )
+        except ValueError as e:
+            st.error(f"Scoring error: {e}")
+        else:
+            utils.show_cluster_count_scores(
+                scores,
+                [utils.METHOD_NAMES[name] for name in selection.METHODS],
+                selection.DEFAULT_CLUSTER_COUNTS,
+            )
+
+    # Points of other data (e.g., removed samples) cannot be used.
+    st.session_state.points = [
+        point
+        for point in st.session_state.get("points", [])
+        if point.sample in selected_data.samples
+        and selected_data.point_index(point) is not None
+    ]
 
     reference_col, clust_result_col = st.columns(2)
 
     with reference_col:
-        # Show the image with coordinate capture.
+        sample = ""
+        if len(selected_data.samples) > 1:
+            sample = st.selectbox("Select sample for points:", selected_data.samples)
+
+        # Show the image with coordinate capture (upscaled just enough to be
+        # displayed without smoothing, the clicked pixel is mapped back to the point).
+        map_grid = selected_data.grids[sample]
+        scale = render.scale_to_width(map_grid.columns, utils.MAP_IMAGE_WIDTH)
         value = streamlit_image_coordinates(
-            generate_reference_array(selected_data, st.session_state.points)
+            draw_points(selected_data, st.session_state.points, sample, scale)
         )
 
         if value is not None:
-            point = utils.Point(value["x"] // REP_COUNT, value["y"] // REP_COUNT)
+            point = utils.Point(
+                min(value["x"] // scale, map_grid.columns - 1),
+                min(value["y"] // scale, map_grid.rows - 1),
+                sample,
+            )
             if point in st.session_state.points:
                 st.session_state.points.remove(point)
                 st.rerun()
-            elif selected_data.get_row_from_point(point).isnull().any():
+            elif (
+                row := selected_data.get_row_from_point(point)
+            ) is None or row.isnull().any():
                 st.warning("You cannot choose a point that is a hole.")
             else:
                 st.session_state.points.append(point)
@@ -132,7 +277,9 @@ with results:
         # Summary of chosen points (value with unit for all coordinates).
         st.write(
             "\n".join(
-                f"{index+1}. Value for point x = {point.x}, y = {point.y}: "
+                f"{index+1}. Value for point "
+                + (f"in {point.sample} " if point.sample != "" else "")
+                + f"x = {point.x}, y = {point.y}: "
                 f"{selected_data.get_row_from_point(point).loc[selected_data.reference_name]} "
                 f"{selected_data.reference_name.split()[-1][1:-1]}"
                 for index, point in enumerate(st.session_state.points)
@@ -148,7 +295,15 @@ with results:
         clust_result_col.write("Select points for clustering in the reference image.")
     else:
         with clust_result_col:
-            result = kmeans_clustering(selected_data, st.session_state.points)
-        result.show_summary()
+            result = kmeans_clustering(
+                selected_data,
+                st.session_state.points,
+                mode,
+                smoothing,
+                neighbours,
+                covariance_type,
+            )
+        if result is not None:
+            result.show_summary()
 
 utils.page_tail()
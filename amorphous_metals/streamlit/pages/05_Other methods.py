@@ -5,11 +5,13 @@ from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
-import scipy
+import scipy.sparse as sps
 import streamlit as st
-from sklearn.cluster import OPTICS
 
+from amorphous_metals import grid
+from amorphous_metals.cluster import density
 from amorphous_metals.streamlit import utils
 
 utils.page_head()
@@ -19,37 +21,42 @@ utils.show_markdown_sibling(__file__)
 gpt, optics = st.tabs(["ChatGPT", "OPTICS"])
 
 
-def plot_reference(ax) -> pd.DataFrame | None:
-    """Plot a reference on Matplotlib axis and return reference data frame."""
-    ax.set_axis_off()
-    ax.set_aspect(1)
+REFERENCE_SAMPLE = "ZrCu alloys/Be0_matryca15_50mN_spacing7um_strefa_przejsciowa.TXT"
+"""Reference sample (relative to the data directory)."""
+
+
+def load_reference() -> pd.DataFrame | None:
+    """Load reference data frame (None if the file is not found)."""
     try:
-        ref_df = utils.convert_raw_to_df(
+        return utils.convert_raw_to_df(
             Path(
                 os.getenv(
                     "METAL_DATA_PATH", Path(__file__).parent.parent.parent / "data"
                 )
             )
-            / "ZrCu alloys/Be0_matryca15_50mN_spacing7um_strefa_przejsciowa.TXT"
-        )
-        if ref_df is None:
-            raise FileNotFoundError()
-        ax.imshow(
-            ref_df["HIT (O&P) [MPa]"]
-            .to_numpy()
-            .reshape((utils.image_width(ref_df), -1))
+            / REFERENCE_SAMPLE
         )
-        return ref_df
     except FileNotFoundError:
-        ax.text(
-            0.5,
-            0.5,
-            "Reference data file not found!",
-            horizontalalignment="center",
-            verticalalignment="center",
-            color="red",
-        )
+        return None
+
 
+def plot_reference(ax) -> pd.DataFrame | None:
+    """Plot a reference on Matplotlib axis and return reference data frame."""
+    ax.set_axis_off()
+    ax.set_aspect(1)
+    ref_df = load_reference()
+    if ref_df is not None:
+        ax.imshow(grid.from_df(ref_df).image(ref_df["HIT (O&P) [MPa]"].to_numpy()))
+        return ref_df
+
+    ax.text(
+        0.5,
+        0.5,
+        "Reference data file not found!",
+        horizontalalignment="center",
+        verticalalignment="center",
+        color="red",
+    )
     return None
 
 
@@ -116,39 +123,114 @@ with gpt:
     )
 
 
-@utils.default_st_cache(show_spinner=False)
-def plot_optics():
-    """Generate OPTICS reference and clustering result plot."""
-    fig, ax = plt.subplots(1, 2)
-    fig.canvas.header_visible = False  # type: ignore
-    fig.tight_layout()
+DATA_SOURCES = ("Reference sample", "Uploaded data")
+"""Data sources available for density-based clustering."""
+
+
+@utils.default_st_cache(
+    show_spinner="Suggesting neighbourhood radius…",
+    hash_funcs={utils.SelectedData: utils.SelectedData.clustering_input_key},
+)
+def suggest_radius(data: utils.SelectedData, min_samples: int) -> float:
+    """Suggest neighbourhood radius for the selected data."""
+    return density.suggest_radius(data.feature_matrix().values, min_samples)
+
+
+@utils.default_st_cache(
+    show_spinner="Finding neighbours…",
+    hash_funcs={utils.SelectedData: utils.SelectedData.clustering_input_key},
+)
+def neighbor_graph(
+    data: utils.SelectedData, radius: float, min_samples: int
+) -> sps.csr_matrix:
+    """Build sparse neighbour graph of the selected data."""
+    return density.neighbor_graph(data.feature_matrix().values, radius, min_samples)
+
+
+@utils.artifact_cache(
+    utils.SelectedData.clustering_input_key, "Performing density-based clustering…"
+)
+def density_clustering(
+    data: utils.SelectedData,
+    method: str,
+    radius: float,
+    min_samples: int,
+    xi: float,
+    min_cluster_size: int,
+) -> npt.NDArray[np.int_]:
+    """Perform OPTICS or DBSCAN clustering (noise is labelled -1)."""
+    graph = neighbor_graph(data, radius, min_samples)
+    if method == "DBSCAN":
+        return density.dbscan(graph, radius, min_samples).labels_
+    return density.optics(graph, min_samples, xi, min_cluster_size, radius).labels_
+
+
+def density_data_selection() -> utils.SelectedData | None:
+    """Show data source selection for density-based clustering."""
+    source = st.radio("Select data source:", DATA_SOURCES, horizontal=True)
+    if source == "Uploaded data":
+        return utils.data_selection()
+
+    ref_df = load_reference()
+    if ref_df is None:
+        st.error("Reference data file not found!")
+        return None
+    return utils.SelectedData(ref_df, "HIT (O&P) [MPa]", set(ref_df.columns), True)
 
-    # Show reference image.
-    ax[0].set_title("Reference: HIT (O&P) [MPa]")
-    ref_df = plot_reference(ax[0])
 
-    # Run OPTICS clustering with seuclidean distance metric.
-    if ref_df is not None:
-        clust = OPTICS(
-            min_samples=10, xi=0.0001, min_cluster_size=10, metric="precomputed"
+with optics:
+    utils.show_markdown_sibling(__file__, "OPTICS")
+
+    st.write(
+        """
+        Try density-based clustering yourself. Distances between points within
+        the neighbourhood radius are computed with a KD-tree, so larger maps can
+        be clustered as well. With normalized data, euclidean distance is the
+        same as the seuclidean distance used above.
+        """
+    )
+    selected_data = density_data_selection()
+
+    if selected_data is not None:
+        method = st.radio("Select clustering method:", ("OPTICS", "DBSCAN"))
+        min_samples = int(
+            st.number_input("Minimum samples of core points:", 2, None, 10)
         )
-        clust.fit(
-            scipy.spatial.distance.squareform(
-                scipy.spatial.distance.pdist(ref_df, metric="seuclidean")
-            )
+        radius = st.number_input(
+            "Neighbourhood radius:",
+            0.0,
+            None,
+            suggest_radius(selected_data, min_samples),
+            help="Maximum distance of neighbours (`max_eps` of OPTICS and `eps` of "
+            "DBSCAN). Bigger radius needs more memory. Default is based on "
+            "distances to nearest neighbours.",
+            format="%.3f",
         )
+        xi, min_cluster_size = 0.0, 0
+        if method == "OPTICS":
+            xi = st.number_input(
+                "Xi (cluster boundary steepness):", 0.0, 1.0, 0.0001, format="%.4f"
+            )
+            min_cluster_size = int(
+                st.number_input("Minimum cluster size:", 2, None, 10)
+            )
 
-        ax[1].imshow(clust.labels_.reshape((15, -1)))
-
-    ax[1].set_title("Clustered")
-    ax[1].set_axis_off()
-    ax[1].set_aspect(1)
+        if radius <= 0:
+            st.error("Neighbourhood radius must be positive.")
+            utils.page_tail()
 
-    return fig
+        clusters = density_clustering(
+            selected_data, method, radius, min_samples, xi, min_cluster_size
+        )
 
+        utils.show_maps(selected_data, clusters)
 
-with optics:
-    utils.show_markdown_sibling(__file__, "OPTICS")
-    st.pyplot(plot_optics())
+        noise_count = np.count_nonzero(clusters == -1)
+        if noise_count > 0:
+            st.write(
+                f"{noise_count} points were classified as noise "
+                "(the first cluster below)."
+            )
+        utils.ClusteringResult(selected_data.df, clusters).show_summary()
 
 utils.page_tail()
@@ -1,29 +1,42 @@
 """Streamlit common utilities."""
 
+import contextlib
 import datetime
-import math
+import hashlib
+import marshal
 import os
+import re
 import shutil
 from dataclasses import dataclass
-from functools import cached_property
+from functools import cache, cached_property, wraps
 from importlib.metadata import version
 from pathlib import Path
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, Iterable, Sequence
 
 import extra_streamlit_components as stx
-import matplotlib as mpl
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import streamlit as st
 import streamlit_analytics2 as sta
-from bs4 import BeautifulSoup
 from streamlit.commands.page_config import MenuItems
 from streamlit.delta_generator import DeltaGenerator
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 from streamlit_float import float_init, float_parent
 
-from amorphous_metals import convert
+from amorphous_metals import artifacts, convert, grid, project, render
+from amorphous_metals.cluster import mixture, selection
+from amorphous_metals.cluster.features import (
+    FeatureMatrix,
+    feature_matrix,
+    fill_holes,
+    summarize_clusters,
+    valid_mask,
+)
+from amorphous_metals.streamlit.analytics import AnalyticsSink
+
+VERSION = version("amorphous_metals")
+"""Version of the package."""
 
 MENU_ITEMS: MenuItems = {
     "Report a bug": "https://github.com/KasiaFoszcz/AmorphousMetals/issues",
@@ -37,7 +50,7 @@ MENU_ITEMS: MenuItems = {
         Source code available on
         [GitHub](https://github.com/KasiaFoszcz/AmorphousMetals).
 
-        Version: {version("amorphous_metals")}
+        Version: {VERSION}
         """,
 }
 
@@ -63,6 +76,86 @@ def default_st_cache(func: Callable[..., Any] | None = None, **kwargs):
     return st.cache_data(persist="disk", max_entries=100, **kwargs)(func)
 
 
+ARTIFACT_CACHE_PATH = Path(
+    os.getenv("METAL_CACHE_PATH", Path.home() / ".streamlit" / "cache" / "artifacts")
+)
+"""Directory of the artifact cache (shared by all processes using it)."""
+
+ARTIFACT_CACHE_SIZE = int(
+    os.getenv("METAL_CACHE_SIZE", str(artifacts.DEFAULT_MAX_BYTES))
+)
+"""Maximum total size of the artifact cache in bytes."""
+
+MAP_IMAGE_WIDTH = 300
+"""Minimum width of rendered map images in pixels (upscaled without smoothing)."""
+
+SCORE_NAMES: dict[selection.Score, str] = {
+    "silhouette": "Silhouette (on a sample)",
+    "calinski_harabasz": "Calinski–Harabasz index",
+    "gap": "Gap statistic",
+    "bic": "BIC of Gaussian mixture",
+}
+"""Names of criteria of the number of clusters."""
+
+METHOD_NAMES: dict[selection.Method, str] = {
+    "kmeans": "K-means",
+    "gmm": "Gaussian mixture",
+}
+"""Names of methods fitted by the cluster count sweep."""
+
+
+@st.cache_resource(show_spinner=False)
+def get_artifact_cache() -> artifacts.ArtifactCache:
+    """Get artifact cache of the process (its counters are kept between reruns)."""
+    return artifacts.ArtifactCache(ARTIFACT_CACHE_PATH, ARTIFACT_CACHE_SIZE)
+
+
+def artifact_cache(
+    key: Callable[["SelectedData"], Any], show_spinner: str | None = None
+):
+    """Cache NumPy result of a function of selected data in the artifact cache.
+
+    Unlike `default_st_cache()`, the selected data isn't hashed on every call. Cache key
+    is built from its fingerprint (see `SelectedData.fingerprint`), the other
+    arguments, and the function code, and the result is shared by all sessions and
+    processes using the cache directory:
+
+    ```
+    @artifact_cache(SelectedData.clustering_input_key, "Clustering…")
+    def clustering(data: SelectedData, method: str) -> npt.NDArray[np.int_]:
+        ...
+    ```
+
+    Arguments:
+        key -- function getting parts of the selected data the result depends on.
+        show_spinner -- text of spinner shown while the result is computed.
+    """
+
+    def decorator(func: Callable[..., npt.ArrayLike]):
+        code = hashlib.blake2b(marshal.dumps(func.__code__)).hexdigest()
+
+        @wraps(func)
+        def wrapper(data: "SelectedData", *args: Any) -> npt.NDArray[Any]:
+            def compute():
+                with (
+                    st.spinner(show_spinner)
+                    if show_spinner
+                    else contextlib.nullcontext()
+                ):
+                    return func(data, *args)
+
+            return get_artifact_cache().get_or_compute(
+                artifacts.artifact_key(
+                    func.__qualname__, code, VERSION, key(data), args
+                ),
+                compute,
+            )
+
+        return wrapper
+
+    return decorator
+
+
 def get_markdown_sibling(source_name: str, subpage: str | None = None):
     """Get Markdown page accompanying the current Streamlit page file.
 
@@ -131,23 +224,35 @@ def for_tabs(
 
 
 @default_st_cache(show_spinner=False)
+def _convert_uploaded_file(raw_input: UploadedFile, sort_x_y: bool) -> pd.DataFrame:
+    """Cache parsing of uploaded files (they have no columnar sidecar)."""
+    return convert.convert_raw_to_df(raw_input, sort_x_y)
+
+
 def convert_raw_to_df(
     raw_input: Path | str | UploadedFile, sort_x_y: bool = False
 ) -> pd.DataFrame | None:
-    """Wrap around convert.convert_raw_to_df with error handling and caching."""
+    """Wrap around convert.convert_raw_to_df with error handling and caching.
+
+    Files on disk are loaded from their columnar sidecars, which is faster than
+    unpickling data frames from Streamlit cache.
+    """
     try:
+        if isinstance(raw_input, UploadedFile):
+            return _convert_uploaded_file(raw_input, sort_x_y)
         return convert.convert_raw_to_df(raw_input, sort_x_y)
     except ValueError as e:
         st.error(f"Parser error: {e}")
     return None
 
 
-@dataclass
+@dataclass(frozen=True)
 class Point:
-    """A point with X and Y coordinates."""
+    """A point with X and Y coordinates (in a sample of a project)."""
 
     x: int
     y: int
+    sample: str = ""
 
 
 @dataclass(frozen=True)
@@ -160,46 +265,140 @@ class SelectedData:
     normalize_data: bool
 
     @cached_property
-    def image_width(self) -> int:
-        """Get image width for the data frame."""
-        return image_width(self.df)
+    def samples(self) -> dict[str, slice]:
+        """Rows of each map (a single unnamed map unless the data is a project)."""
+        if project.is_project(self.df):
+            return project.sample_slices(self.df)
+        return {"": slice(0, len(self.df))}
+
+    @cached_property
+    def grids(self) -> dict[str, grid.Grid]:
+        """Grid of each map (see `samples`)."""
+        return {
+            sample: grid.from_df(self.df.iloc[rows])
+            for sample, rows in self.samples.items()
+        }
+
+    @cached_property
+    def valid_mask(self) -> npt.NDArray[np.bool_]:
+        """Mask of data frame rows without data holes."""
+        return valid_mask(self.df)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Fingerprint of the data frame content (see `artifacts.fingerprint()`)."""
+        return artifacts.fingerprint(self.df)
+
+    @cached_property
+    def _feature_matrices(self) -> dict[tuple[tuple[str, ...], bool], FeatureMatrix]:
+        """Feature matrices built so far by (columns, normalize)."""
+        return {}
+
+    def feature_matrix(
+        self, features: Iterable[str] | None = None, normalize: bool | None = None
+    ) -> FeatureMatrix:
+        """Get (lazily built and cached) feature matrix of rows without holes.
+
+        Arguments:
+            features -- features to include (selected features by default). Columns
+                are always in the data frame order.
+            normalize -- center around mean and divide by std (selected
+                normalization by default).
+
+        Returns:
+            Feature matrix.
+        """
+        features = set(self.features if features is None else features)
+        columns = tuple(column for column in self.df.columns if column in features)
+        normalize = self.normalize_data if normalize is None else normalize
+        key = (columns, normalize)
+
+        if key not in self._feature_matrices:
+            self._feature_matrices[key] = feature_matrix(
+                self.df, columns, normalize, self.valid_mask
+            )
+        return self._feature_matrices[key]
+
+    def point_index(self, point: Point) -> int | None:
+        """Get data frame row index of image coordinates (None for empty cells)."""
+        index = self.grids[point.sample].point(point.x, point.y)
+        return None if index is None else self.samples[point.sample].start + index
 
     def get_row_from_point(self, point: Point, normalize_df: bool = False):
         """Get row from data frame based on image coordinates.
 
         Arguments:
             point -- point coordinates (x, y).
-            normalize_df -- normalize source dataframe before selecting the point.
+            normalize_df -- normalize the row with statistics of the data frame
+                (without holes).
 
         Returns:
-            Selected row from df.
+            Selected row from df or None if there is no data point at the coordinates.
         """
-        df = self._normalize_dataframe(self.df) if normalize_df else self.df
-        return df.iloc[point.x + point.y * self.image_width]
+        index = self.point_index(point)
+        if index is None:
+            return None
+        row = self.df.iloc[index]
+        if not normalize_df:
+            return row
+        stats = self.feature_matrix(project.feature_columns(self.df), normalize=False)
+        std = np.where(stats.std > 0, stats.std, np.nan)
+        return ((row[list(stats.columns)] - stats.mean) / std).fillna(0)
+
+    def get_features_from_point(self, point: Point) -> npt.NDArray[np.float64] | None:
+        """Get clustering features of the point (view of the feature matrix).
+
+        Arguments:
+            point -- point coordinates (x, y).
+
+        Returns:
+            Selected (and possibly normalized) features or None for holes (and
+            empty cells).
+        """
+        index = self.point_index(point)
+        return None if index is None else self.feature_matrix().row(index)
+
+    def clustering_input_key(self) -> tuple[str, list[str], bool]:
+        """Get parts of the selection affecting `prepare_df_for_clustering()`.
+
+        Can be used in `hash_funcs` of cached functions that don't depend on
+        the reference feature (the data frame is represented by its fingerprint, so
+        it isn't hashed on every call).
+        """
+        return self.fingerprint, sorted(self.features), self.normalize_data
 
     def prepare_df_for_clustering(self) -> pd.DataFrame:
         """Prepare data frame for clustering.
 
         Returns:
-            Prepared data frame.
+            Prepared data frame (view of the feature matrix).
         """
-        without_holes = filter_holes(self.df)[[*self.features]]
-        if not self.normalize_data:
-            return without_holes
-        return self._normalize_dataframe(without_holes)
+        matrix = self.feature_matrix()
+        return pd.DataFrame(
+            matrix.values,
+            index=self.df.index[self.valid_mask],
+            columns=list(matrix.columns),
+            copy=False,
+        )
 
-    @staticmethod
-    def _normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-        """Normalize dataframe centering around mean value and dividing by std."""
-        return ((df - df.mean()) / df.std()).fillna(0)
+    def get_reference_image(self, sample: str = ""):
+        """Get numpy array with selected reference feature image of a map.
+
+        Empty cells of the grid are NaN.
+        """
+        return self.grids[sample].image(
+            self.df[self.reference_name].to_numpy()[self.samples[sample]]
+        )
 
-    def get_reference_image(self):
-        """Get square numpy array with selected reference feature image."""
-        return self.df[self.reference_name].to_numpy().reshape((self.image_width, -1))
+    def get_clustered_image(self, clustered: npt.NDArray[Any], sample: str = ""):
+        """Get numpy array with clustering result of a map.
 
-    def get_clustered_image(self, clustered: npt.NDArray[Any]):
-        """Get square numpy array with clustering result (with holes filled)."""
-        return fill_holes(self.df, clustered).reshape((self.image_width, -1))
+        Holes are filled with clusters of their neighbours, empty cells of the grid
+        are NaN.
+        """
+        return self.grids[sample].image(
+            fill_holes(self.valid_mask, clustered)[self.samples[sample]]
+        )
 
 
 def data_selection() -> SelectedData | None:
@@ -215,21 +414,22 @@ def data_selection() -> SelectedData | None:
         return page_tail()
 
     df: pd.DataFrame = st.session_state.df
-    reference_name = st.selectbox("Select reference feature:", df.columns)
+    columns = project.feature_columns(df)
+    reference_name = st.selectbox("Select reference feature:", columns)
     feature_set = st.selectbox(
         "Select feature set:", ("defaults", "all", "all + XY", "custom")
     )
     match feature_set:
         case "custom":
             features = st.multiselect(
-                "Select features:", df.columns, convert.DEFAULT_COLUMNS
+                "Select features:", columns, convert.DEFAULT_COLUMNS
             )
         case "defaults":
             features = list(convert.DEFAULT_COLUMNS)
         case "all + XY":
-            features = list(df.columns)
+            features = list(columns)
         case _:
-            features = list(df.columns)
+            features = list(columns)
             features.remove("X [mm]")
             features.remove("Y [mm]")
     st.write("Selected features: *" + "*, *".join(features) + "*.")
@@ -238,7 +438,19 @@ def data_selection() -> SelectedData | None:
     if reference_name is None:
         return None
 
-    return SelectedData(df, reference_name, set(features), normalize_data)
+    # Reuse unchanged selection between reruns to keep its cached feature matrices.
+    previous: SelectedData | None = st.session_state.get("selected_data")
+    if (
+        previous is None
+        or previous.df is not df
+        or previous.reference_name != reference_name
+        or previous.features != set(features)
+        or previous.normalize_data != normalize_data
+    ):
+        st.session_state.selected_data = SelectedData(
+            df, reference_name, set(features), normalize_data
+        )
+    return st.session_state.selected_data
 
 
 @dataclass(frozen=True)
@@ -249,60 +461,223 @@ class ClusteringResult:
     """Source data frame for clustering."""
     clusters: npt.NDArray[np.int_]
     """Clustering result, i.e., array of indexes of clusters of rows in src_df."""
+    responsibilities: npt.NDArray[np.float64] | None = None
+    """Probability of each cluster of rows without holes (of probabilistic models)."""
+    components: pd.DataFrame | None = None
+    """Mean and covariance of each cluster (see `mixture.describe_components()`)."""
+
+    @cached_property
+    def valid_mask(self) -> npt.NDArray[np.bool_]:
+        """Mask of source data frame rows without data holes."""
+        return valid_mask(self.src_df)
 
     @cached_property
     def filled_clusters(self) -> npt.NDArray[np.int_]:
         """Clusters with all the data holes filled."""
-        return fill_holes(self.src_df, self.clusters)
+        return fill_holes(self.valid_mask, self.clusters)
 
-    @default_st_cache(show_spinner="Generating clustering summary…")
-    def show_summary(self) -> tuple[pd.DataFrame, ...]:
-        """Generate summary for clustering result and show it in Streamlit.
-
-        Arguments:
-            clustering_result -- result generated by clustering function.
+    @cached_property
+    def summary(self) -> pd.DataFrame:
+        """Per-cluster statistics of the source data frame.
 
-        Returns:
-            Summary data frames for each cluster.
+        See `summarize_clusters()` for the format.
         """
-        # Generate cluster descriptions for points in clusters.
-        cluster_desc = tuple(
-            self.src_df.iloc[
-                [i for i, val in enumerate(self.filled_clusters) if val == group]
-            ].describe()
-            for group in range(min(self.clusters), max(self.clusters) + 1)
+        return summarize_clusters(
+            self.src_df.loc[self.valid_mask, project.feature_columns(self.src_df)],
+            self.clusters,
         )
 
-        # Generate cluster colors used in plot.
-        cluster_colors = np.delete(
-            mpl.colormaps["viridis"](np.linspace(0, 1, len(cluster_desc))), 3, 1
+    @cached_property
+    def sample_fractions(self) -> pd.DataFrame | None:
+        """Area fraction of each cluster in each sample (None for a single map).
+
+        See `project.sample_fractions()` for the format.
+        """
+        if not project.is_project(self.src_df):
+            return None
+        return project.sample_fractions(
+            self.src_df[project.SAMPLE_COLUMN][self.valid_mask], self.clusters
         )
 
+    @cached_property
+    def phase_fractions(self) -> pd.DataFrame | None:
+        """Fraction of each cluster with its uncertainty (None for hard clusters).
+
+        See `mixture.phase_fractions()` for the format.
+        """
+        if self.responsibilities is None:
+            return None
+        return mixture.phase_fractions(self.responsibilities)
+
+    def show_summary(self) -> pd.DataFrame:
+        """Show summary for clustering result in Streamlit.
+
+        Returns:
+            Summary data frame (see `summarize_clusters()`).
+        """
+        summary = self.summary
+        first_cluster = min(self.clusters)
+        last_cluster = max(self.clusters)
+
+        # Generate cluster colors used in images (see `show_maps()`).
+        cluster_colors = render.render_map(
+            np.arange(first_cluster, last_cluster + 1)[None, :],
+            first_cluster,
+            last_cluster,
+        )[0]
+
         # Show results in Streamlit tabs.
+        cluster_ids = summary.index.unique("cluster")
         cluster_tabs = st.tabs(
-            tuple(f"Cluster {i}" for i in range(1, len(cluster_desc) + 1))
+            tuple(f"Cluster {i - first_cluster + 1}" for i in cluster_ids)
         )
-        for tab, desc, color in zip(cluster_tabs, cluster_desc, cluster_colors):
+        for tab, cluster_id in zip(cluster_tabs, cluster_ids):
             with tab:
-                st.image(color.reshape((1, 1, 3)), width=24)
-                st.dataframe(desc)
+                st.image(
+                    cluster_colors[cluster_id - first_cluster].reshape((1, 1, 3)),
+                    width=24,
+                )
+                st.dataframe(summary.loc[cluster_id])
+                if self.components is not None:
+                    st.write("Gaussian model of the cluster (mean and covariance):")
+                    st.dataframe(self.components.loc[cluster_id])
+
+        # Soft assignments of probabilistic models (rows are model phases, so only
+        # phases with points have a tab and a color).
+        if self.phase_fractions is not None:
+            st.write("Area fraction of clusters with uncertainty of soft assignments:")
+            st.dataframe(
+                self.phase_fractions.loc[cluster_ids].rename(
+                    index=lambda i: f"Cluster {i - first_cluster + 1}"
+                )
+            )
 
-        return cluster_desc
+        # Compare samples of a project.
+        if self.sample_fractions is not None:
+            st.write("Area fraction of clusters in samples:")
+            st.dataframe(
+                self.sample_fractions.rename(
+                    columns=lambda i: f"Cluster {i - first_cluster + 1}"
+                )
+            )
 
+        st.download_button(
+            "Download summary (CSV)",
+            summary.to_csv().encode("utf8"),
+            "clustering_summary.csv",
+            "text/csv",
+        )
 
-def image_width(df: pd.DataFrame) -> int:
-    """Get (square) image width for the given data frame.
+        return summary
+
+
+def show_maps(
+    data: SelectedData,
+    clusters: npt.NDArray[Any] | None = None,
+    reference: bool = True,
+):
+    """Show reference and clustered images of all maps in Streamlit.
+
+    Images of all maps (samples of a project) share color scales, so the same color
+    means the same cluster (or reference value) in all of them.
 
     Arguments:
-        df -- source data frame.
+        data -- data selected for clustering.
+        clusters -- clustering result (of rows without holes).
+        reference -- show reference feature images.
+    """
+    panels: list[tuple[str, Callable[[str], npt.NDArray[Any]], float, float]] = []
+    if reference:
+        values = data.df[data.reference_name]
+        panels.append(
+            (
+                f"Reference: {data.reference_name}",
+                data.get_reference_image,
+                values.min(),
+                values.max(),
+            )
+        )
+    if clusters is not None:
+        panels.append(
+            (
+                "Clustered",
+                lambda sample: data.get_clustered_image(clusters, sample),
+                np.min(clusters),
+                np.max(clusters),
+            )
+        )
+
+    for sample in data.samples:
+        scale = render.scale_to_width(data.grids[sample].columns, MAP_IMAGE_WIDTH)
+        # Nested columns are not allowed, so a single panel is shown as it is (e.g.,
+        # in a column of the page).
+        columns = st.columns(len(panels)) if len(panels) > 1 else [st.container()]
+        for column, (title, get_image, vmin, vmax) in zip(columns, panels):
+            if sample != "":
+                caption = f"{sample}: {title}"
+            elif len(panels) > 1:
+                caption = title
+            else:
+                caption = None
+            column.image(
+                render.render_map(get_image(sample), vmin, vmax, scale=scale),
+                caption=caption,
+                use_column_width=True,
+            )
+
+
+@artifact_cache(SelectedData.clustering_input_key, "Scoring cluster counts…")
+def cluster_count_scores(
+    data: SelectedData, cluster_counts: tuple[int, ...]
+) -> npt.NDArray[np.float64]:
+    """Score K-means and Gaussian mixtures for cluster counts (see `selection.sweep()`).
+
+    Arguments:
+        data -- data selected for clustering.
+        cluster_counts -- candidate numbers of clusters.
 
     Returns:
-        Width/height of the resulting square image.
+        Scores of `selection.METHODS` × cluster counts × `selection.COLUMNS`.
     """
-    return int(math.sqrt(len(df)))
+    return selection.sweep(data.feature_matrix().values, cluster_counts)
+
+
+def show_cluster_count_scores(
+    scores: npt.NDArray[np.float64], names: Sequence[str], cluster_counts: Sequence[int]
+):
+    """Show charts of scores of candidate numbers of clusters in Streamlit.
+
+    Arguments:
+        scores -- scores of candidates × cluster counts × `selection.COLUMNS`.
+        names -- names of the candidates.
+        cluster_counts -- numbers of clusters of the scores.
+    """
+    columns = st.columns(2)
+    charts = 0
+    for index, score in enumerate(selection.SCORES):
+        values = pd.DataFrame(
+            scores[:, :, index].T,
+            index=pd.Index(cluster_counts, name="Clusters"),
+            columns=list(names),
+        ).dropna(axis=1, how="all")
+        if values.empty:
+            continue
+        with columns[charts % len(columns)]:
+            better = "lower" if score in selection.LOWER_IS_BETTER else "higher"
+            st.caption(f"{SCORE_NAMES[score]} ({better} is better)")
+            st.line_chart(values, height=200)
+        charts += 1
+
+    best = pd.DataFrame(
+        selection.best_counts(scores, cluster_counts),
+        index=list(names),
+        columns=[SCORE_NAMES[score] for score in selection.SCORES],
+    )
+    st.write("Best cluster count by each criterion:")
+    st.dataframe(best.dropna(axis=1, how="all").astype("Int64"))
 
 
-def has_holes(df: pd.DataFrame) -> tuple[bool, ...]:
+def has_holes(df: pd.DataFrame) -> npt.NDArray[np.bool_]:
     """Check if data frame has data holes.
 
     Arguments:
@@ -311,26 +686,30 @@ def has_holes(df: pd.DataFrame) -> tuple[bool, ...]:
     Returns:
         If a row has a hole, the value is True.
     """
-    return tuple(df.isnull().any(axis=1))
+    return ~valid_mask(df)
 
 
-def filter_holes(df: pd.DataFrame) -> pd.DataFrame:
+def filter_holes(
+    df: pd.DataFrame, mask: npt.NDArray[np.bool_] | None = None
+) -> pd.DataFrame:
     """Filter out data holes from data frame.
 
     Arguments:
         df -- source data frame.
+        mask -- precomputed `valid_mask()` of the data frame.
 
     Returns:
         Data frame without data holes.
     """
-    return df[~df.isnull().any(axis=1)]
+    return df[valid_mask(df) if mask is None else mask]
 
 
-def generate_hole_map(df: pd.DataFrame) -> tuple[int, ...]:
+def generate_hole_map(df: pd.DataFrame) -> npt.NDArray[np.intp]:
     """Generate map of clustering to original index.
 
     If the data frame has some holes (NaN values), they shouldn't be passed to
-    clustering algorithms. But once the
+    clustering algorithms. The map is used to put the clustering result back in
+    place of the original rows.
 
     Arguments:
         df -- source data frame.
@@ -338,34 +717,21 @@ def generate_hole_map(df: pd.DataFrame) -> tuple[int, ...]:
     Returns:
         Mapping of clustering result index to original data frame index.
     """
-    return tuple(row_i for row_i, row in df.iterrows() if not any(row.isnull()))  # type: ignore
+    return np.flatnonzero(valid_mask(df))
 
 
-def fill_holes(
-    source_df: pd.DataFrame, clustered: npt.NDArray[Any], fill_with: Any = math.nan
-) -> npt.NDArray[Any]:
-    """Fill holes in clustering result.
+def patch_index_html(index_path: Path) -> bool:
+    """Insert Google Analytics and Hotjar tags into the head of a HTML page.
 
-    Arguments:
-        source_df -- source data frame (with holes).
-        clustered -- clustering result.
+    The tag ids are used as markers, so the page is patched only once and checking
+    it needs no HTML parsing. The original page is kept in a `.bck` backup.
 
-    Keyword Arguments:
-        fill_with -- value used to fill the holes with (default: {math.nan}).
+    Arguments:
+        index_path -- patched page.
 
     Returns:
-        Clustered data with holes filled.
-    """
-    output = [fill_with for _ in range(len(source_df))]
-    for src, dst in enumerate(generate_hole_map(source_df)):
-        output[dst] = clustered[src]
-    return np.array(output)
-
-
-def inject_analytics():
-    """Inject Google Analytics tracking to the website.
-
-    See https://github.com/streamlit/streamlit/issues/969.
+        True if the page was patched, False if it already contains the tags or it has
+        no head tag.
     """
     # new tag method
     GA_ID = "google_analytics"
@@ -392,18 +758,42 @@ def inject_analytics():
             })(window,document,'https://static.hotjar.com/c/hotjar-','.js?sv=');
         </script>
     """
+    html = index_path.read_text()
+    if all(f'id="{tag_id}"' in html for tag_id in (GA_ID, HOTJAR_ID)):
+        return False
+
+    bck_index = index_path.with_suffix(".bck")
+    if bck_index.exists():
+        html = bck_index.read_text()  # recover from backup
+    else:
+        shutil.copy(index_path, bck_index)  # keep a backup
+    # The head tag may have attributes.
+    html, count = re.subn(
+        r"<head\b[^>]*>",
+        lambda match: match[0] + "\n" + GA_HOTJAR_JS,
+        html,
+        count=1,
+        flags=re.IGNORECASE,
+    )
+    if count == 0:
+        print(f'No head tag found in "{index_path}", analytics are not injected.')
+        return False
+    index_path.write_text(html)
+    return True
+
+
+@cache
+def inject_analytics():
+    """Inject Google Analytics tracking to the website.
+
+    Streamlit serves the same static page to all sessions, so the page is patched
+    once per process (the module is not reloaded on reruns) instead of on every
+    rerun.
+
+    See https://github.com/streamlit/streamlit/issues/969.
+    """
     # Insert the script in the head tag of the static template inside your virtual
-    index_path = Path(st.__file__).parent / "static" / "index.html"
-    soup = BeautifulSoup(index_path.read_text(), features="lxml")
-    if not soup.find(id=GA_ID) or not soup.find(id=HOTJAR_ID):  # if cannot find tag
-        bck_index = index_path.with_suffix(".bck")
-        if bck_index.exists():
-            shutil.copy(bck_index, index_path)  # recover from backup
-        else:
-            shutil.copy(index_path, bck_index)  # keep a backup
-        html = str(soup)
-        new_html = html.replace("<head>", "<head>\n" + GA_HOTJAR_JS)
-        index_path.write_text(new_html)
+    patch_index_html(Path(st.__file__).parent / "static" / "index.html")
 
 
 @st.cache_resource(experimental_allow_widgets=True)
@@ -413,9 +803,18 @@ def get_cookie_manager():
 
 
 _ANALYTICS_STORE = os.getenv("STREAMLIT_ANALYTICS_STORE", "analytics.json")
+_ANALYTICS_LOG = os.getenv("STREAMLIT_ANALYTICS_LOG")
 _ANALYTICS_PASSWORD = os.getenv("STREAMLIT_ANALYTICS_PASSWORD", "password")
 
 
+@st.cache_resource(show_spinner=False)
+def get_analytics_sink() -> AnalyticsSink:
+    """Get sink persisting analytics counts of the process (started on first use)."""
+    sink = AnalyticsSink(_ANALYTICS_STORE, sta.counts, log_path=_ANALYTICS_LOG)
+    sink.start()
+    return sink
+
+
 def page_head(**kwargs):
     """Initialize page execution.
 
@@ -426,27 +825,20 @@ def page_head(**kwargs):
     float_init()
     inject_analytics()
 
-    try:
-        sta.start_tracking(load_from_json=_ANALYTICS_STORE)
-    except OSError:
-        print(f'Failed to read "{_ANALYTICS_STORE}".')
-        sta.start_tracking()
+    # Counts are loaded once and saved in the background (see `AnalyticsSink`).
+    get_analytics_sink()
+    sta.start_tracking()
 
 
 def page_tail():
     """Finalize page execution.
 
-    It stop tracker (and saves its state), and shows cookie consent banner.
+    It stop tracker (its state is saved in the background), and shows cookie consent
+    banner.
 
     It should be used in place of `st.stop()`.
     """
-    try:
-        sta.stop_tracking(
-            save_to_json=_ANALYTICS_STORE, unsafe_password=_ANALYTICS_PASSWORD
-        )
-    except OSError:
-        print(f'Failed to write "{_ANALYTICS_STORE}".')
-        sta.stop_tracking(unsafe_password=_ANALYTICS_PASSWORD)
+    sta.stop_tracking(unsafe_password=_ANALYTICS_PASSWORD)
 
     cookie_manager = get_cookie_manager()
     cookies_accept = cookie_manager.get("cookies-accept")
@@ -454,6 +846,11 @@ def page_tail():
     if os.getenv("DEBUG") is not None:
         if cookies_accept and st.button("Decline cookies"):
             cookie_manager.delete("cookies-accept")
+        stats = get_artifact_cache().stats
+        st.caption(
+            f"Artifact cache: {stats.hits} hits, {stats.misses} misses, "
+            f"{stats.evictions} evictions."
+        )
 
     if not cookies_accept:
         with st.container():
@@ -0,0 +1,119 @@
+"""Micro-benchmark of analytics persistence on page reruns.
+
+Compares the original persistence, which loads and rewrites the whole JSON store on
+every rerun (as `streamlit_analytics2` does with `load_from_json`/`save_to_json`), with
+`AnalyticsSink`, which leaves reruns without disk I/O and appends increments in a
+background thread:
+
+```
+poetry run python -m benchmarks.analytics [REPEAT]
+```
+"""
+
+import datetime
+import json
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from amorphous_metals.streamlit.analytics import (
+    AnalyticsSink,
+    flatten_counts,
+    read_store,
+)
+
+DAY_COUNT = 365
+WIDGET_COUNT = 40
+OPTION_COUNT = 10
+
+
+def generate_counts(rng: np.random.Generator) -> dict[str, Any]:
+    """Generate counts of a year of traffic."""
+    first_day = datetime.date(2024, 1, 1)
+    return {
+        "loaded_from_firestore": False,
+        "total_pageviews": 10_000,
+        "total_script_runs": 100_000,
+        "total_time_seconds": 1e6,
+        "per_day": {
+            "days": [
+                str(first_day + datetime.timedelta(days=i)) for i in range(DAY_COUNT)
+            ],
+            "pageviews": rng.integers(0, 100, DAY_COUNT).tolist(),
+            "script_runs": rng.integers(0, 1000, DAY_COUNT).tolist(),
+        },
+        "widgets": {
+            f"Widget {i}": {
+                f"Option {j}": int(rng.integers(1000)) for j in range(OPTION_COUNT)
+            }
+            for i in range(WIDGET_COUNT)
+        },
+        "start_time": "01 Jan 2024, 00:00:00",
+    }
+
+
+def legacy_rerun(path: Path, counts: dict[str, Any]):
+    """Load and save the store around a rerun (the original implementation)."""
+    with path.open("r") as f:
+        stored = json.load(f)
+        for key in stored:
+            if key in counts:
+                counts[key] = stored[key]
+    counts["total_script_runs"] += 1
+    with path.open("w") as f:
+        json.dump(counts, f)
+
+
+def sink_rerun(counts: dict[str, Any]):
+    """Update counts in memory only (persisted by the sink)."""
+    counts["total_script_runs"] += 1
+
+
+def benchmark(repeat: int):
+    """Compare both implementations and print the timings."""
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy_path = Path(temp_dir) / "legacy.json"
+        legacy_counts = generate_counts(rng)
+        legacy_path.write_text(json.dumps(legacy_counts))
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_rerun(legacy_path, legacy_counts),
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+        sink_path = Path(temp_dir) / "sink.json"
+        sink_path.write_text(legacy_path.read_text())
+        counts = generate_counts(rng)
+        # Flush only explicitly, so the background thread doesn't distort timings.
+        sink = AnalyticsSink(sink_path, counts, flush_interval=3600)
+        sink.start()
+        rerun = min(timeit.repeat(lambda: sink_rerun(counts), number=1, repeat=repeat))
+
+        def update_and_flush():
+            counts["widgets"]["Widget 0"]["Option 0"] += 1
+            sink_rerun(counts)
+            sink.flush()
+
+        flush = min(timeit.repeat(update_and_flush, number=1, repeat=repeat))
+        compact = min(timeit.repeat(sink.compact, number=1, repeat=3))
+        sink.close()
+
+        stored, _ = read_store(sink_path)
+        assert flatten_counts(stored) == flatten_counts(counts)
+
+    print(
+        f"{DAY_COUNT} days, {WIDGET_COUNT}×{OPTION_COUNT} widget options: "
+        f"per rerun legacy {legacy * 1000:.2f} ms, sink {rerun * 1e6:.2f} µs; "
+        f"background flush {flush * 1000:.3f} ms, compaction {compact * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,96 @@
+"""Micro-benchmark of the artifact cache.
+
+Compares the cost of a cache hit in `st.cache_data(persist="disk")` (hashing the data
+frame of the selection and unpickling the result from disk) with a hit in
+`ArtifactCache` (fingerprinting the data frame once per selection and memory-mapping
+the result), on synthetic grids with a linkage matrix as the cached result:
+
+```
+poetry run python -m benchmarks.artifacts [REPEAT]
+```
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit.runtime.caching.cache_type import CacheType
+from streamlit.runtime.caching.hashing import update_hash
+
+from amorphous_metals import artifacts
+
+COLUMN_COUNT = 20
+
+
+def streamlit_hit(df: pd.DataFrame, path: Path):
+    """Hash the data frame and unpickle the result (as `st.cache_data()` does)."""
+    update_hash(
+        (df, ["A"], True), hashlib.new("md5"), cache_type=CacheType.DATA
+    )  # the former `clustering_input_key()`
+    return pickle.loads(path.read_bytes())
+
+
+def benchmark(width: int, repeat: int):
+    """Compare both caches on a single grid and print the timings."""
+    rng = np.random.default_rng(width)
+    # Columns are contiguous, as in parsed reports.
+    df = pd.DataFrame(
+        {f"Column {i}": rng.normal(size=width * width) for i in range(COLUMN_COUNT)}
+    )
+    linkage = rng.random((width * width - 1, 4))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pickled = Path(temp_dir) / "result.pickle"
+        pickled.write_bytes(pickle.dumps(linkage))
+        cache = artifacts.ArtifactCache(Path(temp_dir) / "artifacts")
+        key = artifacts.artifact_key("linkage", artifacts.fingerprint(df), "ward")
+        cache.put(key, linkage)
+        np.testing.assert_array_equal(cache.get(key), linkage)
+
+        streamlit = min(
+            timeit.repeat(lambda: streamlit_hit(df, pickled), number=1, repeat=repeat)
+        )
+        fingerprint = min(
+            timeit.repeat(lambda: artifacts.fingerprint(df), number=1, repeat=repeat)
+        )
+        hit = min(timeit.repeat(lambda: cache.get(key), number=1, repeat=repeat))
+
+    print(
+        f"{width}×{width}: st.cache_data hit {streamlit * 1000:.2f} ms, "
+        f"artifact cache hit {hit * 1000:.3f} ms "
+        f"(+ fingerprint once per selection {fingerprint * 1000:.2f} ms)"
+    )
+
+
+def check_eviction():
+    """Check that the least recently used entries are evicted first."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        entry = np.zeros(1000)
+        entry_size = 8000 + 128  # with the .npy header
+        cache = artifacts.ArtifactCache(temp_dir, max_bytes=3 * entry_size)
+        for i in range(3):
+            cache.put(str(i), entry)
+            # Distinct modification times even on coarse file systems.
+            os.utime(cache.entry_path(str(i)), ns=(i, i))
+        assert cache.get("0") is not None  # "1" is the least recently used now
+        cache.put("3", entry)
+        assert cache.get("1") is None
+        assert all(cache.get(key) is not None for key in ("0", "2", "3"))
+        assert cache.stats.evictions == 1 and cache.size() <= cache.max_bytes
+        print(
+            f"Eviction: {cache.stats.hits} hits, {cache.stats.misses} misses, "
+            f"{cache.stats.evictions} evictions"
+        )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    check_eviction()
+    for width in (100, 300):
+        benchmark(width, repeat)
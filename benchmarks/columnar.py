@@ -0,0 +1,59 @@
+"""Benchmark of loading parsed reports from columnar sidecars.
+
+Compares parsing the raw report, unpickling the data frame (as Streamlit disk cache
+does) and reading the columnar sidecar for a synthetic 100×100 map:
+
+```
+poetry run python -m benchmarks.columnar [REPEAT]
+```
+"""
+
+import contextlib
+import io
+import pickle
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+from amorphous_metals import columnar, convert
+from benchmarks.convert_raw_to_df import DATA_PATH, generate_large_report
+
+
+def benchmark(path: Path, repeat: int):
+    """Compare loading methods for a single file and print the timings."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = convert.convert_raw_to_df(path, use_sidecar=False)
+        columnar.write_sidecar(parsed, path)
+        pickled = pickle.dumps(parsed)
+
+        loaded = columnar.read_sidecar(path)
+        assert loaded is not None
+        pd.testing.assert_frame_equal(loaded, parsed)
+
+        timings = {
+            "parse": lambda: convert.convert_raw_to_df(path, use_sidecar=False),
+            "unpickle": lambda: pickle.loads(pickled),
+            "sidecar": lambda: columnar.read_sidecar(path),
+        }
+        results = {
+            name: min(timeit.repeat(function, number=1, repeat=repeat))
+            for name, function in timings.items()
+        }
+
+    print(
+        f"{path.name} ({len(parsed)} points, {len(parsed.columns)} columns): "
+        + ", ".join(f"{name} {time * 1000:.2f} ms" for name, time in results.items())
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = sorted(DATA_PATH.glob("*/*.txt", case_sensitive=False))[0]
+        for width in (15, 100):
+            path = Path(tmp_dir) / f"synthetic_{width}x{width}.TXT"
+            generate_large_report(source, path, width)
+            benchmark(path, repeat)
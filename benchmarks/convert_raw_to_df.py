@@ -0,0 +1,131 @@
+"""Benchmark of the raw nanoindenter file parser.
+
+Compares `convert.convert_raw_to_df()` with the original line-by-line parser on the
+example files from `data/` and on a synthetic 100×100 map built from the first of them:
+
+```
+poetry run python -m benchmarks.convert_raw_to_df [REPEAT]
+```
+"""
+
+import contextlib
+import io
+import math
+import re
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from amorphous_metals import convert
+
+DATA_PATH = Path(__file__).parent.parent / "data"
+
+
+def legacy_convert_raw_to_df(raw_input: Path) -> pd.DataFrame:
+    """Parse the raw file line by line (the original implementation)."""
+    df = pd.DataFrame()
+
+    with open(raw_input, "rb") as raw_file:
+        if [raw_file.readline().strip() for _ in range(3)] != [
+            b"",
+            b"New Report",
+            b"----------",
+        ]:
+            raise ValueError("File header is not valid")
+
+        df.Name = raw_file.readline().strip().decode("utf8")
+
+        column_name = ""
+        data: dict[int, float | None] = {}
+        for line in raw_file.readlines():
+            line = line.decode("utf8")
+
+            row = line.split("\t")
+            if len(row) < 3:
+                continue
+
+            if row[0] != "" and not row[0].startswith("["):
+                if any(isinstance(element, float) for element in data.values()):
+                    data_list = np.full(max(data.keys()), math.nan)
+                    for i, value in data.items():
+                        data_list[i - 1] = value
+                    df[column_name] = data_list
+
+                data = {}
+                column_name = row[0]
+            elif row[0] != "":
+                column_name += " " + row[0]
+
+            if not row[1].startswith("Data"):
+                continue
+
+            data[int(row[1].split(" : ")[1])] = (
+                float(row[2].replace(",", ".")) if row[2] != "--.--" else None
+            )
+
+    return df
+
+
+def generate_large_report(path: Path, output_path: Path, width: int):
+    """Generate a synthetic `width`×`width` report by repeating source data points."""
+    source = path.read_bytes()
+    head, *sections = re.split(
+        rb"(?m)^(?=[^\t\r\n[])", source.split(b"----------", 1)[1]
+    )
+    output = [b"\r\nNew Report\r\n----------" + head]
+    for section in sections:
+        lines = section.splitlines(keepends=True)
+        data = [line.split(b"\t")[2] for line in lines if b"\tData : " in line]
+        stats = [line for line in lines if b"\tData : " not in line]
+        labels = [line.split(b"\t")[0] for line in lines[:2]]
+        for i in range(width * width):
+            label = labels[i] if i < len(labels) else b""
+            output.append(
+                b"%s\tData : %d\t%s\t\r\n" % (label, i + 1, data[i % len(data)])
+            )
+        output.extend(stats)
+    output_path.write_bytes(b"".join(output))
+
+
+def benchmark(path: Path, repeat: int):
+    """Compare both parsers on a single file and print the timings."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = legacy_convert_raw_to_df(path)
+        actual = convert.convert_raw_to_df(path, use_sidecar=False)
+        pd.testing.assert_frame_equal(actual, expected)
+
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_convert_raw_to_df(path), number=1, repeat=repeat
+            )
+        )
+        current = min(
+            timeit.repeat(
+                lambda: convert.convert_raw_to_df(path, use_sidecar=False),
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+    print(
+        f"{path.name} ({path.stat().st_size / 1024:.0f} KiB): "
+        f"legacy {legacy * 1000:.2f} ms, "
+        f"vectorized {current * 1000:.2f} ms, "
+        f"speedup {legacy / current:.1f}×"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    paths = sorted(DATA_PATH.glob("*/*.txt", case_sensitive=False))
+    for path in paths:
+        benchmark(path, repeat)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        large_path = Path(tmp_dir) / "synthetic_100x100.TXT"
+        generate_large_report(paths[0], large_path, 100)
+        benchmark(large_path, max(repeat // 4, 1))
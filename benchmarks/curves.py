@@ -0,0 +1,89 @@
+"""Benchmark of parsing load–displacement curves into a curve store.
+
+Writes synthetic curves in the instrument export format (decimal commas, a line with
+units, and every line ending with a tab and CRLF), checks that they are parsed back
+exactly, and times parsing a single curve and streaming a directory of curves of a
+square map into a store:
+
+```
+poetry run python -m benchmarks.curves [REPEAT]
+```
+"""
+
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from amorphous_metals import curves
+
+SAMPLES = 1000
+"""Number of samples of each curve."""
+
+COLUMNS = ("Depth", "Load", "Time")
+UNITS = ("[nm]", "[mN]", "[s]")
+
+
+def export_curve(samples: npt.NDArray[np.float64]) -> bytes:
+    """Format samples as the instrument exports them."""
+    lines = ["\t".join(COLUMNS), "\t".join(UNITS)]
+    lines.extend(
+        "".join(f"{value:.6f}".replace(".", ",") + "\t" for value in row)
+        for row in samples
+    )
+    return "".join(line + "\r\n" for line in lines).encode()
+
+
+def synthetic_samples(indent: int) -> npt.NDArray[np.float64]:
+    """Generate a loading and unloading curve."""
+    rng = np.random.default_rng(indent)
+    time = np.linspace(0, 20, SAMPLES)
+    depth = 500 * np.sin(np.pi * time / 20) + rng.normal(0, 0.1, SAMPLES)
+    load = 1e-4 * np.clip(depth, 0, None) ** 1.5
+    return np.round(np.column_stack((depth, load, time)), 6)
+
+
+def benchmark(width: int, repeat: int):
+    """Time parsing and the store of a single map and print the results."""
+    samples = synthetic_samples(0)
+    content = export_curve(samples)
+    columns, parsed = curves.parse_curve(content)
+    assert columns == [f"{name} {unit}" for name, unit in zip(COLUMNS, UNITS)]
+    np.testing.assert_array_equal(parsed, samples)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir) / f"synthetic{curves.CURVES_DIR_SUFFIX}"
+        directory.mkdir()
+        for indent in range(1, width * width + 1):
+            (directory / f"synthetic_{indent}.TXT").write_bytes(
+                content if indent == 1 else export_curve(synthetic_samples(indent))
+            )
+        output_path = Path(tmp_dir) / f"synthetic{curves.STORE_SUFFIX}"
+
+        parse = min(
+            timeit.repeat(lambda: curves.parse_curve(content), number=1, repeat=repeat)
+        )
+        store = min(
+            timeit.repeat(
+                lambda: curves.write_store(directory, output_path),
+                number=1,
+                repeat=repeat,
+            )
+        )
+        np.testing.assert_array_equal(
+            curves.CurveStore(output_path).curve_array(1), samples
+        )
+
+    print(
+        f"{width}×{width} curves of {SAMPLES} samples: parse {parse * 1000:.2f} ms "
+        f"per curve, store {store:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for width in (5, 15):
+        benchmark(width, repeat)
@@ -0,0 +1,99 @@
+"""Benchmark of cross-sample statistics of the Parquet store.
+
+Builds a store of synthetic reports (copies of a parsed report, half in each alloy)
+and compares concatenating all reports in memory with `dataset.summarize()`, which
+streams batches and merges their moments, and with a summary of a single report
+(which opens only its file). Peak memory of the Python heap (including NumPy and
+pandas arrays) is measured with `tracemalloc`:
+
+```
+poetry run python -m benchmarks.dataset [REPEAT]
+```
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from amorphous_metals import convert, dataset
+from benchmarks.convert_raw_to_df import DATA_PATH
+
+ALLOYS = ("ZrCu alloys", "ZrTi alloys")
+
+
+def peak_memory(func) -> int:
+    """Get peak memory allocated by the function in bytes."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def build_synthetic_store(source: pd.DataFrame, store_dir: Path, count: int):
+    """Write copies of the report with noise to the store."""
+    rng = np.random.default_rng(count)
+    numeric = source.select_dtypes("number").columns
+    for index in range(count):
+        df = source.copy()
+        df[numeric] *= rng.normal(1, 0.01, df[numeric].shape)
+        dataset.write_report(df, store_dir, ALLOYS[index % 2], f"report_{index:05d}")
+
+
+def benchmark(source: pd.DataFrame, count: int, repeat: int):
+    """Compare summaries of a store of the reports and print the timings."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_dir = Path(tmp_dir)
+        build_synthetic_store(source, store_dir, count)
+        paths = sorted(store_dir.glob(f"*/*{dataset.STORE_SUFFIX}"))
+        columns = list(source.select_dtypes("number").columns)
+
+        def in_memory():
+            df = pd.concat(pd.read_parquet(path) for path in paths)
+            return df.groupby(dataset.REPORT_COLUMN, observed=True)[columns].agg(
+                list(dataset.STATISTICS)
+            )
+
+        def streamed():
+            return dataset.summarize(store_dir, columns)
+
+        def single():
+            return dataset.summarize(store_dir, columns, reports=["report_00000"])
+
+        timings = {
+            "in-memory": in_memory,
+            "streamed": streamed,
+            "single report": single,
+        }
+        results = {
+            name: (
+                min(timeit.repeat(function, number=1, repeat=repeat)),
+                peak_memory(function),
+            )
+            for name, function in timings.items()
+        }
+
+    print(
+        f"{count} reports ({count * len(source)} points): "
+        + ", ".join(
+            f"{name} {time * 1000:.0f} ms ({memory / 2**20:.1f} MB)"
+            for name, (time, memory) in results.items()
+        )
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = convert.convert_raw_to_df(
+            sorted(DATA_PATH.glob("*/*.txt", case_sensitive=False))[0]
+        )
+    for count in (100, 1000):
+        benchmark(parsed, count, repeat)
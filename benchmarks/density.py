@@ -0,0 +1,75 @@
+"""Benchmark of OPTICS on a dense distance matrix and on a sparse neighbour graph.
+
+Reports wall time and peak memory (traced NumPy/Python allocations) on synthetic
+square maps:
+
+```
+poetry run python -m benchmarks.density [WIDTH ...]
+```
+"""
+
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+import scipy.spatial.distance as spd
+from sklearn.cluster import OPTICS
+
+from amorphous_metals.cluster import density
+from benchmarks.hierarchical import generate_map
+
+MIN_SAMPLES = 10
+"""OPTICS `min_samples` (as on the Other methods page)."""
+
+DENSE_MAX_POINTS = 4000
+"""Maximum number of points for the dense variant (OPTICS on it takes minutes)."""
+
+
+def dense(data: npt.NDArray[np.float64]) -> npt.NDArray[np.int_]:
+    """OPTICS on dense seuclidean distance matrix (the original implementation)."""
+    return (
+        OPTICS(min_samples=MIN_SAMPLES, xi=0.0001, metric="precomputed")
+        .fit(spd.squareform(spd.pdist(data, "seuclidean")))
+        .labels_
+    )
+
+
+def sparse(data: npt.NDArray[np.float64]) -> npt.NDArray[np.int_]:
+    """OPTICS on sparse neighbour graph within the suggested radius."""
+    observations = density.standardize(data)
+    radius = density.suggest_radius(observations, MIN_SAMPLES)
+    graph = density.neighbor_graph(observations, radius, MIN_SAMPLES)
+    return density.optics(graph, MIN_SAMPLES, 0.0001, max_eps=radius).labels_
+
+
+def measure(width: int, name: str, func: Callable, data: npt.NDArray[np.float64]):
+    """Measure and print time and peak memory of a single variant."""
+    # Tracing allocations slows Python code down, so time is measured separately.
+    start = time.perf_counter()
+    func(data)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{width}×{width} {name:>6}: {elapsed:8.3f} s, peak {peak / 2**20:8.2f} MiB")
+
+
+def benchmark(width: int):
+    """Run both variants on a single map and print the results."""
+    data = generate_map(width)
+    if len(data) <= DENSE_MAX_POINTS:
+        measure(width, "dense", dense, data)
+    else:
+        print(f"{width}×{width}  dense: skipped (O(n²))")
+    measure(width, "sparse", sparse, data)
+
+
+if __name__ == "__main__":
+    for width in map(int, sys.argv[1:] or (15, 50, 100)):
+        benchmark(width)
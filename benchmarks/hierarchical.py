@@ -0,0 +1,75 @@
+"""Benchmark of hierarchical clustering strategies.
+
+Reports wall time and peak memory (traced NumPy/Python allocations) of each strategy
+from `amorphous_metals.cluster.hierarchical` on synthetic square maps with four
+features:
+
+```
+poetry run python -m benchmarks.hierarchical [WIDTH ...]
+```
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import numpy.typing as npt
+
+from amorphous_metals.cluster import hierarchical
+
+CASES: tuple[tuple[str, hierarchical.Strategy], ...] = (
+    ("single", "dense"),
+    ("single", "mst"),
+    ("ward", "dense"),
+    ("ward", "nn-chain"),
+    ("ward", "connectivity"),
+    ("centroid", "dense"),
+    ("centroid", "nn-list"),
+    ("average", "connectivity"),
+)
+"""Benchmarked (method, strategy) pairs."""
+
+
+def generate_map(width: int) -> npt.NDArray[np.float64]:
+    """Generate `width`×`width` map with three phases (as stripes) and noise."""
+    rng = np.random.default_rng(width)
+    phase = (np.arange(width * width) % width) * 3 // width
+    centers = np.array([[7.0, 650, 90, 40], [9.0, 800, 110, 45], [12.0, 1100, 130, 50]])
+    return centers[phase] * (1 + 0.05 * rng.normal(size=(width * width, 4)))
+
+
+def benchmark(width: int):
+    """Run all strategies on a single map and print the timings."""
+    data = generate_map(width)
+    connectivity = hierarchical.grid_connectivity(np.ones(len(data), np.bool_), width)
+
+    for method, strategy in CASES:
+        if strategy == "dense" and len(data) > hierarchical.DENSE_MAX_POINTS:
+            print(f"{width}×{width} {method:>8} {strategy:>12}: skipped (O(n²))")
+            continue
+
+        kwargs = {
+            "strategy": strategy,
+            "connectivity": connectivity if strategy == "connectivity" else None,
+        }
+
+        # Tracing allocations slows Python code down, so time is measured separately.
+        start = time.perf_counter()
+        hierarchical.linkage(data, method, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        hierarchical.linkage(data, method, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{width}×{width} {method:>8} {strategy:>12}: "
+            f"{elapsed:8.3f} s, peak {peak / 2**20:8.2f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    for width in map(int, sys.argv[1:] or (15, 50, 100)):
+        benchmark(width)
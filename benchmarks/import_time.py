@@ -0,0 +1,111 @@
+"""Import-time benchmark of modules loaded by Streamlit pages and the CLI.
+
+Imports each module in a fresh interpreter with `python -X importtime`, reports the
+cumulative import time and the slowest imported packages, and fails if a module loads
+a heavy dependency it should only load on use (e.g., scikit-learn before clustering
+runs):
+
+```
+poetry run python -m benchmarks.import_time [REPEAT]
+```
+"""
+
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+TOP_COUNT = 5
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass(frozen=True)
+class Target:
+    """Imported module and heavy packages it must not load."""
+
+    module: str
+    """Imported module."""
+    forbidden: tuple[str, ...]
+    """Top-level packages which must not be imported."""
+
+
+TARGETS = (
+    # Static pages (introduction, discussion, etc.) only need the page utilities.
+    Target(
+        "amorphous_metals.streamlit.utils",
+        ("matplotlib", "sklearn", "scipy", "bs4", "lxml"),
+    ),
+    Target("amorphous_metals.convert", ("streamlit", "matplotlib", "sklearn", "scipy")),
+    Target(
+        "amorphous_metals.__main__", ("streamlit", "matplotlib", "sklearn", "scipy")
+    ),
+    Target("amorphous_metals.cluster.kmeans", ("streamlit", "sklearn", "scipy")),
+    Target("amorphous_metals.cluster.mixture", ("streamlit", "sklearn", "scipy")),
+    Target("amorphous_metals.cluster.selection", ("streamlit", "sklearn", "scipy")),
+    Target("amorphous_metals.cluster.density", ("streamlit", "sklearn")),
+    Target("amorphous_metals.cluster.pipeline", ("streamlit", "matplotlib", "sklearn")),
+)
+"""Benchmarked modules."""
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Import module in a fresh interpreter.
+
+    Arguments:
+        module -- imported module.
+
+    Returns:
+        Self and cumulative import time (in µs) of each imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is not None:
+            times[match[4]] = (int(match[1]), int(match[2]))
+    return times
+
+
+def benchmark(target: Target, repeat: int) -> bool:
+    """Benchmark import of a single module and print the timings.
+
+    Returns:
+        True if no forbidden package was imported.
+    """
+    runs = [import_times(target.module) for _ in range(repeat)]
+    times = min(runs, key=lambda times: times[target.module][1])
+
+    packages: dict[str, int] = {}
+    for name, (_, cumulative) in times.items():
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    slowest = sorted(
+        (
+            (cumulative, package)
+            for package, cumulative in packages.items()
+            if package != "amorphous_metals"
+        ),
+        reverse=True,
+    )[:TOP_COUNT]
+    loaded = [package for package in target.forbidden if package in packages]
+
+    print(
+        f"{target.module}: {times[target.module][1] / 1000:.0f} ms "
+        f"({len(times)} modules), slowest: "
+        + ", ".join(f"{package} {time / 1000:.0f} ms" for time, package in slowest)
+    )
+    if len(loaded) > 0:
+        print("  imports heavy packages eagerly: " + ", ".join(loaded))
+    return len(loaded) == 0
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    passed = [benchmark(target, repeat) for target in TARGETS]
+    sys.exit(0 if all(passed) else 1)
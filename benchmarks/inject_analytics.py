@@ -0,0 +1,90 @@
+"""Micro-benchmark of analytics injection on page reruns.
+
+Compares the original approach, which parsed Streamlit's `index.html` on every rerun
+(with BeautifulSoup, approximated here with the standard library parser), with the
+marker check of the already patched page and the cached (once per process) injection,
+on a temporary copy of the page. Patching a page with attributes of the head tag is
+checked as well:
+
+```
+poetry run python -m benchmarks.inject_analytics [REPEAT]
+```
+"""
+
+import functools
+import shutil
+import sys
+import tempfile
+import timeit
+from html.parser import HTMLParser
+from pathlib import Path
+
+import streamlit as st
+
+from amorphous_metals.streamlit import utils
+
+
+class _IdParser(HTMLParser):
+    """Collect ids of all tags of a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.ids: set[str] = set()
+
+    def handle_starttag(self, tag, attrs):
+        self.ids.update(value for name, value in attrs if name == "id" and value)
+
+
+def legacy_needs_patch(index_path: Path) -> bool:
+    """Check if the page needs the tags by parsing it (as the original code did)."""
+    parser = _IdParser()
+    parser.feed(index_path.read_text())
+    return not {"google_analytics", "hotjar"} <= parser.ids
+
+
+def benchmark(repeat: int):
+    """Compare the implementations on a copy of Streamlit's page and print them."""
+    static_dir = Path(st.__file__).parent / "static"
+    original = static_dir / "index.bck"
+    if not original.exists():
+        original = static_dir / "index.html"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index_path = Path(temp_dir) / "index.html"
+        shutil.copy(original, index_path)
+        index_path.with_suffix(".bck").unlink(missing_ok=True)
+
+        first = timeit.timeit(lambda: utils.patch_index_html(index_path), number=1)
+        assert not utils.patch_index_html(index_path)
+        assert not legacy_needs_patch(index_path)
+
+        cached_inject = functools.cache(lambda: utils.patch_index_html(index_path))
+        cached_inject()
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_needs_patch(index_path), number=1, repeat=repeat
+            )
+        )
+        marker = min(
+            timeit.repeat(
+                lambda: utils.patch_index_html(index_path), number=1, repeat=repeat
+            )
+        )
+        cached = min(timeit.repeat(cached_inject, number=1, repeat=repeat))
+
+        attributes_path = Path(temp_dir) / "attributes.html"
+        attributes_path.write_text('<html><head lang="en"></head><body></body></html>')
+        assert utils.patch_index_html(attributes_path)
+        assert not legacy_needs_patch(attributes_path)
+
+    print(
+        f"first patch {first * 1000:.2f} ms, per rerun: "
+        f"HTML parse {legacy * 1000:.2f} ms, "
+        f"marker check {marker * 1000:.3f} ms, "
+        f"cached {cached * 1000:.4f} ms "
+        f"(saves {(legacy - cached) * 1000:.2f} ms per rerun)"
+    )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
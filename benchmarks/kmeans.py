@@ -0,0 +1,66 @@
+"""Benchmark of K-means refits during interactive seed selection.
+
+Simulates a user adding seeds one by one and then removing the first one, and compares
+fitting from scratch (as `KMeans(max_iter=2000)` from the seeds) with
+`amorphous_metals.cluster.kmeans.WarmStartKMeans` in all modes:
+
+```
+poetry run python -m benchmarks.kmeans [WIDTH ...]
+```
+"""
+
+import sys
+import time
+
+import numpy as np
+import numpy.typing as npt
+from sklearn.cluster import KMeans
+
+from amorphous_metals.cluster import kmeans
+from benchmarks.hierarchical import generate_map
+
+SEED_COUNT = 6
+"""Number of seeds added during the simulated session."""
+
+
+def seed_sets(n: int) -> list[dict[int, int]]:
+    """Get seed sets (by point index) after each simulated click."""
+    points = np.random.default_rng(n).choice(n, SEED_COUNT, replace=False)
+    sets = [dict.fromkeys(points[: count + 1].tolist()) for count in range(SEED_COUNT)]
+    sets.append(dict.fromkeys(points[1:].tolist()))
+    return sets
+
+
+def cold(data: npt.NDArray[np.float64], points: list[int]):
+    """Fit K-means from the raw seeds (the original implementation)."""
+    KMeans(n_clusters=len(points), init=data[points], max_iter=2000).fit(data)
+
+
+def benchmark(width: int):
+    """Run all variants on a single map and print the timings per click."""
+    data = generate_map(width)
+    sets = seed_sets(len(data))
+
+    start = time.perf_counter()
+    for points in sets:
+        cold(data, list(points))
+    elapsed = (time.perf_counter() - start) / len(sets)
+    print(f"{width}×{width} {'cold':>10}: {elapsed * 1000:8.1f} ms per click")
+
+    for mode in kmeans.MODES[1:]:
+        engine = kmeans.WarmStartKMeans(data, mode)
+        iterations = 0
+        start = time.perf_counter()
+        for points in sets:
+            engine.fit({point: data[point] for point in points})
+            iterations += engine.n_iter
+        elapsed = (time.perf_counter() - start) / len(sets)
+        print(
+            f"{width}×{width} {mode:>10}: {elapsed * 1000:8.1f} ms per click, "
+            f"{iterations / len(sets):5.1f} iterations"
+        )
+
+
+if __name__ == "__main__":
+    for width in map(int, sys.argv[1:] or (15, 100, 300)):
+        benchmark(width)
@@ -0,0 +1,75 @@
+"""Micro-benchmark of Gaussian mixture fitting.
+
+Compares scikit-learn `GaussianMixture` (initialized with its own K-means) with
+`mixture.fit()` warm-started from the K-means clusters, as on the K-means page after
+the seeds are picked, on synthetic maps with 3 phases. Both use the same tolerance, and
+the peak memory of the fit is measured with `tracemalloc`:
+
+```
+poetry run python -m benchmarks.mixture [REPEAT]
+```
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.mixture import GaussianMixture
+
+from amorphous_metals.cluster import mixture
+
+MEANS = ((0, 0, 0, 0), (3, 1, 0, 1), (0, 4, 2, -1))
+SCALES = (1.0, 0.7, 0.4)
+
+
+def synthetic_observations(count: int) -> np.ndarray:
+    """Generate observations of points of overlapping phases."""
+    rng = np.random.default_rng(count)
+    phases = rng.integers(0, len(MEANS), count)
+    return np.asarray(MEANS)[phases] + np.asarray(SCALES)[
+        phases, np.newaxis
+    ] * rng.normal(size=(count, len(MEANS[0])))
+
+
+def peak_memory(func) -> int:
+    """Get peak memory allocated by the function in bytes."""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def benchmark(count: int, covariance_type: mixture.CovarianceType, repeat: int):
+    """Compare both implementations on a single map and print the timings."""
+    observations = synthetic_observations(count)
+    labels = KMeans(len(MEANS), n_init=1, random_state=0).fit_predict(observations)
+
+    def legacy():
+        return GaussianMixture(
+            len(MEANS), covariance_type=covariance_type, random_state=0
+        ).fit(observations)
+
+    def warm():
+        return mixture.fit(observations, labels, len(MEANS), covariance_type)
+
+    model = warm()
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+    warm_time = min(timeit.repeat(warm, number=1, repeat=repeat))
+
+    print(
+        f"{count} points, {covariance_type}: scikit-learn {legacy_time * 1000:.0f} ms "
+        f"({peak_memory(legacy) / 2**20:.1f} MB, log-likelihood "
+        f"{legacy().score(observations):.4f}), warm-started "
+        f"{warm_time * 1000:.0f} ms ({peak_memory(warm) / 2**20:.1f} MB, "
+        f"log-likelihood {model.log_likelihood:.4f}, {model.n_iter} iterations)"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for count in (10_000, 100_000):
+        for covariance_type in mixture.COVARIANCE_TYPES:
+            benchmark(count, covariance_type, repeat)
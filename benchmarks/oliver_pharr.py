@@ -0,0 +1,98 @@
+"""Benchmark of the batched Oliver–Pharr unloading fit.
+
+Fits synthetic unloading segments (power law with known parameters and 0.01 % load
+noise) of square maps with `scipy.optimize.curve_fit()` in a loop over indents and with
+`amorphous_metals.oliver_pharr.fit_unloading()` for all indents at once, and reports
+time and the largest relative error of the stiffness:
+
+```
+poetry run python -m benchmarks.oliver_pharr [WIDTH ...]
+```
+"""
+
+import sys
+import time
+
+import numpy as np
+import numpy.typing as npt
+from scipy.optimize import curve_fit
+
+from amorphous_metals import oliver_pharr
+
+SAMPLES = 200
+"""Number of samples of each unloading segment."""
+
+
+def generate_segments(
+    count: int,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Generate unloading segments and their true parameters (α, m, hp)."""
+    rng = np.random.default_rng(count)
+    params = np.column_stack(
+        (
+            rng.uniform(0.001, 0.01, count),
+            rng.uniform(1.2, 1.9, count),
+            rng.uniform(100, 300, count),
+        )
+    )
+    max_depth = params[:, 2] + rng.uniform(100, 300, count)
+    depth = params[:, 2:3] + (max_depth - params[:, 2])[:, np.newaxis] * np.linspace(
+        0.98, 0.5, SAMPLES
+    )
+    load = params[:, 0:1] * (depth - params[:, 2:3]) ** params[:, 1:2]
+    load += rng.normal(0, 1e-4, load.shape) * load.max(axis=1, keepdims=True)
+    return depth, load, params
+
+
+def power_law(depth, alpha, m, hp):
+    """Unloading power law."""
+    return alpha * np.clip(depth - hp, 1e-12, None) ** m
+
+
+def loop(
+    depth: npt.NDArray[np.float64], load: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Fit each indent separately (the usual per-curve approach)."""
+    return np.array(
+        [
+            curve_fit(
+                power_law, h, p, p0=(p[0] / (h[0] - h[-1] / 2) ** 1.5, 1.5, h[-1] / 2)
+            )[0]
+            for h, p in zip(depth, load)
+        ]
+    )
+
+
+def batched(
+    depth: npt.NDArray[np.float64], load: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Fit all indents at once."""
+    return oliver_pharr.fit_unloading(depth, load, np.ones(depth.shape, dtype=np.bool_))
+
+
+def stiffness(
+    params: npt.NDArray[np.float64], depth: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Get stiffness at the first sample."""
+    alpha, m, hp = params.T
+    return alpha * m * (depth[:, 0] - hp) ** (m - 1)
+
+
+def benchmark(width: int):
+    """Run both variants on a single map and print the results."""
+    depth, load, params = generate_segments(width * width)
+    expected = stiffness(params, depth)
+    for name, func in (("loop", loop), ("batched", batched)):
+        start = time.perf_counter()
+        fitted = func(depth, load)
+        elapsed = time.perf_counter() - start
+        error = np.max(np.abs(stiffness(fitted, depth) / expected - 1))
+        print(
+            f"{width}×{width} {name:>7}: {elapsed:8.3f} s, "
+            f"max stiffness error {error * 100:6.3f} %"
+        )
+
+
+if __name__ == "__main__":
+    for width in map(int, sys.argv[1:] or (15, 50, 100)):
+        benchmark(width)
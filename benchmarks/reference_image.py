@@ -0,0 +1,79 @@
+"""Micro-benchmark of the clickable reference image of K-means clustering.
+
+Compares the original image, upscaled 22× with `np.repeat()` on every rerun, with the
+cached image upscaled just to the display width and the points drawn over its copy.
+Both are encoded to PNG, as `streamlit_image_coordinates()` does before sending them
+to the browser:
+
+```
+poetry run python -m benchmarks.reference_image [REPEAT]
+```
+"""
+
+import io
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+from amorphous_metals import render
+
+REP_COUNT = 22
+POINT_COUNT = 5
+DISPLAY_WIDTH = 300
+
+
+def encode(image: np.ndarray) -> bytes:
+    """Encode image to PNG (as `streamlit_image_coordinates()` does)."""
+    output = io.BytesIO()
+    Image.fromarray(image).save(output, format="PNG")
+    return output.getvalue()
+
+
+def legacy_rerun(reference: np.ndarray, points: list[tuple[int, int]]) -> bytes:
+    """Draw points and upscale the image (the original implementation)."""
+    image = render.render_map(reference)
+    for x, y in points:
+        image[y, x] = (255, 0, 0)
+    return encode(np.repeat(np.repeat(image, REP_COUNT, 0), REP_COUNT, 1))
+
+
+def overlay_rerun(cached: np.ndarray, points: list[tuple[int, int]], scale: int):
+    """Draw points over a copy of the cached image."""
+    image = cached.copy()
+    for x, y in points:
+        image[y * scale : (y + 1) * scale, x * scale : (x + 1) * scale] = (255, 0, 0)
+    return encode(image)
+
+
+def benchmark(width: int, repeat: int):
+    """Compare both implementations on a single map and print the timings."""
+    rng = np.random.default_rng(width)
+    reference = rng.normal(size=(width, width))
+    points = [tuple(point) for point in rng.integers(0, width, (POINT_COUNT, 2))]
+    scale = render.scale_to_width(width, DISPLAY_WIDTH)
+    cached = render.render_map(reference, scale=scale)
+
+    legacy_size = len(legacy_rerun(reference, points))
+    size = len(overlay_rerun(cached, points, scale))
+    legacy = min(
+        timeit.repeat(lambda: legacy_rerun(reference, points), number=1, repeat=repeat)
+    )
+    overlay = min(
+        timeit.repeat(
+            lambda: overlay_rerun(cached, points, scale), number=1, repeat=repeat
+        )
+    )
+
+    print(
+        f"{width}×{width}: legacy ×{REP_COUNT} {legacy * 1000:.1f} ms "
+        f"({legacy_size / 1000:.0f} kB PNG), "
+        f"overlay ×{scale} {overlay * 1000:.2f} ms ({size / 1000:.0f} kB PNG)"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for width in (15, 100):
+        benchmark(width, repeat)
@@ -0,0 +1,70 @@
+"""Micro-benchmark of map rendering.
+
+Compares the original rendering of maps with Matplotlib (an `imshow()` figure
+rasterized to PNG with Agg, as `st.pyplot()` does) with the colormap lookup table of
+`render.render_map()`, on synthetic maps with holes:
+
+```
+poetry run python -m benchmarks.render [REPEAT]
+```
+"""
+
+import io
+import sys
+import timeit
+
+import matplotlib
+import numpy as np
+
+from amorphous_metals import render
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+def legacy_render(image: np.ndarray) -> bytes:
+    """Render map in a figure (the original implementation)."""
+    fig, ax = plt.subplots()
+    ax.set_axis_off()
+    ax.imshow(image)
+    output = io.BytesIO()
+    fig.savefig(output, format="png")
+    plt.close(fig)
+    return output.getvalue()
+
+
+def check_colors(image: np.ndarray):
+    """Check that the lookup table gives the same colors as Matplotlib."""
+    expected = plt.get_cmap("viridis")(
+        plt.Normalize()(np.ma.masked_invalid(image)), bytes=True
+    )[..., :3]
+    expected[np.isnan(image)] = render.HOLE_COLOR
+    np.testing.assert_array_equal(render.render_map(image), expected)
+
+
+def benchmark(width: int, repeat: int):
+    """Compare both renderers on a single map and print the timings."""
+    rng = np.random.default_rng(width)
+    image = rng.normal(size=(width, width))
+    image[rng.random((width, width)) < 0.01] = np.nan
+    check_colors(image)
+    scale = render.scale_to_width(width, 300)
+
+    legacy = min(timeit.repeat(lambda: legacy_render(image), number=1, repeat=repeat))
+    lut = min(
+        timeit.repeat(
+            lambda: render.render_map(image, scale=scale), number=1, repeat=repeat
+        )
+    )
+
+    print(
+        f"{width}×{width} (upscaled ×{scale}): Matplotlib {legacy * 1000:.2f} ms, "
+        f"LUT {lut * 1000:.3f} ms ({legacy / lut:.0f}× faster)"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for width in (15, 100, 300):
+        benchmark(width, repeat)
@@ -0,0 +1,77 @@
+"""Micro-benchmark of automatic selection of the number of clusters.
+
+Compares the full silhouette (all pairwise distances) with the silhouette of a sample
+of `selection.SAMPLE_SIZE` points for a single K-means clustering, and times the
+whole sweep of `selection.sweep()` (K-means and Gaussian mixtures with 2–10 clusters
+scored with all criteria) on synthetic maps with 4 phases:
+
+```
+poetry run python -m benchmarks.selection [REPEAT]
+```
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from amorphous_metals.cluster import selection
+
+PHASES = 4
+FEATURES = 4
+
+
+def synthetic_observations(count: int) -> np.ndarray:
+    """Generate observations of points of well separated phases."""
+    rng = np.random.default_rng(count)
+    centers = rng.normal(0, 4, (PHASES, FEATURES))
+    return centers[rng.integers(0, PHASES, count)] + rng.normal(size=(count, FEATURES))
+
+
+def benchmark(count: int, repeat: int):
+    """Time silhouettes and the sweep on a single map and print the results."""
+    observations = synthetic_observations(count)
+    labels = KMeans(PHASES, n_init=1, random_state=0).fit_predict(observations)
+    sample = np.sort(
+        np.random.default_rng(0).choice(count, selection.SAMPLE_SIZE, False)
+    )
+
+    full = min(
+        timeit.repeat(
+            lambda: silhouette_score(observations, labels), number=1, repeat=repeat
+        )
+    )
+    sampled = min(
+        timeit.repeat(
+            lambda: silhouette_score(observations[sample], labels[sample]),
+            number=1,
+            repeat=repeat,
+        )
+    )
+    scores = selection.sweep(observations)
+    sweep = min(
+        timeit.repeat(lambda: selection.sweep(observations), number=1, repeat=repeat)
+    )
+    # The Gaussian mixture (the second candidate) is scored with all criteria.
+    best = {
+        score: int(best_count)
+        for score, best_count in zip(
+            selection.SCORES,
+            selection.best_counts(scores, selection.DEFAULT_CLUSTER_COUNTS)[1],
+        )
+    }
+
+    print(
+        f"{count} points: full silhouette {full * 1000:.0f} ms, sampled "
+        f"{sampled * 1000:.0f} ms, sweep {sweep:.2f} s on {os.cpu_count()} cores "
+        f"(best counts of Gaussian mixture: {best})"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for count in (10_000, 40_000):
+        benchmark(count, repeat)
@@ -0,0 +1,80 @@
+"""Micro-benchmark of spatial smoothing of K-means labels.
+
+Clusters a synthetic noisy map of two phases (a disc in a matrix) with plain K-means
+and with K-means labels smoothed on the 4-neighbour grid, and prints the fraction of
+misclassified points and the time of smoothing, which grows linearly with the number
+of points:
+
+```
+poetry run python -m benchmarks.spatial [REPEAT]
+```
+"""
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from amorphous_metals.cluster import pipeline, spatial
+
+STRENGTH = 1.0
+NOISE = 0.4
+
+
+def synthetic_map(width: int) -> tuple[pd.DataFrame, np.ndarray]:
+    """Generate noisy map of two phases with its true labels."""
+    rng = np.random.default_rng(width)
+    y, x = np.divmod(np.arange(width * width), width)
+    phase = ((x - width / 2) ** 2 + (y - width / 2) ** 2 < (width / 3) ** 2).astype(
+        np.int32
+    )
+    df = pd.DataFrame(
+        {
+            "X [mm]": x * 0.01,
+            "Y [mm]": y * 0.01,
+            "HIT (O&P) [MPa]": phase + rng.normal(0, NOISE, len(phase)),
+            "EIT (O&P) [GPa]": phase + rng.normal(0, NOISE, len(phase)),
+        }
+    )
+    return df, phase
+
+
+def error(labels: np.ndarray, phase: np.ndarray) -> float:
+    """Get fraction of misclassified points (for any order of the two labels)."""
+    wrong = np.mean(labels != phase)
+    return min(wrong, 1 - wrong)
+
+
+def benchmark(width: int, repeat: int):
+    """Cluster a single map with and without smoothing and print the results."""
+    df, phase = synthetic_map(width)
+    observations = df[["HIT (O&P) [MPa]", "EIT (O&P) [GPa]"]].to_numpy()
+    mask = np.ones(len(df), dtype=np.bool_)
+    labels = pipeline.cluster(
+        df,
+        pipeline.ClusteringConfig(
+            method="kmeans",
+            features=("HIT (O&P) [MPa]", "EIT (O&P) [GPa]"),
+            cluster_count=2,
+        ),
+    )
+    graph = pipeline.grid_connectivity(df, mask)
+    groups = pipeline.grid_groups(df, mask)
+
+    def smooth():
+        return spatial.smooth_labels(observations, labels, graph, STRENGTH, groups, 2)
+
+    smoothed = smooth()
+    duration = min(timeit.repeat(smooth, number=1, repeat=repeat))
+
+    print(
+        f"{width}×{width}: K-means error {error(labels, phase):.2%}, "
+        f"smoothed {error(smoothed, phase):.2%} in {duration * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for width in (100, 300, 600):
+        benchmark(width, repeat)